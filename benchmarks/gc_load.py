@@ -0,0 +1,122 @@
+"""Loads the same structure many times over, as a long batch run does, and
+reports how much time the garbage collector spends (and its longest pause),
+how many collections of each generation there are, and how memory use
+changes as the run goes on. Structures should be freed as soon as they're
+dropped, so memory should stay flat and there should be little for the
+collector to do.
+
+    python benchmarks/gc_load.py --loads 10000 --atoms 1000
+    python benchmarks/gc_load.py --loads 1000 1abc.pdb"""
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic import generate_pdb
+from biosci.pdb import PdbFile, PdbDataStructure, PdbStructure
+
+class CollectionTimer:
+    """Records the duration and generation of every garbage collection, using
+    gc.callbacks."""
+
+    def __init__(self):
+        self.pauses = []
+        self.generations = [0, 0, 0]
+        self.start = None
+
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self.start = time.perf_counter()
+        elif self.start is not None:
+            self.pauses.append(time.perf_counter() - self.start)
+            self.generations[info["generation"]] += 1
+            self.start = None
+
+
+    def __enter__(self):
+        gc.callbacks.append(self)
+        return self
+
+
+    def __exit__(self, *args):
+        gc.callbacks.remove(self)
+
+
+
+def get_memory():
+    """Returns the resident memory of this process in MB (or the peak
+    resident memory where the current figure isn't available)."""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1e6 if sys.platform == "darwin" else 1e3)
+
+
+def run(text, loads, checkpoints=10):
+    """Loads the PDB text the given number of times, keeping nothing, and
+    returns the measurements - with the memory and the number of objects
+    the collector is tracking sampled at evenly spaced checkpoints."""
+
+    gc.collect()
+    samples, every = [], max(loads // checkpoints, 1)
+    start = time.perf_counter()
+    with CollectionTimer() as timer:
+        for load in range(1, loads + 1):
+            PdbStructure(PdbDataStructure(PdbFile(text)))
+            if load % every == 0 or load == loads:
+                samples.append({
+                 "loads": load, "memory_mb": round(get_memory(), 1),
+                 "gc_objects": len(gc.get_objects())
+                })
+    seconds = time.perf_counter() - start
+    return {
+     "loads": loads, "seconds": seconds, "seconds_per_load": seconds / loads,
+     "gc_seconds": sum(timer.pauses), "gc_max_pause": max(timer.pauses or [0]),
+     "collections": timer.generations, "unreachable_after": gc.collect(),
+     "samples": samples
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GC and memory over many loads")
+    parser.add_argument("path", nargs="?", help="a PDB file (default: a synthetic structure)")
+    parser.add_argument("--loads", type=int, default=10000)
+    parser.add_argument("--atoms", type=int, default=1000)
+    parser.add_argument("--checkpoints", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print JSON instead")
+    args = parser.parse_args()
+
+    if args.path:
+        with open(args.path) as f:
+            text = f.read()
+    else:
+        text = generate_pdb(atoms=args.atoms, chains=2, waters=args.atoms // 10,
+         ligands=max(args.atoms // 500, 1))
+    result = run(text, args.loads, checkpoints=args.checkpoints)
+    if args.json:
+        print(json.dumps(result))
+        return
+    print("%10s %12s %12s" % ("loads", "memory MB", "gc objects"))
+    for sample in result["samples"]:
+        print("%10i %12.1f %12i" % (sample["loads"], sample["memory_mb"], sample["gc_objects"]))
+    print()
+    print("%.3f ms per load, %.1f seconds in total" % (
+     result["seconds_per_load"] * 1000, result["seconds"]
+    ))
+    print("%.3f seconds collecting (longest pause %.1f ms), collections by generation: %s" % (
+     result["gc_seconds"], result["gc_max_pause"] * 1000,
+     "/".join([str(n) for n in result["collections"]])
+    ))
+    print("%i unreachable objects left at the end" % result["unreachable_after"])
+
+
+if __name__ == "__main__":
+    main()
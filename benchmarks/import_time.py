@@ -0,0 +1,70 @@
+"""Measures how long it takes to import each part of biosci in a fresh
+interpreter, which is what every short command-line run pays before doing any
+work, and lists the biosci modules each import loads eagerly.
+
+    python benchmarks/import_time.py [--repeats N] [module ...]"""
+
+import os
+import sys
+import subprocess
+import argparse
+
+MODULES = ["biosci", "biosci.pdb", "biosci.mol2", "biosci.mopac"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def time_import(module):
+    """Imports a module in a new interpreter and returns the seconds taken,
+    measured inside that interpreter so that start-up isn't counted."""
+
+    code = (
+     "import time; start = time.perf_counter(); import %s; "
+     "print(time.perf_counter() - start)" % module
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT)
+    return float(output.decode().strip())
+
+
+def get_modules_loaded(module):
+    """Returns the number of modules in sys.modules after importing one, in a
+    new interpreter."""
+
+    code = (
+     "import sys; before = len(sys.modules); import %s; "
+     "print(len(sys.modules) - before)" % module
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT)
+    return int(output.decode().strip())
+
+
+def get_package_modules(module):
+    """Returns the biosci modules that are loaded eagerly by importing one, in
+    a new interpreter - anything not listed is only imported when first
+    used."""
+
+    code = (
+     "import sys; import %s; "
+     "print(' '.join(sorted(m for m in sys.modules if m.startswith('biosci'))))" % module
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT)
+    return output.decode().split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time biosci imports")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    print("%-16s %10s %10s %10s" % ("module", "median ms", "best ms", "modules"))
+    for module in args.modules:
+        times = sorted([time_import(module) for _ in range(args.repeats)])
+        print("%-16s %10.1f %10.1f %10i" % (
+         module, times[len(times) // 2] * 1000, times[0] * 1000, get_modules_loaded(module)
+        ))
+    print()
+    for module in args.modules:
+        print("%s loads %s" % (module, ", ".join(get_package_modules(module))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Runs each stage of the PDB pipeline on synthetic structures of increasing
+size and reports the wall time, peak memory and number of new (garbage
+collector tracked) objects of each stage, so that regressions - and stages
+that don't scale linearly - show up.
+
+    python benchmarks/pipeline.py --atoms 1000 10000 100000 --waters 0.1
+
+Times come from a run without memory tracing, and peak memory from a second,
+traced run, since tracing slows everything down. Use --no-memory to skip the
+second run."""
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic import generate_pdb
+from biosci.pdb import PdbFile, PdbDataStructure, PdbStructure
+
+NEARBY_SAMPLE = 1000
+
+def get_stages():
+    """Returns the stages in order, as (name, function) pairs. Each function
+    takes the previous stage's result (the PDB text for the first stage) and
+    returns its own."""
+
+    def nearby_atoms(structure):
+        atoms = structure.model.atoms
+        step = max(len(atoms) // NEARBY_SAMPLE, 1)
+        structure.model.clear_atom_grid()
+        for atom in atoms[::step]:
+            atom.nearby_atoms(5)
+        return structure
+
+    return [
+     ("file", PdbFile),
+     ("data", PdbDataStructure),
+     ("structure", PdbStructure),
+     ("bonds", lambda structure: (structure.model.get_bonds(), structure)[1]),
+     ("nearby_atoms", nearby_atoms)
+    ]
+
+
+def run_stages(text, trace=False):
+    """Runs every stage once, returning a dictionary of measurements for
+    each."""
+
+    results, value = {}, text
+    gc.collect()
+    for name, function in get_stages():
+        objects = len(gc.get_objects())
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        value = function(value)
+        seconds = time.perf_counter() - start
+        result = {"seconds": seconds, "objects": len(gc.get_objects()) - objects}
+        if trace:
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+        results[name] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PDB pipeline")
+    parser.add_argument("--atoms", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--chains", type=int, default=2)
+    parser.add_argument("--models", type=int, default=1)
+    parser.add_argument("--waters", type=float, default=0.1,
+     help="waters as a fraction of the protein atoms")
+    parser.add_argument("--ligands", type=float, default=0.002,
+     help="ligands as a fraction of the protein atoms")
+    parser.add_argument("--anisou", action="store_true")
+    parser.add_argument("--helix-density", type=float, default=0.3)
+    parser.add_argument("--sheet-density", type=float, default=0.2)
+    parser.add_argument("--site-density", type=float, default=0.02)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print JSON lines instead")
+    args = parser.parse_args()
+
+    if not args.json:
+        print("%10s %-14s %10s %12s %10s" % ("atoms", "stage", "seconds", "gc objects", "peak MB"))
+    for atoms in args.atoms:
+        text = generate_pdb(
+         atoms=atoms, chains=args.chains, models=args.models,
+         waters=int(atoms * args.waters), ligands=int(atoms * args.ligands),
+         anisou=args.anisou, helix_density=args.helix_density,
+         sheet_density=args.sheet_density, site_density=args.site_density
+        )
+        results = run_stages(text)
+        if not args.no_memory:
+            for name, result in run_stages(text, trace=True).items():
+                results[name]["peak_mb"] = result["peak_mb"]
+        for name, result in results.items():
+            if args.json:
+                print(json.dumps(dict(result, atoms=atoms, stage=name)))
+            else:
+                print("%10i %-14s %10.3f %12i %10s" % (
+                 atoms, name, result["seconds"], result["objects"],
+                 "%.1f" % result["peak_mb"] if "peak_mb" in result else "-"
+                ))
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
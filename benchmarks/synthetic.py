@@ -0,0 +1,223 @@
+"""Generates synthetic PDB files of any size, for benchmarking. The same
+arguments always give the same file, so timings can be compared between
+machines and between versions of biosci.
+
+    python benchmarks/synthetic.py --atoms 100000 --chains 4 --waters 5000 > big.pdb"""
+
+import math
+import random
+import argparse
+
+#The heavy atoms (name and element) of the residues used
+RESIDUES = {
+ "GLY": (("N", "N"), ("CA", "C"), ("C", "C"), ("O", "O")),
+ "ALA": (("N", "N"), ("CA", "C"), ("C", "C"), ("O", "O"), ("CB", "C")),
+ "SER": (("N", "N"), ("CA", "C"), ("C", "C"), ("O", "O"), ("CB", "C"), ("OG", "O")),
+ "VAL": (("N", "N"), ("CA", "C"), ("C", "C"), ("O", "O"), ("CB", "C"), ("CG1", "C"),
+  ("CG2", "C")),
+ "LEU": (("N", "N"), ("CA", "C"), ("C", "C"), ("O", "O"), ("CB", "C"), ("CG", "C"),
+  ("CD1", "C"), ("CD2", "C")),
+ "PHE": (("N", "N"), ("CA", "C"), ("C", "C"), ("O", "O"), ("CB", "C"), ("CG", "C"),
+  ("CD1", "C"), ("CD2", "C"), ("CE1", "C"), ("CE2", "C"), ("CZ", "C"))
+}
+RESIDUE_ORDER = ("ALA", "LEU", "GLY", "SER", "VAL", "PHE", "LEU", "ALA")
+AVERAGE_RESIDUE_SIZE = sum([len(RESIDUES[r]) for r in RESIDUE_ORDER]) / len(RESIDUE_ORDER)
+LIGAND = (("C1", "C"), ("C2", "C"), ("C3", "C"), ("C4", "C"), ("C5", "C"), ("O6", "O"))
+CHAIN_IDS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+SPACING = 3.8
+MAXIMUM_RESIDUE_NUMBER = 9999
+
+def wrap_serial(serial):
+    """Atom serials only have five columns, so big files start again at 1."""
+
+    return ((serial - 1) % 99999) + 1
+
+
+def atom_line(record, serial, name, res_name, chain_id, res_seq, x, y, z, element):
+    return "%-6s%5d %-4s %3s %1s%4d    %8.3f%8.3f%8.3f%6.2f%6.2f          %2s  " % (
+     record, wrap_serial(serial), name if len(name) == 4 else " " + name, res_name,
+     chain_id, res_seq, x, y, z, 1.0, 20.0, element
+    )
+
+
+def anisou_line(serial, name, res_name, chain_id, res_seq, element, rng):
+    values = [rng.randint(100, 900) for _ in range(3)] + [rng.randint(-90, 90) for _ in range(3)]
+    return "ANISOU%5d %-4s %3s %1s%4d  %7d%7d%7d%7d%7d%7d      %2s  " % tuple(
+     [wrap_serial(serial), name if len(name) == 4 else " " + name, res_name, chain_id, res_seq]
+      + values + [element]
+    )
+
+
+def get_lattice_point(index, side):
+    """Places the nth point of a snaking walk through a cube of side points,
+    so that consecutive residues are always neighbours."""
+
+    layer, remainder = divmod(index, side * side)
+    row, column = divmod(remainder, side)
+    if row % 2:
+        column = side - 1 - column
+    if layer % 2:
+        row = side - 1 - row
+    return column * SPACING, row * SPACING, layer * SPACING
+
+
+def get_atom_offsets(atom_count):
+    """Spreads a residue's atoms around its centre at bonding distances."""
+
+    offsets = []
+    for index in range(atom_count):
+        angle = index * 2.4
+        height = (index / max(atom_count - 1, 1)) - 0.5
+        offsets.append((1.4 * math.cos(angle), 1.4 * math.sin(angle), 1.4 * height))
+    return offsets
+
+
+def generate_pdb(atoms=1000, chains=1, models=1, waters=0, ligands=0, anisou=False,
+                 conect=True, helix_density=0.3, sheet_density=0.2, site_density=0.02,
+                 seed=0):
+    """Returns the text of a PDB file with roughly the given number of
+    protein atoms, split between chains, plus the given numbers of waters and
+    six-atom ligands. helix_density and sheet_density are the fractions of
+    residues in HELIX and SHEET records, and site_density is the number of
+    SITE records per residue."""
+
+    rng = random.Random(seed)
+    residue_count = max(int(round(atoms / AVERAGE_RESIDUE_SIZE)), 1)
+    chains = max(chains, int(math.ceil(residue_count / MAXIMUM_RESIDUE_NUMBER)))
+    if chains > len(CHAIN_IDS):
+        raise ValueError("Too many atoms for %i chain IDs" % len(CHAIN_IDS))
+    chain_lengths = [residue_count // chains + (1 if i < residue_count % chains else 0)
+     for i in range(chains)]
+    het_count = waters + ligands
+    side = max(int(math.ceil((residue_count + het_count) ** (1 / 3))), 1)
+
+    #Lay out the residues and hets (each as chain, number, name, atoms, centre, het)
+    molecules, point = [], 0
+    for chain_index, length in enumerate(chain_lengths):
+        for number in range(1, length + 1):
+            name = RESIDUE_ORDER[(number - 1) % len(RESIDUE_ORDER)]
+            molecules.append((CHAIN_IDS[chain_index], number, name, RESIDUES[name],
+             get_lattice_point(point, side), False))
+            point += 1
+    het_chain, het_number = chains, 0
+    for index in range(het_count):
+        het_number += 1
+        if het_number > MAXIMUM_RESIDUE_NUMBER:
+            het_chain, het_number = het_chain + 1, 1
+        if het_chain >= len(CHAIN_IDS):
+            raise ValueError("Too many hets for %i chain IDs" % len(CHAIN_IDS))
+        is_ligand = index < ligands
+        molecules.append((CHAIN_IDS[het_chain], het_number, "LIG" if is_ligand else "HOH",
+         LIGAND if is_ligand else (("O", "O"),), get_lattice_point(point, side), True))
+        point += 1
+
+    lines = [
+     "HEADER    SYNTHETIC STRUCTURE                     01-JAN-00   0SYN              ",
+     "TITLE     SYNTHETIC BENCHMARK STRUCTURE OF %i ATOMS" % atoms,
+     "EXPDTA    X-RAY DIFFRACTION"
+    ]
+    if ligands:
+        lines.append("HETNAM     LIG SYNTHETIC LIGAND")
+
+    #Secondary structure and sites
+    serial, sheet_serial = 0, 0
+    for chain_index, length in enumerate(chain_lengths):
+        chain_id = CHAIN_IDS[chain_index]
+        helix_length, strand_length = 10, 5
+        position = 1
+        while position + helix_length <= length:
+            draw = rng.random()
+            if draw < helix_density:
+                serial += 1
+                end = position + helix_length - 1
+                lines.append("HELIX  %3d %3s %3s %1s %4d  %3s %1s %4d %2d%30s %5d    " % (
+                 serial % 1000, serial % 1000, RESIDUE_ORDER[(position - 1) % 8], chain_id,
+                 position, RESIDUE_ORDER[(end - 1) % 8], chain_id, end, 1, "", helix_length
+                ))
+                position = end + 1
+            elif draw < helix_density + sheet_density:
+                sheet_serial += 1
+                sheet_id = "%03i" % (sheet_serial % 1000)
+                strands = []
+                for strand in range(1, 3):
+                    end = position + strand_length - 1
+                    if end > length:
+                        break
+                    strands.append("SHEET  %3d %3s%2d %3s %1s%4d  %3s %1s%4d %2d" % (
+                     strand, sheet_id, 2, RESIDUE_ORDER[(position - 1) % 8], chain_id,
+                     position, RESIDUE_ORDER[(end - 1) % 8], chain_id, end,
+                     0 if strand == 1 else -1
+                    ))
+                    position = end + 2
+                lines += strands
+            else:
+                position += helix_length
+    site_count = int(residue_count * site_density)
+    protein = [m for m in molecules if not m[5]]
+    for site in range(site_count):
+        residues = rng.sample(protein, min(4, len(protein)))
+        lines.append("SITE     1 %3s %2d" % ("%03i" % (site % 1000), len(residues)) + "".join([
+         " %3s %1s%4d " % (r[2], r[0], r[1]) for r in residues
+        ]))
+
+    #Coordinates
+    conect_lines = []
+    for model in range(1, models + 1):
+        if models > 1:
+            lines.append("MODEL     %4d" % model)
+        serial, previous = 0, None
+        for chain_id, number, name, atom_names, centre, het in molecules + [(None,) * 6]:
+            if previous and not previous[5] and chain_id != previous[0]:
+                serial += 1
+                lines.append("TER   %5d      %3s %1s%4d" % (
+                 wrap_serial(serial), previous[2], previous[0], previous[1]
+                ))
+            if chain_id is None:
+                break
+            previous = (chain_id, number, name, atom_names, centre, het)
+            shift = (model - 1) * 0.05
+            serials = []
+            for (atom_name, element), (dx, dy, dz) in zip(atom_names, get_atom_offsets(len(atom_names))):
+                serial += 1
+                serials.append(serial)
+                x, y, z = centre[0] + dx + shift, centre[1] + dy, centre[2] + dz
+                lines.append(atom_line("HETATM" if het else "ATOM", serial, atom_name, name,
+                 chain_id, number, x, y, z, element))
+                if anisou:
+                    lines.append(anisou_line(serial, atom_name, name, chain_id, number, element, rng))
+            if conect and name == "LIG" and model == 1 and serials[-1] < 100000:
+                for index, atom_serial in enumerate(serials):
+                    conect_lines.append("CONECT%5d%5d%5d" % (
+                     atom_serial, serials[index - 1], serials[(index + 1) % len(serials)]
+                    ))
+        if models > 1:
+            lines.append("ENDMDL")
+    lines += conect_lines
+    lines.append("END")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic PDB file to stdout")
+    parser.add_argument("--atoms", type=int, default=1000)
+    parser.add_argument("--chains", type=int, default=1)
+    parser.add_argument("--models", type=int, default=1)
+    parser.add_argument("--waters", type=int, default=0)
+    parser.add_argument("--ligands", type=int, default=0)
+    parser.add_argument("--anisou", action="store_true")
+    parser.add_argument("--no-conect", action="store_true")
+    parser.add_argument("--helix-density", type=float, default=0.3)
+    parser.add_argument("--sheet-density", type=float, default=0.2)
+    parser.add_argument("--site-density", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate_pdb(
+     atoms=args.atoms, chains=args.chains, models=args.models, waters=args.waters,
+     ligands=args.ligands, anisou=args.anisou, conect=not args.no_conect,
+     helix_density=args.helix_density, sheet_density=args.sheet_density,
+     site_density=args.site_density, seed=args.seed
+    ), end="")
+
+
+if __name__ == "__main__":
+    main()
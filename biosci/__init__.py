@@ -1,20 +1,36 @@
 import os
-import subprocess
+import shutil
 
 PYMOL_LOCATION = None
 
-def run_pymol(path="", command_line=False, orders=[], output=False):
-    #Try to find pymol
-    pymol = ""
+class PymolError(Exception):
+    pass
+
+
+#The executable found by find_pymol
+_pymol_path = None
+
+def find_pymol():
+    """Returns the command used to run PyMOL (PYMOL_LOCATION if it is set), or
+    None if it can't be found. Once found, the path is remembered."""
+
+    global _pymol_path
     if PYMOL_LOCATION:
-        pymol = PYMOL_LOCATION
-    else:
-        defpath = os.defpath
-        if defpath[0] == ":":
-            defpath = defpath[1:]
-        for directory in defpath.split(":"):
-            if "pymol" in os.listdir(directory):
-                pymol = "pymol"
+        return PYMOL_LOCATION
+    if _pymol_path is None:
+        _pymol_path = shutil.which("pymol") or shutil.which("pymol", path=os.defpath)
+    return _pymol_path
+
+
+def run_pymol(path="", command_line=False, orders=[], output=False, session=None):
+    #If there is already a PyMOL session, use that
+    if session is not None:
+        session_output = session.run((['load "%s"' % path] if path else []) + list(orders))
+        if output: print(session_output)
+        return
+
+    #Try to find pymol
+    pymol = find_pymol()
 
     #If pymol was found, run it
     if pymol:
@@ -30,6 +46,130 @@ def run_pymol(path="", command_line=False, orders=[], output=False):
         if not output:
             command += " > /dev/null 2>&1"
         if output: print(command)
+        import subprocess
         subprocess.call(command, shell=True)
     else:
         print("Don't know where Pymol is - please set PYMOL_LOCATION first.")
+
+
+
+class PymolSession:
+    """A single PyMOL process, kept running without a GUI and sent commands
+    through a pipe, so that many sets of orders cost one process start."""
+
+    def __init__(self, executable=None):
+        executable = executable or find_pymol()
+        if not executable:
+            raise PymolError("Don't know where Pymol is - please set PYMOL_LOCATION first.")
+        import subprocess
+        import threading
+        self.process = subprocess.Popen(
+         [executable, "-cqp"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+         stderr=subprocess.STDOUT, universal_newlines=True, bufsize=1
+        )
+        self.commands_run = 0
+        self.lock = threading.Lock()
+
+
+    def __repr__(self):
+        return "<PymolSession (%i commands run)>" % self.commands_run
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def run(self, orders):
+        """Sends a list of PyMOL commands and waits for them to finish,
+        returning whatever PyMOL printed while running them."""
+
+        if isinstance(orders, str):
+            orders = [orders]
+        with self.lock:
+            if self.process.poll() is not None:
+                raise PymolError("PyMOL has exited")
+            self.commands_run += 1
+            marker = "biosci-done-%i" % self.commands_run
+            self.process.stdin.write("\n".join(list(orders) + ['print("%s")' % marker]) + "\n")
+            self.process.stdin.flush()
+            lines = []
+            while True:
+                line = self.process.stdout.readline()
+                if not line:
+                    raise PymolError("PyMOL exited while running commands")
+                if marker in line and "print(" not in line:
+                    break
+                lines.append(line.rstrip("\n"))
+            return "\n".join(lines)
+
+
+    def close(self):
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write("quit\n")
+                self.process.stdin.close()
+            except (BrokenPipeError, ValueError):
+                pass
+            import subprocess
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+
+def get_figure_orders(structure_path, image_path, selection, width=800, height=600, ray=True):
+    """Returns the PyMOL commands that render one figure - the structure as a
+    cartoon with the selection shown as sticks and zoomed in on."""
+
+    orders = ['load "%s", figure' % structure_path, "hide everything, figure", "show cartoon, figure"]
+    if selection:
+        orders += ["show sticks, figure & (%s)" % selection, "orient figure & (%s)" % selection]
+    else:
+        orders.append("orient figure")
+    orders += [
+     'png "%s", width=%i, height=%i, ray=%i' % (image_path, width, height, 1 if ray else 0),
+     "delete all"
+    ]
+    return orders
+
+
+def render_figures(figures, workers=None, batch_size=50, executable=None, **kwargs):
+    """Renders many figures using a pool of PyMOL sessions running side by
+    side. Each figure is a (structure path, image path, selection) tuple - the
+    selection is usually from get_pymol_selector_string. The figures are split
+    into batches, each batch is sent as one script to whichever session is
+    free, and the image paths are returned in order."""
+
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    batches = [figures[index:index + batch_size] for index in range(0, len(figures), batch_size)]
+    sessions, local = [], threading.local()
+    sessions_lock = threading.Lock()
+
+    def render_batch(batch):
+        if not hasattr(local, "session"):
+            local.session = PymolSession(executable)
+            with sessions_lock:
+                sessions.append(local.session)
+        orders = []
+        for structure_path, image_path, selection in batch:
+            orders += get_figure_orders(structure_path, image_path, selection, **kwargs)
+        local.session.run(orders)
+        return [figure[1] for figure in batch]
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            image_paths = []
+            for batch_paths in executor.map(render_batch, batches):
+                image_paths += batch_paths
+            return image_paths
+    finally:
+        for session in sessions:
+            session.close()
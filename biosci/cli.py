@@ -0,0 +1,227 @@
+"""The biosci command - runs the PDB pipeline over many files at once and
+streams one row per result as CSV or JSON lines.
+
+    biosci headers data/**/*.pdb --jobs 8
+    biosci counts structures/ --format jsonl
+    biosci contacts 1abc.pdb --cutoff 4
+    biosci distances 1abc.pdb --chain A --max-distance 8
+    biosci convert structures/ --to binary --output-dir converted/"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import argparse
+
+STRUCTURE_EXTENSIONS = (".pdb", ".ent", ".bpdb")
+
+def iter_paths(patterns, extensions=STRUCTURE_EXTENSIONS):
+    """Yields the files matched by a list of paths, glob patterns and
+    directories (which are searched recursively for structure files)."""
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for directory, subdirectories, files in os.walk(pattern):
+                subdirectories.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(extensions):
+                        yield os.path.join(directory, name)
+        else:
+            for path in sorted(glob.glob(pattern, recursive=True)) or [pattern]:
+                yield path
+
+
+def load_structure(path):
+    """Loads a PDB or binary PDB file as a PdbStructure."""
+
+    from . import pdb
+    if path.lower().endswith(".bpdb"):
+        return pdb.get_from_binary_file(path)
+    return pdb.get_from_file(path)
+
+
+def get_headers(path, options):
+    from .pdb import PdbFile, TitleSection
+    with open(path) as f:
+        title = TitleSection(PdbFile(f.read()))
+    return [{
+     "code": title.code, "classification": title.classification,
+     "date": title.date.isoformat() if title.date else None, "title": title.title,
+     "techniques": ";".join([technique for techniques in title.experimental_techniques
+      for technique in techniques]), "models": title.model_number
+    }]
+
+
+def get_counts(path, options):
+    structure = load_structure(path)
+    model = structure.model
+    elements = model.get_atom_counts()
+    return [{
+     "models": len(structure.models), "chains": len(model.chains),
+     "residues": sum([len(chain.residues) for chain in model.chains]),
+     "hets": len([het for het in model.hets if het.name != "HOH"]),
+     "waters": len([het for het in model.hets if het.name == "HOH"]),
+     "atoms": len(model.atoms), "heavy_atoms": sum(elements.values()),
+     "elements": ";".join(["%s:%i" % item for item in sorted(elements.items())])
+    }]
+
+
+def get_contacts(path, options):
+    model = load_structure(path).model
+    rows = []
+    for interface in model.get_interfaces(
+     cutoff=options["cutoff"], include_hets=not options["no_hets"]
+    ):
+        rows.append({
+         "structure1": get_structure_label(interface.structure1),
+         "structure2": get_structure_label(interface.structure2),
+         "atom_contacts": len(interface.atom_contacts),
+         "residue_contacts": len(interface.get_residue_contacts()),
+         "minimum_distance": round(min([c[2] for c in interface.atom_contacts]), 3)
+        })
+    return rows
+
+
+def get_structure_label(structure):
+    if hasattr(structure, "chain_id"):
+        return "%s:%s%i" % (structure.name, structure.chain_id or "", structure.number)
+    return structure.name
+
+
+def get_distances(path, options):
+    model = load_structure(path).model
+    rows = []
+    for chain in model.chains:
+        if options["chain"] and chain.name not in options["chain"]:
+            continue
+        atoms = [(residue, residue.get_alpha_carbon()) for residue in chain.residues]
+        for index, (residue1, atom1) in enumerate(atoms):
+            for residue2, atom2 in atoms[index + 1:]:
+                distance = atom1.distance_to(atom2)
+                if options["max_distance"] is None or distance <= options["max_distance"]:
+                    rows.append({
+                     "chain": chain.name, "residue1": residue1.number,
+                     "residue2": residue2.number, "distance": round(distance, 3)
+                    })
+    return rows
+
+
+def convert(path, options):
+    structure = load_structure(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    directory = options["output_dir"] or os.path.dirname(path)
+    if options["to"] == "binary":
+        from .pdb import write_binary_file
+        output_path = os.path.join(directory, name + ".bpdb")
+        write_binary_file(structure, output_path)
+    else:
+        from .mopac import write_mop_file
+        output_path = os.path.join(directory, name + ".mop")
+        write_mop_file(structure.model, output_path, title=name)
+    return [{"output": output_path, "bytes": os.path.getsize(output_path)}]
+
+
+#Each command's function and the columns of the rows it returns
+COMMANDS = {
+ "headers": (get_headers, ["code", "classification", "date", "title", "techniques", "models"]),
+ "counts": (get_counts, ["models", "chains", "residues", "hets", "waters", "atoms",
+  "heavy_atoms", "elements"]),
+ "contacts": (get_contacts, ["structure1", "structure2", "atom_contacts",
+  "residue_contacts", "minimum_distance"]),
+ "distances": (get_distances, ["chain", "residue1", "residue2", "distance"]),
+ "convert": (convert, ["output", "bytes"])
+}
+
+def process_file(arguments):
+    """Runs one command on one file, returning the file's rows, how long it
+    took, and the error message if it failed."""
+
+    command, path, options = arguments
+    start = time.perf_counter()
+    try:
+        rows, error = COMMANDS[command][0](path, options), None
+    except Exception as e:
+        rows, error = [], "%s: %s" % (type(e).__name__, e)
+    return path, rows, time.perf_counter() - start, error
+
+
+def iter_results(command, paths, options, jobs=1):
+    """Yields process_file's results for every path, in order, as they
+    finish - using a pool of worker processes if jobs is more than 1."""
+
+    tasks = ((command, path, options) for path in paths)
+    if jobs == 1:
+        for task in tasks:
+            yield process_file(task)
+    else:
+        import multiprocessing
+        with multiprocessing.Pool(jobs) as pool:
+            for result in pool.imap(process_file, tasks):
+                yield result
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog="biosci", description="Batch tools for PDB files")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("paths", nargs="+", help="files, glob patterns or directories")
+    common.add_argument("--jobs", "-j", type=int, default=1, help="worker processes")
+    common.add_argument("--format", "-f", choices=("csv", "jsonl"), default="csv")
+    subparsers.add_parser("headers", parents=[common], help="HEADER and TITLE information")
+    subparsers.add_parser("counts", parents=[common], help="chain, residue and atom counts")
+    contacts = subparsers.add_parser("contacts", parents=[common], help="chain/het interfaces")
+    contacts.add_argument("--cutoff", type=float, default=4)
+    contacts.add_argument("--no-hets", action="store_true", help="chains only")
+    distances = subparsers.add_parser("distances", parents=[common],
+     help="alpha carbon distance matrices")
+    distances.add_argument("--chain", action="append", help="only this chain (repeatable)")
+    distances.add_argument("--max-distance", type=float, default=None)
+    convert = subparsers.add_parser("convert", parents=[common], help="convert to another format")
+    convert.add_argument("--to", choices=("binary", "mop"), default="binary")
+    convert.add_argument("--output-dir", default=None)
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    options = {key: value for key, value in vars(args).items()
+     if key not in ("command", "paths", "jobs", "format")}
+    if options.get("output_dir"):
+        os.makedirs(options["output_dir"], exist_ok=True)
+    fields = ["file"] + COMMANDS[args.command][1] + ["seconds", "error"]
+    writer = None
+    if args.format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=fields)
+        writer.writeheader()
+
+    files, failures, start = 0, 0, time.perf_counter()
+    try:
+        for path, rows, seconds, error in iter_results(
+         args.command, iter_paths(args.paths), options, jobs=max(args.jobs, 1)
+        ):
+            files += 1
+            if error:
+                failures += 1
+            for row in rows or [{}]:
+                row = dict({"file": path}, **row)
+                row["seconds"], row["error"] = round(seconds, 4), error
+                if writer:
+                    writer.writerow(row)
+                else:
+                    sys.stdout.write(json.dumps(row) + "\n")
+            sys.stdout.flush()
+    except BrokenPipeError:
+        #The output was closed early (by head, for example)
+        sys.stderr.close()
+        return 0
+    sys.stderr.write("%i files (%i failed) in %.2f seconds\n" % (
+     files, failures, time.perf_counter() - start
+    ))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,39 @@
 from .file import *
+from .data import *
+from .structure import *
+from .library import *
+from .exceptions import *
+import importlib
+
+#Submodules that are only imported when one of their names is first used
+LAZY_IMPORTS = {
+ "batch": (
+  "get_shard_boundaries", "read_lines_between", "get_molecule_properties",
+  "process_shard", "process_library", "combine_tables", "OFFSET_COLUMN", "ERROR_COLUMN"
+ )
+}
+
+def __getattr__(name):
+    if name in LAZY_IMPORTS:
+        return importlib.import_module("." + name, __name__)
+    for module_name, names in LAZY_IMPORTS.items():
+        if name in names:
+            value = getattr(importlib.import_module("." + module_name, __name__), name)
+            globals()[name] = value
+            return value
+    raise AttributeError("module %s has no attribute %s" % (__name__, name))
+
+
+
+def get_from_file(path):
+    with open(path) as f:
+        contents = f.read()
+        mol2_file = Mol2File(contents)
+        mol2_data = Mol2DataStructure(mol2_file)
+        return Mol2Structure(mol2_data)
+
+
+#Star imports only bring in what is already loaded - the lazy names are left out so that they
+#don't import their modules, and can still be used as attributes of the package
+__all__ = [name for name in globals()
+ if not name.startswith("_") and name not in ("importlib", "LAZY_IMPORTS")]
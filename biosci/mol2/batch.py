@@ -0,0 +1,124 @@
+import os
+import multiprocessing
+from .library import MOLECULE_RTI, iter_molecule_blocks, parse_molecule_block
+
+#The columns that process_shard adds to every table
+OFFSET_COLUMN = "_mol2_offset"
+ERROR_COLUMN = "_mol2_error"
+
+def get_shard_boundaries(path, shards):
+    """Splits a mol2 file into roughly equal byte ranges, each of which starts
+    at a MOLECULE RTI so that no molecule is split between two ranges."""
+
+    size = os.path.getsize(path)
+    starts = []
+    with open(path, "rb") as f:
+        for shard in range(shards):
+            f.seek((size * shard) // shards)
+            if shard:
+                f.readline() #Might be part way through a line
+            while True:
+                position = f.tell()
+                line = f.readline()
+                if not line:
+                    position = size
+                    break
+                if line.lstrip().startswith(MOLECULE_RTI):
+                    break
+            if position < size and (not starts or position > starts[-1]):
+                starts.append(position)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def read_lines_between(path, start, end):
+    """Yields the lines of a file that begin between two byte offsets."""
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if position >= end:
+                break
+            yield line
+            position += len(line)
+
+
+def get_molecule_properties(molecule):
+    """The default per-molecule calculation - basic counts, mass and
+    centroid."""
+
+    return {
+     "name": molecule.name,
+     "atom_count": len(molecule.atoms),
+     "heavy_atom_count": len([a for a in molecule.atoms if a.element != "H"]),
+     "bond_count": len(molecule.get_bonds()),
+     "mass": molecule.mass,
+     "centroid_x": molecule.average_x() if molecule.atoms else None,
+     "centroid_y": molecule.average_y() if molecule.atoms else None,
+     "centroid_z": molecule.average_z() if molecule.atoms else None
+    }
+
+
+def process_shard(arguments):
+    """Applies a function to every molecule in one byte range of a mol2 file,
+    and returns the results as a table of columns - one for every key that any
+    molecule's row has, with None where a row lacks it. Each row also gets the
+    byte offset of its molecule (for use with a Mol2Index) and the error
+    message if the molecule couldn't be parsed or processed, under the
+    reserved OFFSET_COLUMN and ERROR_COLUMN names."""
+
+    path, start, end, function = arguments
+    offsets, rows, errors = [], [], []
+    for offset, text in iter_molecule_blocks(read_lines_between(path, start, end)):
+        try:
+            row, error = function(parse_molecule_block(text)), None
+        except Exception as e:
+            row, error = {}, "%s: %s" % (type(e).__name__, e)
+        offsets.append(start + offset)
+        rows.append(row)
+        errors.append(error)
+    keys = {}
+    for row in rows:
+        for key in row:
+            if key not in (OFFSET_COLUMN, ERROR_COLUMN):
+                keys[key] = None
+    table = {OFFSET_COLUMN: offsets}
+    for key in keys:
+        table[key] = [row.get(key) for row in rows]
+    table[ERROR_COLUMN] = errors
+    return table
+
+
+def process_library(path, function=get_molecule_properties, processes=None, shards=None):
+    """Applies a function to every molecule in a mol2 library using a pool of
+    worker processes, yielding one table of columns per shard, in file order,
+    as they are finished. The function must return a dictionary for each
+    molecule, and must be defined at module level so that it can be sent to
+    the workers."""
+
+    processes = processes or multiprocessing.cpu_count()
+    shards = shards or processes * 4
+    arguments = [(path, start, end, function)
+     for start, end in get_shard_boundaries(path, shards)]
+    if processes == 1:
+        for argument in arguments:
+            yield process_shard(argument)
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            for table in pool.imap(process_shard, arguments):
+                yield table
+
+
+def combine_tables(tables):
+    """Joins a sequence of tables of columns into one table. A column missing
+    from some of the tables is filled with None for their rows."""
+
+    combined, length = {}, 0
+    for table in tables:
+        rows = max([len(values) for values in table.values()] or [0])
+        for key, values in table.items():
+            combined.setdefault(key, [None] * length).extend(values)
+        length += rows
+        for values in combined.values():
+            values.extend([None] * (length - len(values)))
+    return combined
@@ -0,0 +1,129 @@
+from array import array
+from .exceptions import *
+from .file import RtiRecord, DataRecord
+
+class Mol2DataStructure:
+    """A processed Mol2File, with each molecule's atoms, bonds and
+    substructures held as columns rather than as one object per line."""
+
+    def __init__(self, mol2_file):
+        self.file = mol2_file
+
+        #Split the records into molecules, and each molecule into sections
+        self.molecules = []
+        sections, section = None, None
+        for record in self.file.records:
+            if isinstance(record, RtiRecord):
+                if record.name == "MOLECULE":
+                    sections = {}
+                    self.molecules.append(sections)
+                elif sections is None:
+                    raise Mol2DataError(
+                     "%s section found before any MOLECULE" % record.name
+                    )
+                section = sections.setdefault(record.name, [])
+            elif isinstance(record, DataRecord) and section is not None:
+                section.append(record)
+        self.molecules = [process_molecule(sections) for sections in self.molecules]
+
+
+
+def process_molecule(sections):
+    """Takes the records of one molecule, grouped by RTI name, and turns them
+    into a dictionary of values and columns."""
+
+    molecule = {}
+
+    #Process MOLECULE
+    lines = [r.text.strip() for r in sections["MOLECULE"]]
+    if len(lines) < 2:
+        raise Mol2DataError("MOLECULE section needs a name and atom counts")
+    molecule["name"] = lines[0]
+    try:
+        counts = [int(c) for c in lines[1].split()]
+    except ValueError:
+        raise Mol2DataError("Malformatted molecule counts: %s" % lines[1])
+    counts += [0] * (5 - len(counts))
+    (molecule["atom_count"], molecule["bond_count"], molecule["substructure_count"],
+     molecule["feature_count"], molecule["set_count"]) = counts[:5]
+    molecule["molecule_type"] = lines[2] if len(lines) > 2 else None
+    molecule["charge_type"] = lines[3] if len(lines) > 3 else None
+    molecule["status_bits"] = lines[4] if len(lines) > 4 else None
+    molecule["comment"] = lines[5] if len(lines) > 5 else None
+
+    #Process ATOMs
+    molecule["atoms"] = process_atoms(sections.get("ATOM", []))
+    if len(molecule["atoms"]["id"]) != molecule["atom_count"]:
+        raise Mol2DataError("%s should have %i atoms but has %i" % (
+         molecule["name"], molecule["atom_count"], len(molecule["atoms"]["id"])
+        ))
+
+    #Process BONDs
+    molecule["bonds"] = process_bonds(sections.get("BOND", []))
+
+    #Process SUBSTRUCTUREs
+    molecule["substructures"] = process_substructures(sections.get("SUBSTRUCTURE", []))
+    return molecule
+
+
+def process_atoms(records):
+    """Turns ATOM records into columns."""
+
+    columns = {
+     "id": [], "name": [], "x": array("d"), "y": array("d"), "z": array("d"),
+     "type": [], "subst_id": [], "subst_name": [], "charge": []
+    }
+    for record in records:
+        fields = record.text.split()
+        if len(fields) < 6:
+            raise Mol2DataError("Malformatted ATOM line: %s" % record.text)
+        try:
+            columns["id"].append(int(fields[0]))
+            columns["x"].append(float(fields[2]))
+            columns["y"].append(float(fields[3]))
+            columns["z"].append(float(fields[4]))
+            columns["subst_id"].append(int(fields[6]) if len(fields) > 6 else None)
+            columns["charge"].append(float(fields[8]) if len(fields) > 8 else None)
+        except ValueError:
+            raise Mol2DataError("Malformatted ATOM line: %s" % record.text)
+        columns["name"].append(fields[1])
+        columns["type"].append(fields[5])
+        columns["subst_name"].append(fields[7] if len(fields) > 7 else None)
+    return columns
+
+
+def process_bonds(records):
+    """Turns BOND records into columns."""
+
+    columns = {"id": [], "origin": [], "target": [], "type": []}
+    for record in records:
+        fields = record.text.split()
+        if len(fields) < 4:
+            raise Mol2DataError("Malformatted BOND line: %s" % record.text)
+        try:
+            columns["id"].append(int(fields[0]))
+            columns["origin"].append(int(fields[1]))
+            columns["target"].append(int(fields[2]))
+        except ValueError:
+            raise Mol2DataError("Malformatted BOND line: %s" % record.text)
+        columns["type"].append(fields[3])
+    return columns
+
+
+def process_substructures(records):
+    """Turns SUBSTRUCTURE records into columns."""
+
+    columns = {"id": [], "name": [], "root_atom": [], "type": [], "chain": []}
+    for record in records:
+        fields = record.text.split()
+        if len(fields) < 3:
+            raise Mol2DataError("Malformatted SUBSTRUCTURE line: %s" % record.text)
+        try:
+            columns["id"].append(int(fields[0]))
+            columns["root_atom"].append(int(fields[2]))
+        except ValueError:
+            raise Mol2DataError("Malformatted SUBSTRUCTURE line: %s" % record.text)
+        columns["name"].append(fields[1])
+        columns["type"].append(fields[3] if len(fields) > 3 else None)
+        columns["chain"].append(fields[5] if len(fields) > 5 else None)
+    return columns
@@ -0,0 +1,128 @@
+import json
+from .exceptions import *
+from .file import Mol2File
+from .data import Mol2DataStructure
+from .structure import Mol2Molecule
+
+MOLECULE_RTI = b"@<TRIPOS>MOLECULE"
+
+def iter_molecule_blocks(handle):
+    """Takes a mol2 file opened in binary mode and yields the byte offset and
+    text of each molecule in turn, so that only one molecule is ever held in
+    memory."""
+
+    offset, block_offset, block = 0, None, None
+    for line in handle:
+        if line.lstrip().startswith(MOLECULE_RTI):
+            if block is not None:
+                yield block_offset, b"".join(block).decode()
+            block_offset, block = offset, []
+        if block is not None:
+            block.append(line)
+        offset += len(line)
+    if block is not None:
+        yield block_offset, b"".join(block).decode()
+
+
+def parse_molecule_block(text):
+    """Turns the text of a single molecule into a Mol2Molecule."""
+
+    molecules = Mol2DataStructure(Mol2File(text)).molecules
+    if len(molecules) != 1:
+        raise Mol2FileError("Expected one molecule but found %i" % len(molecules))
+    return Mol2Molecule(molecules[0])
+
+
+def iter_molecules(handle):
+    """Takes a mol2 file opened in binary mode and yields its molecules one
+    at a time as Mol2Molecule objects."""
+
+    for offset, text in iter_molecule_blocks(handle):
+        yield parse_molecule_block(text)
+
+
+def get_block_name(text):
+    """Gets the molecule name from the text of a molecule block - the first
+    non-blank line after the MOLECULE RTI."""
+
+    for line in text.split("\n")[1:]:
+        if line.strip() and not line.strip().startswith("#"):
+            return line.strip()
+
+
+
+class Mol2Index:
+    """A byte-offset index of the molecules in a (possibly very large) mol2
+    file, allowing any molecule to be read by ordinal or name without reading
+    the rest of the file."""
+
+    def __init__(self, path, offsets=None, names=None):
+        self.path = path
+        if offsets is None:
+            offsets, names = [], []
+            with open(path, "rb") as f:
+                for offset, text in iter_molecule_blocks(f):
+                    offsets.append(offset)
+                    names.append(get_block_name(text))
+        self.offsets = offsets
+        self.names = names
+        self.ordinals_by_name = {}
+        for ordinal, name in enumerate(self.names):
+            self.ordinals_by_name.setdefault(name, []).append(ordinal)
+
+
+    def __repr__(self):
+        return "<Mol2Index of %s (%i molecules)>" % (self.path, len(self.offsets))
+
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+    def __getitem__(self, ordinal):
+        return self.get_molecule(ordinal)
+
+
+    def get_molecule_text(self, ordinal):
+        """Reads the text of a single molecule directly from the file."""
+
+        start = self.offsets[ordinal]
+        end = self.offsets[ordinal + 1] if ordinal + 1 < len(self.offsets) else None
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return (f.read(end - start) if end is not None else f.read()).decode()
+
+
+    def get_molecule(self, ordinal):
+        return parse_molecule_block(self.get_molecule_text(ordinal))
+
+
+    def get_molecules_by_name(self, name):
+        """Returns all molecules with a given name (docking libraries often
+        contain several poses of the same ligand)."""
+
+        return [self.get_molecule(o) for o in self.ordinals_by_name.get(name, [])]
+
+
+    def get_molecule_by_name(self, name):
+        """Returns the first molecule with a given name."""
+
+        ordinals = self.ordinals_by_name.get(name)
+        if ordinals:
+            return self.get_molecule(ordinals[0])
+
+
+    def save(self, index_path):
+        """Saves the index so that the mol2 file needn't be scanned again."""
+
+        with open(index_path, "w") as f:
+            json.dump({"offsets": self.offsets, "names": self.names}, f)
+
+
+    @staticmethod
+    def load(path, index_path):
+        """Loads an index previously saved for the mol2 file at path."""
+
+        with open(index_path) as f:
+            index = json.load(f)
+        return Mol2Index(path, offsets=index["offsets"], names=index["names"])
@@ -0,0 +1,113 @@
+from .exceptions import *
+from ..pdb.structure import Atom, AtomicStructure, PERIODIC_TABLE
+
+class Mol2Structure:
+    """A representation of the contents of a mol2 file."""
+
+    def __init__(self, mol2_data):
+        self.data = mol2_data
+
+        self.molecules = [Mol2Molecule(m) for m in self.data.molecules]
+        if not self.molecules:
+            raise Mol2StructureError("There are no molecules in this mol2 file")
+        self.molecule = self.molecules[0]
+
+
+    def __repr__(self):
+        return "<Mol2Structure (%i molecule%s)>" % (
+         len(self.molecules), "" if len(self.molecules) == 1 else "s"
+        )
+
+
+    def get_molecule_by_name(self, name):
+        for molecule in self.molecules:
+            if molecule.name == name:
+                return molecule
+
+
+
+class Mol2Molecule(AtomicStructure):
+    """A molecule in a mol2 file. Its atoms and bonds are the same Atom and
+    ChemicalBond objects that PDB structures use."""
+
+    def __init__(self, molecule_dict):
+        self.name = molecule_dict["name"]
+        self.molecule_type = molecule_dict["molecule_type"]
+        self.charge_type = molecule_dict["charge_type"]
+        self.comment = molecule_dict["comment"]
+
+        #Get atoms
+        columns = molecule_dict["atoms"]
+        atoms = []
+        for index, atom_id in enumerate(columns["id"]):
+            atom = Atom({
+             "serial": atom_id,
+             "name": columns["name"][index],
+             "i_code": None,
+             "x": columns["x"][index],
+             "y": columns["y"][index],
+             "z": columns["z"][index],
+             "occupancy": None,
+             "temp_factor": None,
+             "element": get_element(columns["type"][index]),
+             "charge": columns["charge"][index]
+            })
+            atom.atom_type = columns["type"][index]
+            atom.model = self
+            atom.molecule = self
+            atoms.append(atom)
+        AtomicStructure.__init__(self, atoms)
+
+        #Get bonds
+        atoms_by_id = {atom.number: atom for atom in self.atoms}
+        bonds = molecule_dict["bonds"]
+        for origin, target, bond_type in zip(bonds["origin"], bonds["target"], bonds["type"]):
+            if origin not in atoms_by_id or target not in atoms_by_id:
+                raise Mol2StructureError(
+                 "Bond between %i and %i refers to a missing atom" % (origin, target)
+                )
+            atoms_by_id[origin].bond(atoms_by_id[target], bond_type=bond_type)
+
+        #Get substructures
+        substructures = molecule_dict["substructures"]
+        atoms_by_subst_id = {}
+        for atom, subst_id in zip(self.atoms, columns["subst_id"]):
+            atoms_by_subst_id.setdefault(subst_id, []).append(atom)
+        self.substructures = []
+        for index, subst_id in enumerate(substructures["id"]):
+            substructure = Mol2Substructure(
+             subst_id, substructures["name"][index], substructures["type"][index],
+             substructures["chain"][index], list(atoms_by_subst_id.get(subst_id, ()))
+            )
+            self.substructures.append(substructure)
+
+
+    def __repr__(self):
+        return "<Mol2Molecule %s (%i atoms)>" % (self.name, len(self.atoms))
+
+
+
+class Mol2Substructure(AtomicStructure):
+    """A substructure (such as a residue) of a mol2 molecule."""
+
+    def __init__(self, number, name, substructure_type, chain_id, atoms):
+        self.number = number
+        self.name = name
+        self.substructure_type = substructure_type
+        self.chain_id = chain_id
+        AtomicStructure.__init__(self, atoms)
+        for atom in self.atoms:
+            atom.molecule = self
+
+
+    def __repr__(self):
+        return "<%s (%i atom%s)>" % (self.name, len(self.atoms), "" if len(self.atoms) == 1 else "s")
+
+
+
+def get_element(atom_type):
+    """Gets the element from a SYBYL atom type, such as C.ar or Cl. Types that
+    aren't elements (dummy atoms, lone pairs etc.) are given X."""
+
+    element = atom_type.split(".")[0].upper()
+    return element if element in PERIODIC_TABLE else "X"
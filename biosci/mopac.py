@@ -1,109 +1,889 @@
-from __future__ import print_function
-import subprocess
-import datetime
-import os
-
-MOPAC_LOCATION = None
-
-#A quick and dirty function for writing to the log
-def write_to_log(log, line, send_back=True):
-    line = datetime.datetime.strftime(datetime.datetime.now(), "%d %b %Y, %H:%M:%S") + ": " + line
-    if log is not None:
-        f = open(log, "a")
-        f.write(line + "\n")
-        f.close()
-    if send_back or log is None:
-        return line
-
-
-#Assigns keywords to a .mop file (whatever the top line is to begin with will be removed)
-def give_keywords(mop_path, keywords):
-    f = open(mop_path, "r")
-    lines = f.readlines()
-    f.close()
-    f = open(mop_path, "w")
-    f.writelines([keywords + "\n"] + lines[1:])
-    f.close()
-
-
-#gets the keywords of a .mop file
-def get_keywords(mop_path):
-    f = open(mop_path, "r")
-    lines = f.readlines()
-    f.close()
-    return lines[0].strip()
-
-
-#Get path of file name (the location of the file without the file name itself)
-def get_path(file_name, symbol_if_this=""):
-    #Is there a path?
-    if os.sep in file_name:
-        #yes
-        return os.sep.join(file_name.split(os.sep)[:-1]) + os.sep
-    else:
-        return symbol_if_this
-
-
-#Get the file_name from a path
-def get_file_name(path):
-    if os.sep in path:
-        return path.split(os.sep)[-1]
-    else:
-        return path
-
-
-#Get all of the file path before the file extension
-def get_pre_dot(file_path):
-    file_name = get_file_name(file_path)
-    if "." in file_name:
-        file_name = ".".join(file_name.split(".")[:-1])
-    return get_path(file_path) + file_name
-
-
-#Check if MOPAC_LOCATION is set
-def check_mopac_location(func):
-    def new_func(*args, **kwargs):
-        if MOPAC_LOCATION is not None:
-            func(*args, **kwargs)
-        else:
-            print("You must set the MOPAC_LOCATION constant first.")
-
-    return new_func
-
-
-#Run MOPAC on a .mop file
-@check_mopac_location
-def run_mopac(mop_path, log=None, delete=False):
-    #What files are present right now?
-    start_files = os.listdir(get_path(mop_path, symbol_if_this="./"))
-
-    #Run MOPAC
-    print(write_to_log(log,
-     "Running MOPAC (with %s as keywords) on %s..." % (get_keywords(mop_path), mop_path)))
-    os.environ["LD_LIBRARY_PATH"] = MOPAC_LOCATION
-    os.environ["MOPAC_LICENSE"] = MOPAC_LOCATION
-    subprocess.call("%s/MOPAC2012.exe %s" % (MOPAC_LOCATION, mop_path), shell=True)
-    print(write_to_log(log, "MOPAC run of %s complete" % mop_path))
-
-    #Delete files
-    if delete:
-        for f in os.listdir(get_path(mop_path, symbol_if_this="./")):
-            if f not in start_files and ".pdb" not in f and ".mop" not in f:
-                print(write_to_log(log, "Removing %s." % (get_path(mop_path) + f)))
-                os.remove(get_path(mop_path) + f)
-
-
-#Run MOPAC on a PDB file (REQUIRES OPENBABEL CURRENTLY)
-@check_mopac_location
-def run_mopac_pdb(pdb_path, suffix="_", keywords="PDBOUT", log=None, delete=False):
-
-    #Convert to MOP
-    mop_name = get_pre_dot(pdb_path) + suffix + ".mop"
-    print(write_to_log(log, "Converting %s to %s" % (pdb_path, mop_name)))
-    subprocess.call("babel -ipdb %s -omop %s" % (pdb_path, mop_name), shell=True)
-
-    #Give MOPAC keywords
-    give_keywords(mop_name, keywords)
-
-    #Run MOPAC
-    run_mopac(mop_name, log=log, delete=delete)
+from __future__ import print_function
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import threading
+import re
+import signal
+import datetime
+import json
+import hashlib
+import tempfile
+import shutil
+import time
+import os
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MOPAC_LOCATION = None
+MOPAC_EXECUTABLE = "MOPAC2012.exe"
+MOPAC_OUTPUTS = (".out", ".arc")
+
+class MopacError(Exception):
+    pass
+
+
+#A quick and dirty function for writing to the log (which can be a path or a MopacLog)
+def write_to_log(log, line, send_back=True):
+    if isinstance(log, MopacLog):
+        log.event("message", message=line)
+        log = None
+    line = datetime.datetime.strftime(datetime.datetime.now(), "%d %b %Y, %H:%M:%S") + ": " + line
+    if log is not None:
+        f = open(log, "a")
+        f.write(line + "\n")
+        f.close()
+    if send_back or log is None:
+        return line
+
+
+#A buffered log of MOPAC job events, written as JSON lines. Events are held in memory and
+#written in a single append when the buffer fills (or on flush/close), so lines from
+#different threads or processes sharing the file never interleave.
+class MopacLog:
+
+    def __init__(self, path, buffer_size=100):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.lock = threading.Lock()
+
+
+    def __repr__(self):
+        return "<MopacLog %s (%i buffered)>" % (self.path, len(self.buffer))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    #Record an event, such as queued, started or finished
+    def event(self, event, job=None, **fields):
+        record = {"time": time.time(), "event": event, "job": job, "pid": os.getpid()}
+        record.update(fields)
+        line = json.dumps(record, sort_keys=True) + "\n"
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.buffer_size:
+                self.write_buffer()
+
+
+    def flush(self):
+        with self.lock:
+            self.write_buffer()
+
+
+    def close(self):
+        self.flush()
+
+
+    #Write everything in the buffer with one system call - the lock must already be held
+    def write_buffer(self):
+        if not self.buffer:
+            return
+        data = "".join(self.buffer).encode()
+        self.buffer = []
+        descriptor = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(descriptor, fcntl.LOCK_EX)
+            while data:
+                data = data[os.write(descriptor, data):]
+        finally:
+            if fcntl:
+                fcntl.flock(descriptor, fcntl.LOCK_UN)
+            os.close(descriptor)
+
+
+
+#Read the events from a MopacLog file
+def read_log_events(path):
+    events = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                events.append(json.loads(line))
+    return events
+
+
+#Summarise the jobs in a MopacLog file - wall time, queueing time and exit code per job,
+#plus totals, for tuning how many workers to use
+def summarise_log(path):
+    jobs = {}
+    for event in read_log_events(path):
+        if event["job"] is None:
+            continue
+        job = jobs.setdefault(event["job"], {
+         "queued": None, "started": None, "finished": None,
+         "wall_time": None, "wait_time": None, "exit_code": None
+        })
+        if event["event"] in ("queued", "started", "finished"):
+            job[event["event"]] = event["time"]
+        if event["event"] == "finished":
+            job["exit_code"] = event.get("exit_code")
+    for job in jobs.values():
+        if job["started"] is not None and job["finished"] is not None:
+            job["wall_time"] = job["finished"] - job["started"]
+        if job["queued"] is not None and job["started"] is not None:
+            job["wait_time"] = job["started"] - job["queued"]
+    wall_times = [j["wall_time"] for j in jobs.values() if j["wall_time"] is not None]
+    wait_times = [j["wait_time"] for j in jobs.values() if j["wait_time"] is not None]
+    return {
+     "jobs": jobs,
+     "job_count": len(jobs),
+     "finished_count": len(wall_times),
+     "failed_count": len([j for j in jobs.values() if j["exit_code"] not in (None, 0)]),
+     "total_wall_time": sum(wall_times),
+     "mean_wall_time": sum(wall_times) / len(wall_times) if wall_times else None,
+     "max_wall_time": max(wall_times) if wall_times else None,
+     "mean_wait_time": sum(wait_times) / len(wait_times) if wait_times else None
+    }
+
+
+#Assigns keywords to a .mop file (whatever the top line is to begin with will be removed)
+def give_keywords(mop_path, keywords):
+    f = open(mop_path, "r")
+    lines = f.readlines()
+    f.close()
+    f = open(mop_path, "w")
+    f.writelines([keywords + "\n"] + lines[1:])
+    f.close()
+
+
+#gets the keywords of a .mop file
+def get_keywords(mop_path):
+    f = open(mop_path, "r")
+    lines = f.readlines()
+    f.close()
+    return lines[0].strip()
+
+
+#Get path of file name (the location of the file without the file name itself)
+def get_path(file_name, symbol_if_this=""):
+    #Is there a path?
+    if os.sep in file_name:
+        #yes
+        return os.sep.join(file_name.split(os.sep)[:-1]) + os.sep
+    else:
+        return symbol_if_this
+
+
+#Get the file_name from a path
+def get_file_name(path):
+    if os.sep in path:
+        return path.split(os.sep)[-1]
+    else:
+        return path
+
+
+#Get all of the file path before the file extension
+def get_pre_dot(file_path):
+    file_name = get_file_name(file_path)
+    if "." in file_name:
+        file_name = ".".join(file_name.split(".")[:-1])
+    return get_path(file_path) + file_name
+
+
+#Check if MOPAC_LOCATION is set
+def check_mopac_location(func):
+    def new_func(*args, **kwargs):
+        if MOPAC_LOCATION is not None:
+            return func(*args, **kwargs)
+        else:
+            print("You must set the MOPAC_LOCATION constant first.")
+
+    return new_func
+
+
+#Get the command that runs MOPAC on a .mop file
+def get_mopac_command(mop_path, executable=None):
+    if executable is None:
+        if MOPAC_LOCATION is None:
+            raise MopacError("You must set the MOPAC_LOCATION constant first.")
+        executable = os.path.join(MOPAC_LOCATION, MOPAC_EXECUTABLE)
+    return [executable, mop_path]
+
+
+#Get a copy of the environment with the variables MOPAC needs - os.environ itself is left alone
+def get_mopac_environment(location=None, extra=None):
+    location = location or MOPAC_LOCATION
+    environment = dict(os.environ)
+    if location is not None:
+        environment["LD_LIBRARY_PATH"] = location
+        environment["MOPAC_LICENSE"] = location
+    if extra:
+        environment.update(extra)
+    return environment
+
+
+#Run MOPAC on a .mop file
+@check_mopac_location
+def run_mopac(mop_path, log=None, delete=False, keywords=None, isolate=False, outputs=MOPAC_OUTPUTS):
+    print(write_to_log(log,
+     "Running MOPAC (with %s as keywords) on %s..." % (keywords or get_keywords(mop_path), mop_path)))
+
+    #Run in a scratch directory, keeping only the declared outputs
+    if isolate:
+        with ScratchDirectory(mop_path, outputs=outputs) as scratch:
+            subprocess.call(get_mopac_command(scratch.mop_path),
+             env=get_mopac_environment(), cwd=scratch.path)
+        print(write_to_log(log, "MOPAC run of %s complete" % mop_path))
+        for path in scratch.harvested:
+            print(write_to_log(log, "Kept %s." % path))
+        return
+
+    #What files are present right now?
+    start_files = os.listdir(get_path(mop_path, symbol_if_this="./"))
+
+    #Run MOPAC
+    subprocess.call(get_mopac_command(mop_path), env=get_mopac_environment())
+    print(write_to_log(log, "MOPAC run of %s complete" % mop_path))
+
+    #Delete files
+    if delete:
+        for f in os.listdir(get_path(mop_path, symbol_if_this="./")):
+            if f not in start_files and ".pdb" not in f and ".mop" not in f:
+                print(write_to_log(log, "Removing %s." % (get_path(mop_path) + f)))
+                os.remove(get_path(mop_path) + f)
+
+
+#Run MOPAC on a PDB file (the first model is used)
+@check_mopac_location
+def run_mopac_pdb(pdb_path, suffix="_", keywords="PDBOUT", log=None, delete=False):
+    from .pdb import get_from_file
+
+    #Convert to MOP
+    mop_name = get_pre_dot(pdb_path) + suffix + ".mop"
+    print(write_to_log(log, "Converting %s to %s" % (pdb_path, mop_name)))
+    write_mop_file(get_from_file(pdb_path).model, mop_name, keywords=keywords)
+
+    #Run MOPAC
+    run_mopac(mop_name, log=log, delete=delete, keywords=keywords)
+
+
+#Turn keywords given as a list into a keyword line
+def format_keywords(keywords):
+    if isinstance(keywords, str):
+        return keywords.strip()
+    return " ".join([str(k).strip() for k in keywords])
+
+
+#Produce the text of a .mop file (in cartesian coordinates) for any atomic structure
+def get_mop_text(atomic_structure, keywords="PDBOUT", title="", comment="", optimise=True):
+    lines = [format_keywords(keywords), title, comment]
+    flag = 1 if optimise else 0
+    for atom in atomic_structure.atoms:
+        if not atom.element:
+            raise MopacError("Atom %s has no element" % atom.number)
+        lines.append("%-2s %12.6f %i %12.6f %i %12.6f %i" % (
+         atom.element.capitalize(), atom.x, flag, atom.y, flag, atom.z, flag
+        ))
+    return "\n".join(lines) + "\n"
+
+
+#Write a .mop file for an atomic structure
+def write_mop_file(atomic_structure, mop_path, keywords="PDBOUT", **kwargs):
+    with open(mop_path, "w") as f:
+        f.write(get_mop_text(atomic_structure, keywords=keywords, **kwargs))
+    return mop_path
+
+
+#Write .mop files for many atomic structures (whole models, residue subsets etc.) at once
+def write_mop_files(atomic_structures, directory, keywords="PDBOUT", names=None, **kwargs):
+    keyword_line = format_keywords(keywords)
+    paths = []
+    for index, atomic_structure in enumerate(atomic_structures):
+        name = names[index] if names else "structure%i" % (index + 1)
+        paths.append(write_mop_file(
+         atomic_structure, os.path.join(directory, name + ".mop"), keywords=keyword_line, **kwargs
+        ))
+    return paths
+
+
+#A private directory for a single MOPAC run. The .mop file is copied in, MOPAC is run there,
+#the declared outputs are moved back next to the .mop file, and everything else is removed.
+class ScratchDirectory:
+
+    def __init__(self, mop_path, outputs=MOPAC_OUTPUTS, root=None):
+        self.original_mop_path = os.path.abspath(mop_path)
+        self.destination = os.path.dirname(self.original_mop_path)
+        self.root = root or self.destination
+        self.outputs = outputs
+        self.path, self.mop_path = None, None
+        self.harvested = []
+
+
+    def __repr__(self):
+        return "<ScratchDirectory %s>" % self.path
+
+
+    def __enter__(self):
+        self.path = tempfile.mkdtemp(prefix=".mopac-", dir=self.root)
+        self.mop_path = os.path.join(self.path, os.path.basename(self.original_mop_path))
+        shutil.copyfile(self.original_mop_path, self.mop_path)
+        return self
+
+
+    def __exit__(self, *args):
+        self.harvest()
+        self.remove()
+
+
+    #Move the declared outputs back (each move is a single rename when on the same file system)
+    def harvest(self):
+        stem = get_pre_dot(os.path.basename(self.mop_path))
+        for extension in self.outputs:
+            name = stem + extension
+            if os.path.exists(os.path.join(self.path, name)):
+                destination = os.path.join(self.destination, name)
+                shutil.move(os.path.join(self.path, name), destination)
+                self.harvested.append(destination)
+        return self.harvested
+
+
+    #Rename the directory out of the way in one step, then delete it
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            doomed = self.path + ".removing"
+            os.rename(self.path, doomed)
+            shutil.rmtree(doomed, ignore_errors=True)
+
+
+#Kill a process along with anything it has started
+def kill_process(process):
+    if os.name == "posix":
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    else:
+        process.kill()
+
+
+#A single MOPAC run, as handled by a MopacScheduler
+class MopacJob:
+
+    def __init__(self, mop_path, command, environment, working_directory=None, timeout=None,
+     isolate=False, outputs=MOPAC_OUTPUTS, log=None):
+        self.mop_path = mop_path
+        self.command = command
+        self.environment = environment
+        self.working_directory = working_directory
+        self.timeout = timeout
+        self.isolate = isolate
+        self.outputs = outputs
+        self.log = log
+        self.process = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+
+    def __repr__(self):
+        return "<MopacJob %s>" % self.mop_path
+
+
+    #Stop the job - if it is running its process is killed
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.process is not None and self.process.poll() is None:
+                kill_process(self.process)
+
+
+    #Run the job in the current thread and return a MopacResult
+    def run(self):
+        if self.isolate:
+            with ScratchDirectory(self.mop_path, outputs=self.outputs,
+             root=self.working_directory) as scratch:
+                result = self.run_process(self.command[:-1] + [scratch.mop_path], scratch.path)
+            result.outputs = scratch.harvested
+            return result
+        return self.run_process(self.command, self.working_directory)
+
+
+    def run_process(self, command, working_directory):
+        with self.lock:
+            if self.cancelled:
+                return MopacResult(self, None, 0, "", cancelled=True)
+            start = time.time()
+            self.process = subprocess.Popen(
+             command, cwd=working_directory, env=self.environment,
+             stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True,
+             start_new_session=(os.name == "posix")
+            )
+        if self.log is not None:
+            self.log.event("started", job=self.mop_path, process=self.process.pid)
+        timed_out = False
+        try:
+            output, _ = self.process.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            kill_process(self.process)
+            output, _ = self.process.communicate()
+            timed_out = True
+        result = MopacResult(
+         self, self.process.returncode, time.time() - start, output,
+         timed_out=timed_out, cancelled=self.cancelled
+        )
+        if self.log is not None:
+            self.log.event("finished", job=self.mop_path, duration=result.duration,
+             exit_code=result.return_code, timed_out=timed_out, cancelled=result.cancelled)
+        return result
+
+
+
+#What happened when a MopacJob was run
+class MopacResult:
+
+    def __init__(self, job, return_code, duration, output, timed_out=False, cancelled=False):
+        self.job = job
+        self.return_code = return_code
+        self.duration = duration
+        self.output = output
+        self.timed_out = timed_out
+        self.cancelled = cancelled
+        self.outputs = []
+
+
+    def __repr__(self):
+        if self.cancelled:
+            status = "cancelled"
+        elif self.timed_out:
+            status = "timed out"
+        else:
+            status = "exit code %s" % self.return_code
+        return "<MopacResult %s (%s, %.1fs)>" % (self.job.mop_path, status, self.duration)
+
+
+    @property
+    def succeeded(self):
+        return self.return_code == 0 and not self.timed_out and not self.cancelled
+
+
+
+#Runs many MOPAC jobs at once, never more than max_workers at a time. Each job
+#gets its own copy of the environment and (unless isolate is turned off) its own
+#scratch directory, and submitting a job returns a future for its MopacResult.
+class MopacScheduler:
+
+    def __init__(self, max_workers=None, location=None, executable=None, timeout=None, log=None,
+     isolate=True):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.log = log
+        self.location = location
+        self.executable = executable
+        self.timeout = timeout
+        self.isolate = isolate
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.futures = []
+
+
+    def __repr__(self):
+        return "<MopacScheduler (%i workers)>" % self.max_workers
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+
+    #Queue a .mop file to be run - the future returned has the job as future.job. An
+    #isolated job (the scheduler's default) runs in its own scratch directory, made inside
+    #working_directory, and only the outputs are kept - otherwise it runs in working_directory.
+    #working_directory defaults to the .mop file's directory.
+    def submit(self, mop_path, timeout=None, working_directory=None, environment=None,
+     isolate=None, outputs=MOPAC_OUTPUTS):
+        mop_path = os.path.abspath(mop_path)
+        executable = self.executable
+        if executable is None and self.location is not None:
+            executable = os.path.join(self.location, MOPAC_EXECUTABLE)
+        job = MopacJob(
+         mop_path,
+         get_mopac_command(mop_path, executable=executable),
+         get_mopac_environment(self.location, extra=environment),
+         working_directory=working_directory or os.path.dirname(mop_path),
+         timeout=timeout if timeout is not None else self.timeout,
+         isolate=self.isolate if isolate is None else isolate, outputs=outputs, log=self.log
+        )
+        if self.log is not None:
+            self.log.event("queued", job=mop_path)
+        future = self.executor.submit(job.run)
+        future.job = job
+        self.futures.append(future)
+        return future
+
+
+    #Queue several .mop files, returning a list of futures
+    def submit_all(self, mop_paths, **kwargs):
+        return [self.submit(mop_path, **kwargs) for mop_path in mop_paths]
+
+
+    #Cancel a job whether it is still queued or already running
+    def cancel(self, future):
+        future.job.cancel()
+        future.cancel()
+
+
+    def cancel_all(self):
+        for future in self.futures:
+            self.cancel(future)
+
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+        if self.log is not None:
+            self.log.flush()
+
+
+
+#Energies and other single values that MOPAC reports, with the text that precedes them - where
+#there is more than one, the later ones (as used in .arc files) are only tried if the first isn't found
+MOPAC_VALUES = (
+ ("heat_of_formation", ("FINAL HEAT OF FORMATION", "HEAT OF FORMATION")),
+ ("total_energy", ("TOTAL ENERGY",)),
+ ("electronic_energy", ("ELECTRONIC ENERGY",)),
+ ("core_core_repulsion", ("CORE-CORE REPULSION",)),
+ ("gradient_norm", ("GRADIENT NORM",)),
+ ("ionization_potential", ("IONIZATION POTENTIAL",)),
+ ("molecular_weight", ("MOLECULAR WEIGHT",)),
+ ("computation_time", ("COMPUTATION TIME",))
+)
+
+NUMBER = r"[-+]?\d+\.?\d*(?:[EeDd][-+]?\d+)?"
+ARC_GEOMETRY_LINE = re.compile(r"^\s*([A-Za-z]{1,2})\+?\s+(%s)(?:\s+[-+]?\d)?\s+(%s)(?:\s+[-+]?\d)?\s+(%s)(?:\s+[-+]?\d)?(?:\s+(%s))?\s*$" % (NUMBER, NUMBER, NUMBER, NUMBER))
+GEOMETRY_LINE = re.compile(r"^\s*(\d+)\s+([A-Za-z]{1,2})\+?\s+(%s)\s+(%s)\s+(%s)\s*$" % (NUMBER, NUMBER, NUMBER))
+CHARGE_LINE = re.compile(r"^\s*(\d+)\s+([A-Za-z]{1,2})\+?\s+(%s)" % NUMBER)
+GRADIENT_LINE = re.compile(r"^\s*\d+\s+(\d+)\s+[A-Za-z]{1,2}\+?\s+CARTESIAN\s+([XYZ])\s+(%s)\s+(%s)" % (NUMBER, NUMBER))
+CYCLE_LINE = re.compile(r"CYCLE:\s*(\d+).*?GRAD\.:\s*(%s)\s+HEAT:\s*(%s)" % (NUMBER, NUMBER))
+JOB_TIME_LINE = re.compile(r"TOTAL JOB TIME:\s*(%s)" % NUMBER)
+
+#Turn a MOPAC number (which may use Fortran's D exponent) into a float
+def mopac_float(text):
+    return float(text.replace("D", "E").replace("d", "e"))
+
+
+#Get the progress of an optimisation from a single line of output, if there is any
+def parse_cycle_line(line):
+    match = CYCLE_LINE.search(line)
+    if match:
+        return {
+         "cycle": int(match.group(1)),
+         "gradient": mopac_float(match.group(2)),
+         "heat": mopac_float(match.group(3))
+        }
+
+
+#The results of a MOPAC calculation, read from its .out (or .arc) file
+class MopacOutput:
+
+    def __init__(self, output_contents):
+        lines = output_contents.split("\n")
+
+        #Single values - the last one reported is the final one
+        for attribute, labels in MOPAC_VALUES:
+            setattr(self, attribute, None)
+            for label in labels:
+                for line in lines:
+                    if line.strip().startswith(label) and "=" in line:
+                        match = re.search(NUMBER, line.split("=", 1)[1])
+                        if match:
+                            setattr(self, attribute, mopac_float(match.group(0)))
+                if getattr(self, attribute) is not None:
+                    break
+
+        #Optimisation cycles
+        self.cycles = [c for c in [parse_cycle_line(line) for line in lines] if c]
+
+        #Final geometry (the last CARTESIAN COORDINATES block)
+        self.geometry = []
+        for index, line in enumerate(lines):
+            if line.strip() == "CARTESIAN COORDINATES":
+                self.geometry = read_table(lines[index + 1:], GEOMETRY_LINE, lambda m: (
+                 m.group(2).capitalize(), mopac_float(m.group(3)),
+                 mopac_float(m.group(4)), mopac_float(m.group(5))
+                ))
+
+        #An .arc file has the final geometry in input format instead, with each atom's charge
+        arc_charges = []
+        if not self.geometry:
+            for index, line in enumerate(lines):
+                if "FINAL GEOMETRY OBTAINED" in line:
+                    rows = read_table(lines[index + 1:], ARC_GEOMETRY_LINE, lambda m: (
+                     m.group(1).capitalize(), mopac_float(m.group(2)), mopac_float(m.group(3)),
+                     mopac_float(m.group(4)), mopac_float(m.group(5)) if m.group(5) else None
+                    ))
+                    self.geometry = [row[:4] for row in rows]
+                    arc_charges = [row[4] for row in rows]
+
+        #Charges (the last NET ATOMIC CHARGES block)
+        self.charges = []
+        for index, line in enumerate(lines):
+            if "NET ATOMIC CHARGES" in line:
+                self.charges = read_table(
+                 lines[index + 1:], CHARGE_LINE, lambda m: mopac_float(m.group(3))
+                )
+        if not self.charges and arc_charges and None not in arc_charges:
+            self.charges = arc_charges
+
+        #Gradients, as [x, y, z] per atom
+        self.gradients = []
+        for index, line in enumerate(lines):
+            if "FINAL  POINT  AND  DERIVATIVES" in line:
+                gradients = {}
+                for atom, axis, value, gradient in read_table(lines[index + 1:],
+                 GRADIENT_LINE, lambda m: (int(m.group(1)), m.group(2), m.group(3), m.group(4))):
+                    gradients.setdefault(atom, [None, None, None])["XYZ".index(axis)] = mopac_float(gradient)
+                self.gradients = [gradients[atom] for atom in sorted(gradients)]
+
+        #Timing and completion
+        self.job_time = None
+        for line in lines:
+            match = JOB_TIME_LINE.search(line)
+            if match:
+                self.job_time = mopac_float(match.group(1))
+        self.completed = "== MOPAC DONE ==" in output_contents or self.job_time is not None
+
+
+    def __repr__(self):
+        if self.heat_of_formation is None:
+            return "<MopacOutput (no heat of formation)>"
+        return "<MopacOutput (%.3f kcal/mol)>" % self.heat_of_formation
+
+
+    #The results as a dictionary of plain values (suitable for JSON)
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+    #Recreate a MopacOutput from the dictionary to_dict produced
+    @staticmethod
+    def from_dict(output_dict):
+        output = MopacOutput.__new__(MopacOutput)
+        output.__dict__.update(output_dict)
+        output.geometry = [tuple(row) for row in output.geometry]
+        return output
+
+
+    #Move the atoms of the structure MOPAC was given to the final geometry
+    def apply_geometry(self, atomic_structure):
+        if len(self.geometry) != len(atomic_structure.atoms):
+            raise MopacError("Output has %i atoms but the structure has %i" % (
+             len(self.geometry), len(atomic_structure.atoms)
+            ))
+        for atom, (element, x, y, z) in zip(atomic_structure.atoms, self.geometry):
+            if atom.element and atom.element.upper() != element.upper():
+                raise MopacError("Atom %s is %s in the output but %s in the structure" % (
+                 atom.number, element, atom.element
+                ))
+        for atom, (element, x, y, z) in zip(atomic_structure.atoms, self.geometry):
+            atom.x, atom.y, atom.z = x, y, z
+        atomic_structure.clear_atom_grid()
+
+
+
+#Read the rows of a table that starts somewhere in a list of lines, stopping at the first non-matching line
+def read_table(lines, pattern, process):
+    rows = []
+    for line in lines:
+        match = pattern.match(line)
+        if match:
+            rows.append(process(match))
+        elif rows and line.strip():
+            break
+    return rows
+
+
+#Read a MOPAC .out or .arc file
+def get_mopac_output(path):
+    with open(path) as f:
+        return MopacOutput(f.read())
+
+
+#Follow the output of a running MOPAC job, yielding each optimisation cycle as it is written.
+#Stops when MOPAC finishes, or when is_running (if given) returns False and there is nothing
+#left to read. Breaking out of the loop stops following - the job itself can then be
+#cancelled, for example once the gradient is low enough.
+def follow_mopac_output(out_path, poll_interval=0.5, is_running=None, timeout=None):
+    start = time.time()
+    while not os.path.exists(out_path):
+        if (is_running is not None and not is_running()) or\
+         (timeout is not None and time.time() - start > timeout):
+            return
+        time.sleep(poll_interval)
+    with open(out_path) as f:
+        partial = ""
+        while True:
+            chunk = f.readline()
+            if chunk:
+                partial += chunk
+                if not partial.endswith("\n"):
+                    continue
+                line, partial = partial, ""
+                cycle = parse_cycle_line(line)
+                if cycle:
+                    yield cycle
+                if "== MOPAC DONE ==" in line or JOB_TIME_LINE.search(line):
+                    return
+            else:
+                if is_running is not None and not is_running():
+                    return
+                if timeout is not None and time.time() - start > timeout:
+                    return
+                time.sleep(poll_interval)
+
+
+
+#A canonical hash of a calculation - the elements and coordinates of the atoms (rounded to
+#the given number of decimal places) and the keywords
+def get_calculation_key(atomic_structure, keywords, precision=3):
+    lines = [" ".join(format_keywords(keywords).upper().split())]
+    for atom in atomic_structure.atoms:
+        lines.append("%s %s %s %s" % ((atom.element or "").upper(),
+         *[round(c, precision) + 0.0 for c in (atom.x, atom.y, atom.z)]))
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+
+#An on-disk store of parsed MOPAC results, keyed by get_calculation_key. When the store
+#grows beyond max_size bytes, the least recently used results are removed.
+class MopacCache:
+
+    def __init__(self, directory, max_size=100 * 1024 * 1024, precision=3):
+        self.directory = directory
+        self.max_size = max_size
+        self.precision = precision
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self.lock = threading.Lock()
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.size = sum([os.path.getsize(path) for path in self.get_paths()])
+
+
+    def __repr__(self):
+        return "<MopacCache %s (%i bytes)>" % (self.directory, self.size)
+
+
+    def __len__(self):
+        return len(self.get_paths())
+
+
+    def get_paths(self):
+        return [os.path.join(self.directory, f) for f in os.listdir(self.directory)
+         if f.endswith(".json")]
+
+
+    def get_path(self, atomic_structure, keywords):
+        key = get_calculation_key(atomic_structure, keywords, precision=self.precision)
+        return os.path.join(self.directory, key + ".json")
+
+
+    #Get the stored results of a calculation, or None if it hasn't been stored
+    def get(self, atomic_structure, keywords):
+        path = self.get_path(atomic_structure, keywords)
+        try:
+            with open(path) as f:
+                output = MopacOutput.from_dict(json.load(f))
+            #Mark it as recently used (it may have been evicted by another process since being read)
+            os.utime(path, None)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return output
+
+
+    #Store the results of a calculation
+    def put(self, atomic_structure, keywords, output):
+        path = self.get_path(atomic_structure, keywords)
+        contents = json.dumps(output.to_dict()).encode()
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(contents)
+        with self.lock:
+            if os.path.exists(path):
+                self.size -= os.path.getsize(path)
+            os.replace(temp_path, path)
+            self.size += len(contents)
+            if self.size > self.max_size:
+                self.evict()
+
+
+    #Remove the least recently used results until the cache fits - the lock must be held
+    def evict(self):
+        entries = []
+        for path in self.get_paths():
+            try:
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+            except OSError:
+                pass
+        entries.sort()
+        self.size = sum([entry[1] for entry in entries])
+        for mtime, size, path in entries:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.size -= size
+            self.evictions += 1
+
+
+    def clear(self):
+        with self.lock:
+            for path in self.get_paths():
+                os.remove(path)
+            self.size = 0
+
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+
+    def get_statistics(self):
+        return {
+         "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate,
+         "evictions": self.evictions, "entries": len(self), "size": self.size
+        }
+
+
+
+#Get the outputs to keep from an isolated run - the .pdb file too if PDBOUT asks for one
+def get_mopac_outputs(keywords):
+    if "PDBOUT" in format_keywords(keywords).upper().split():
+        return MOPAC_OUTPUTS + (".pdb",)
+    return MOPAC_OUTPUTS
+
+
+#Run MOPAC on an atomic structure and return the parsed results. If a cache is given and
+#already holds this calculation, MOPAC isn't run at all. Only the outputs (by default those
+#the keywords produce) are kept next to mop_path.
+def run_mopac_structure(atomic_structure, mop_path, keywords="PDBOUT", cache=None, log=None,
+ outputs=None):
+    if cache is not None:
+        output = cache.get(atomic_structure, keywords)
+        if output is not None:
+            print(write_to_log(log, "Using cached MOPAC results for %s" % mop_path))
+            return output
+    write_mop_file(atomic_structure, mop_path, keywords=keywords)
+    if outputs is None:
+        outputs = get_mopac_outputs(keywords)
+    run_mopac(mop_path, log=log, keywords=keywords, isolate=True, outputs=outputs)
+    out_path = get_pre_dot(mop_path) + ".out"
+    if not os.path.exists(out_path):
+        raise MopacError("MOPAC produced no output for %s" % mop_path)
+    output = get_mopac_output(out_path)
+    if cache is not None and output.completed:
+        cache.put(atomic_structure, keywords, output)
+    return output
@@ -2,12 +2,65 @@ from .file import *
 from .data import *
 from .structure import *
 from .exceptions import *
-import requests
+import importlib
+
+#Submodules that are only imported when one of their names is first used
+LAZY_IMPORTS = {
+ "assembly": ("IDENTITY_OPERATOR", "Assembly", "parse_assemblies", "transform_coordinates"),
+ "bonding": (
+  "BOND_TOLERANCE", "COVALENT_RADII", "MINIMUM_BOND_LENGTH", "get_covalent_radius",
+  "find_bonded_pairs", "perceive_bonds"
+ ),
+ "components": (
+  "BOND_ORDERS", "CIF_TOKEN", "COMPONENTS_HEADER", "COMPONENTS_MAGIC", "COMPONENTS_VERSION",
+  "ComponentDictionary", "compile_components", "get_component_bonds",
+  "get_component_from_block", "iter_cif_blocks", "load_component_dictionary",
+  "parse_cif_block", "tokenise_cif_lines"
+ ),
+ "crystal": (
+  "SPACE_GROUPS", "SPACE_GROUP_ALIASES", "UnitCell", "Transformation",
+  "SubmittedCoordinatesTransformation", "CrystallographicCoordinatesTransformation",
+  "MatrixTransformation", "get_symmetry_operators", "invert_matrix", "multiply_matrix_point",
+  "parse_symmetry_operator"
+ ),
+ "geometry": (
+  "apply_matrix", "centre_coordinates", "get_atom_key", "get_centroid", "get_rmsd",
+  "get_rotation_matrix", "get_superposition_operator", "get_symmetric_eigenvectors",
+  "match_atoms", "superpose_centred", "superpose_coordinates", "superpose_many"
+ ),
+ "interface": (
+  "Interface", "find_atomic_contacts", "find_interfaces", "find_internal_contacts",
+  "get_covalent_shell"
+ ),
+ "binary": (
+  "ANISOU_KEYS", "COLUMNS", "COLUMN_RECORDS", "MAGIC", "VERSION", "PdbBinaryFile",
+  "encode_pdb_data", "encode_column", "decode_column", "delta_encode", "delta_decode",
+  "integer_pack", "integer_unpack", "run_length_encode", "run_length_decode"
+ ),
+ "ensemble": ("Ensemble", "read_first_model", "get_atom_dict_key", "get_mean_positions", "unpack_coordinates"),
+ "trajectory": (
+  "TRAJECTORY_HEADER", "TRAJECTORY_MAGIC", "TRAJECTORY_VERSION", "Trajectory",
+  "TrajectoryFile", "TrajectoryWriter", "get_line_key", "iter_pdb_frame_lines"
+ )
+}
+
+def __getattr__(name):
+    if name in LAZY_IMPORTS:
+        return importlib.import_module("." + name, __name__)
+    for module_name, names in LAZY_IMPORTS.items():
+        if name in names:
+            value = getattr(importlib.import_module("." + module_name, __name__), name)
+            globals()[name] = value
+            return value
+    raise AttributeError("module %s has no attribute %s" % (__name__, name))
+
+
 
 def get_from_code(code):
     """Takes a 4-char PDB identifier and gets the PDB over the internet,
      then processes it."""
 
+    import requests
     response = requests.get(
      "http://www.rcsb.org/pdb/files/%s.pdb" % code
     )
@@ -27,3 +80,40 @@ def get_from_file(path):
         pdb_file = PdbFile(contents)
         pdb_data = PdbDataStructure(pdb_file)
         return PdbStructure(pdb_data)
+
+
+def get_ensemble_from_file(path):
+    """Loads a multi-model PDB file as an Ensemble, without building a
+    separate Model for every model in it. Only the first model is parsed in
+    full, for the topology - the others are streamed into coordinate arrays
+    one at a time."""
+
+    from .ensemble import Ensemble, read_first_model
+    from .trajectory import Trajectory
+    with open(path) as f:
+        topology = PdbStructure(PdbDataStructure(PdbFile(read_first_model(f)))).model
+    return Ensemble.from_frames(topology, Trajectory(topology, path).iter_frames())
+
+
+def get_from_binary_file(path):
+    """Loads a binary PDB file written by write_binary_file and processes it."""
+
+    from .binary import PdbBinaryFile
+    with open(path, "rb") as f:
+        return PdbBinaryFile(f.read()).to_structure()
+
+
+def write_binary_file(pdb_structure, path):
+    """Saves a PdbStructure (or a PdbDataStructure) in the compact binary
+    format."""
+
+    from .binary import encode_pdb_data
+    pdb_data = getattr(pdb_structure, "data", pdb_structure)
+    with open(path, "wb") as f:
+        f.write(encode_pdb_data(pdb_data))
+
+
+#Star imports only bring in what is already loaded - the lazy names are left out so that they
+#don't import their modules, and can still be used as attributes of the package
+__all__ = [name for name in globals()
+ if not name.startswith("_") and name not in ("importlib", "LAZY_IMPORTS")]
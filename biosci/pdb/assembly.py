@@ -0,0 +1,102 @@
+IDENTITY_OPERATOR = [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0]]
+
+def parse_assemblies(remark_content):
+    """Parses the text of REMARK 350 into a list of biological assemblies.
+    Each assembly has a number and a list of groups, and each group is a list
+    of chain IDs with the 3x4 operators to be applied to them."""
+
+    assemblies = []
+    group, rows = None, {}
+    for line in remark_content.split("\n"):
+        line = line.strip()
+        if line.startswith("BIOMOLECULE:"):
+            assemblies.append({"number": int(line.split(":")[1].split()[0]), "groups": []})
+            group = None
+        elif assemblies and (line.startswith("APPLY THE FOLLOWING TO CHAINS:") or
+         line.startswith("AND CHAINS:")):
+            chains = [c.strip() for c in line.split(":", 1)[1].split(",") if c.strip()]
+            if line.startswith("APPLY") or group is None:
+                group, rows = {"chains": [], "operators": []}, {}
+                assemblies[-1]["groups"].append(group)
+            group["chains"] += chains
+        elif group is not None and line.startswith("BIOMT"):
+            fields = line.split()
+            row, serial = int(fields[0][5]), int(fields[1])
+            rows[(serial, row)] = [float(value) for value in fields[2:6]]
+            if all((serial, r) in rows for r in (1, 2, 3)):
+                group["operators"].append([rows.pop((serial, r)) for r in (1, 2, 3)])
+    return assemblies
+
+
+def transform_coordinates(operators, coordinates):
+    """Applies each of a list of 3x4 operators to a list of (x, y, z)
+    coordinates, returning one new list of coordinates per operator."""
+
+    copies = []
+    for m in operators:
+        m11, m12, m13, v1 = m[0]
+        m21, m22, m23, v2 = m[1]
+        m31, m32, m33, v3 = m[2]
+        copies.append([(
+         (m11 * x) + (m12 * y) + (m13 * z) + v1,
+         (m21 * x) + (m22 * y) + (m23 * z) + v2,
+         (m31 * x) + (m32 * y) + (m33 * z) + v3
+        ) for x, y, z in coordinates])
+    return copies
+
+
+
+class Assembly:
+    """A biological assembly generated from a model. The copies share the
+    model's atoms (and so its topology), and only their coordinates are
+    stored, so no per-atom objects are duplicated."""
+
+    def __init__(self, number, model, groups):
+        self.number = number
+        self.model = model
+        self.copies = []
+        for group in groups:
+            atoms = [atom for chain in model.chains if chain.name in group["chains"]
+             for atom in chain.atoms]
+            atoms += [atom for het in model.hets if het.chain_id in group["chains"]
+             for atom in het.atoms]
+            coordinates = [(atom.x, atom.y, atom.z) for atom in atoms]
+            for operator, copy in zip(group["operators"],
+             transform_coordinates(group["operators"], coordinates)):
+                self.copies.append({
+                 "chains": group["chains"], "operator": operator,
+                 "atoms": atoms, "coordinates": copy
+                })
+
+
+    def __repr__(self):
+        return "<Assembly %s (%i copies, %i atoms)>" % (
+         self.number, len(self.copies), self.atom_count
+        )
+
+
+    def __len__(self):
+        return len(self.copies)
+
+
+    @property
+    def atom_count(self):
+        return sum([len(copy["atoms"]) for copy in self.copies])
+
+
+    def get_coordinates(self):
+        """Returns the coordinates of every atom in the assembly, copy by copy."""
+
+        coordinates = []
+        for copy in self.copies:
+            coordinates += copy["coordinates"]
+        return coordinates
+
+
+    def iter_atoms(self):
+        """Yields (atom, copy index, (x, y, z)) for every atom in the assembly -
+        the atom object is the one in the original model."""
+
+        for index, copy in enumerate(self.copies):
+            for atom, coordinates in zip(copy["atoms"], copy["coordinates"]):
+                yield atom, index, coordinates
@@ -0,0 +1,345 @@
+"""A compact, columnar binary encoding of PDB files, in the style of MMTF and
+BinaryCIF."""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate, repeat
+from operator import truediv
+from .exceptions import *
+from .file import PdbFile
+
+MAGIC = b"BPDB"
+VERSION = 1
+
+#The atom columns, the type of their values and how they are encoded
+COLUMNS = (
+ ("het", "bool", (("run_length",), ("pack", 2))),
+ ("serial", "int", (("delta",), ("run_length",), ("pack", 2))),
+ ("name", "str", (("dictionary",), ("pack", 2))),
+ ("alt_loc", "str", (("dictionary",), ("run_length",), ("pack", 2))),
+ ("res_name", "str", (("dictionary",), ("run_length",), ("pack", 2))),
+ ("chain_id", "str", (("dictionary",), ("run_length",), ("pack", 2))),
+ ("res_seq", "int", (("delta",), ("run_length",), ("pack", 2))),
+ ("i_code", "str", (("dictionary",), ("run_length",), ("pack", 2))),
+ ("x", "float", (("fixed", 1000), ("delta",), ("pack", 2))),
+ ("y", "float", (("fixed", 1000), ("delta",), ("pack", 2))),
+ ("z", "float", (("fixed", 1000), ("delta",), ("pack", 2))),
+ ("occupancy", "float", (("fixed", 100), ("run_length",), ("pack", 2))),
+ ("temp_factor", "float", (("fixed", 100), ("delta",), ("pack", 2))),
+ ("element", "str", (("dictionary",), ("pack", 1))),
+ ("charge", "str", (("dictionary",), ("run_length",), ("pack", 2))),
+ ("u11", "int", (("pack", 2),)),
+ ("u22", "int", (("pack", 2),)),
+ ("u33", "int", (("pack", 2),)),
+ ("u12", "int", (("pack", 2),)),
+ ("u13", "int", (("pack", 2),)),
+ ("u23", "int", (("pack", 2),))
+)
+
+ANISOU_KEYS = ("u11", "u22", "u33", "u12", "u13", "u23")
+
+#Records which are stored as columns rather than as text
+COLUMN_RECORDS = ("ATOM", "HETATM", "ANISOU")
+
+def run_length_encode(values):
+    """Turns a list of values into a flat list of value, count pairs."""
+
+    encoded = []
+    previous, count = None, 0
+    for value in values:
+        if count and value == previous:
+            count += 1
+        else:
+            if count:
+                encoded += [previous, count]
+            previous, count = value, 1
+    if count:
+        encoded += [previous, count]
+    return encoded
+
+
+def run_length_decode(encoded):
+    """Expands a flat list of value, count pairs."""
+
+    values = []
+    for index in range(0, len(encoded), 2):
+        values += [encoded[index]] * encoded[index + 1]
+    return values
+
+
+def delta_encode(values):
+    """Replaces each value with its difference from the one before."""
+
+    encoded, previous = [], 0
+    for value in values:
+        encoded.append(value - previous)
+        previous = value
+    return encoded
+
+
+def delta_decode(encoded):
+    """Reverses delta_encode by taking the running total."""
+
+    values, total = [], 0
+    for value in encoded:
+        total += value
+        values.append(total)
+    return values
+
+
+def integer_pack(values, size=2):
+    """Fits integers into a smaller integer type by recursive indexing - any
+    value that doesn't fit becomes a run of the type's limit followed by the
+    remainder."""
+
+    upper = (2 ** ((size * 8) - 1)) - 1
+    lower = -upper - 1
+    packed = []
+    for value in values:
+        if value >= 0:
+            while value >= upper:
+                packed.append(upper)
+                value -= upper
+        else:
+            while value <= lower:
+                packed.append(lower)
+                value -= lower
+        packed.append(value)
+    return packed
+
+
+def integer_unpack(packed, size=2):
+    """Reverses integer_pack by summing runs of the type's limit."""
+
+    upper = (2 ** ((size * 8) - 1)) - 1
+    lower = -upper - 1
+    values, total = [], 0
+    for value in packed:
+        total += value
+        if value != upper and value != lower:
+            values.append(total)
+            total = 0
+    return values
+
+
+def encode_column(values, encoding):
+    """Applies the encoding steps to a list of integers and returns the bytes
+    of the final array, plus any dictionary that was created."""
+
+    table = None
+    typecode = "i"
+    for step in encoding:
+        if step[0] == "dictionary":
+            table = sorted(set(values), key=lambda v: (v is not None, v))
+            lookup = {value: index for index, value in enumerate(table)}
+            values = [lookup[value] for value in values]
+        elif step[0] == "fixed":
+            values = [int(round(value * step[1])) for value in values]
+        elif step[0] == "delta":
+            values = delta_encode(values)
+        elif step[0] == "run_length":
+            values = run_length_encode(values)
+        elif step[0] == "pack":
+            values = integer_pack(values, step[1])
+            typecode = "b" if step[1] == 1 else "h"
+    encoded = array(typecode, values)
+    if sys.byteorder == "big":
+        encoded.byteswap()
+    return encoded.tobytes(), table
+
+
+def decode_column(data, encoding, table=None):
+    """Reverses encode_column. Numeric columns are decoded into arrays - of
+    integers, or of floats for fixed point columns - and only dictionary
+    columns become lists."""
+
+    typecode = "i"
+    if encoding[-1][0] == "pack":
+        typecode = "b" if encoding[-1][1] == 1 else "h"
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    for step in reversed(encoding):
+        if step[0] == "pack":
+            #Only unpack value by value if the type's limits appear in the raw
+            #bytes - otherwise the packed array already holds the values
+            upper = (2 ** ((step[1] * 8) - 1)) - 1
+            limits = array(typecode, [upper, -upper - 1])
+            if sys.byteorder == "big":
+                limits.byteswap()
+            limits = limits.tobytes()
+            if limits[:step[1]] in data or limits[step[1]:] in data:
+                values = array("q", integer_unpack(values, step[1]))
+        elif step[0] == "run_length":
+            expanded = array(values.typecode)
+            for index in range(0, len(values), 2):
+                expanded.extend(values[index:index + 1] * values[index + 1])
+            values = expanded
+        elif step[0] == "delta":
+            values = array("q", accumulate(values))
+        elif step[0] == "fixed":
+            values = array("d", map(truediv, values, repeat(step[1])))
+        elif step[0] == "dictionary":
+            values = [table[value] for value in values]
+    return values
+
+
+def encode_pdb_data(pdb_data):
+    """Takes a PdbDataStructure and produces the bytes of its binary
+    representation. Atomic records become compressed columns, and all other
+    records are kept as text."""
+
+    atoms = []
+    model_sizes = []
+    for model in pdb_data.coordinates.models:
+        atoms += model["atoms"]
+        model_sizes.append(len(model["atoms"]))
+
+    header = {
+     "version": VERSION,
+     "atom_count": len(atoms),
+     "model_sizes": model_sizes,
+     "records": "\n".join([r.text.rstrip() for r in pdb_data.file.records
+      if r.name not in COLUMN_RECORDS]),
+     "columns": []
+    }
+    chunks = []
+    for name, kind, encoding in COLUMNS:
+        values = [atom.get(name) for atom in atoms]
+        if kind == "str":
+            data, table = encode_column(values, encoding)
+            header["columns"].append({"name": name, "table": table, "length": len(data)})
+            chunks.append(data)
+        else:
+            #Numeric columns store a run-length mask of which values are missing
+            mask = [0 if value is None else 1 for value in values]
+            if kind == "bool":
+                values = [int(value) for value in values]
+            mask_data, _ = encode_column(mask, (("run_length",), ("pack", 2)))
+            data, _ = encode_column(
+             [0 if value is None else value for value in values], encoding
+            )
+            header["columns"].append({
+             "name": name, "mask_length": len(mask_data), "length": len(data)
+            })
+            chunks += [mask_data, data]
+
+    header = json.dumps(header, separators=(",", ":")).encode()
+    payload = struct.pack("<I", len(header)) + header + b"".join(chunks)
+    return MAGIC + struct.pack("<B", VERSION) + zlib.compress(payload, 9)
+
+
+
+class PdbBinaryFile:
+    """A decoded binary PDB file. The numeric atom columns are held as arrays
+    and the string columns as flat lists, so no per-atom objects are created
+    unless the file is converted into a PdbDataStructure."""
+
+    def __init__(self, contents):
+        if contents[:4] != MAGIC:
+            raise PdbFileError("This is not a binary PDB file")
+        version = struct.unpack("<B", contents[4:5])[0]
+        if version > VERSION:
+            raise PdbFileError("Binary PDB version %i is not supported" % version)
+        payload = zlib.decompress(contents[5:])
+        header_length = struct.unpack("<I", payload[:4])[0]
+        header = json.loads(payload[4:4 + header_length].decode())
+
+        self.atom_count = header["atom_count"]
+        self.model_sizes = header["model_sizes"]
+        self.records = header["records"]
+
+        #Decode the columns
+        self.columns = {}
+        encodings = {name: (kind, encoding) for name, kind, encoding in COLUMNS}
+        position = 4 + header_length
+        for column in header["columns"]:
+            kind, encoding = encodings[column["name"]]
+            encoding = tuple(tuple(step) for step in encoding)
+            mask = None
+            if "mask_length" in column:
+                mask = decode_column(
+                 payload[position:position + column["mask_length"]],
+                 (("run_length",), ("pack", 2))
+                )
+                position += column["mask_length"]
+            values = decode_column(
+             payload[position:position + column["length"]], encoding, column.get("table")
+            )
+            position += column["length"]
+            if kind == "bool":
+                values = [bool(value) for value in values]
+            if mask is not None and not all(mask):
+                values = [value if present else None for value, present in zip(values, mask)]
+            self.columns[column["name"]] = values
+
+        for name in ("x", "y", "z"):
+            values = self.columns[name]
+            if not isinstance(values, array):
+                values = array("d", values)
+            setattr(self, name, values)
+
+
+    def __repr__(self):
+        return "<PdbBinaryFile (%i atoms, %i model%s)>" % (
+         self.atom_count, len(self.model_sizes), "" if len(self.model_sizes) == 1 else "s"
+        )
+
+
+    def get_model_range(self, model_index=0):
+        """Returns the start and end indices of a model's atoms in the columns."""
+
+        start = sum(self.model_sizes[:model_index])
+        return start, start + self.model_sizes[model_index]
+
+
+    def get_coordinates(self, model_index=0):
+        """Returns the x, y and z coordinate arrays of a single model."""
+
+        start, end = self.get_model_range(model_index)
+        return self.x[start:end], self.y[start:end], self.z[start:end]
+
+
+    def get_model_dicts(self):
+        """Returns the atoms as the list of model dictionaries that a
+        CoordinateSection would produce."""
+
+        names = [name for name, kind, encoding in COLUMNS]
+        models = []
+        for model_index in range(len(self.model_sizes)):
+            start, end = self.get_model_range(model_index)
+            atoms = []
+            for index in range(start, end):
+                atom = {name: self.columns[name][index] for name in names}
+                if all(atom[key] is None for key in ANISOU_KEYS):
+                    for key in ANISOU_KEYS:
+                        del atom[key]
+                atoms.append(atom)
+            models.append(atoms)
+        return models
+
+
+    def to_data(self):
+        """Converts the binary file into a PdbDataStructure."""
+
+        from .data import PdbDataStructure
+        data = PdbDataStructure(PdbFile(self.records))
+        model_dicts = self.get_model_dicts()
+        if len(model_dicts) != len(data.coordinates.models):
+            raise PdbDataError("Binary PDB has %i models but its records describe %i" % (
+             len(model_dicts), len(data.coordinates.models)
+            ))
+        for model, atoms in zip(data.coordinates.models, model_dicts):
+            model["atoms"] = atoms
+        return data
+
+
+    def to_structure(self):
+        """Converts the binary file into a full PdbStructure."""
+
+        from .structure import PdbStructure
+        return PdbStructure(self.to_data())
@@ -0,0 +1,67 @@
+import warnings
+from .spatial import AtomGrid
+
+#Single-bond covalent radii in Å of elements 1 to 96 (Cordero et al, 2008 - sp3 carbon, and
+#low-spin manganese, iron and cobalt), plus deuterium
+COVALENT_RADII = {
+ "H": 0.31, "HE": 0.28, "LI": 1.28, "BE": 0.96, "B": 0.84, "C": 0.76, "N": 0.71,
+  "O": 0.66, "F": 0.57, "NE": 0.58, "NA": 1.66, "MG": 1.41, "AL": 1.21, "SI": 1.11,
+   "P": 1.07, "S": 1.05, "CL": 1.02, "AR": 1.06, "K": 2.03, "CA": 1.76, "SC": 1.70,
+    "TI": 1.60, "V": 1.53, "CR": 1.39, "MN": 1.39, "FE": 1.32, "CO": 1.26, "NI": 1.24,
+     "CU": 1.32, "ZN": 1.22, "GA": 1.22, "GE": 1.20, "AS": 1.19, "SE": 1.20, "BR": 1.20,
+      "KR": 1.16, "RB": 2.20, "SR": 1.95, "Y": 1.90, "ZR": 1.75, "NB": 1.64, "MO": 1.54,
+       "TC": 1.47, "RU": 1.46, "RH": 1.42, "PD": 1.39, "AG": 1.45, "CD": 1.44, "IN": 1.42,
+        "SN": 1.39, "SB": 1.39, "TE": 1.38, "I": 1.39, "XE": 1.40, "CS": 2.44, "BA": 2.15,
+         "LA": 2.07, "CE": 2.04, "PR": 2.03, "ND": 2.01, "PM": 1.99, "SM": 1.98, "EU": 1.98,
+          "GD": 1.96, "TB": 1.94, "DY": 1.92, "HO": 1.92, "ER": 1.89, "TM": 1.90, "YB": 1.87,
+           "LU": 1.87, "HF": 1.75, "TA": 1.70, "W": 1.62, "RE": 1.51, "OS": 1.44, "IR": 1.41,
+            "PT": 1.36, "AU": 1.36, "HG": 1.32, "TL": 1.45, "PB": 1.46, "BI": 1.48, "PO": 1.40,
+             "AT": 1.50, "RN": 1.50, "FR": 2.60, "RA": 2.21, "AC": 2.15, "TH": 2.06, "PA": 2.00,
+              "U": 1.96, "NP": 1.90, "PU": 1.87, "AM": 1.80, "CM": 1.69, "D": 0.31
+}
+
+BOND_TOLERANCE = 0.45
+MINIMUM_BOND_LENGTH = 0.4
+
+def get_covalent_radius(atom):
+    return COVALENT_RADII.get(atom.element.upper()) if atom.element else None
+
+
+def find_bonded_pairs(atoms, tolerance=BOND_TOLERANCE):
+    """Returns (atom, atom, distance) for every pair of atoms close enough
+    together to be covalently bonded - no further apart than the sum of their
+    covalent radii plus a tolerance. Atoms with no element, or an element with
+    no known radius (which is warned about), are ignored. Candidate pairs come
+    from a single sweep over a spatial grid, so this scales linearly with the
+    number of atoms."""
+
+    atoms = [a for a in atoms if a.x is not None]
+    unknown = sorted(set([a.element for a in atoms if a.element and not get_covalent_radius(a)]))
+    if unknown:
+        warnings.warn("No covalent radius for %s - bonds to these atoms won't be perceived" % (
+         ", ".join(unknown)
+        ))
+    atoms = [a for a in atoms if get_covalent_radius(a)]
+    if not atoms:
+        return []
+    largest = max([get_covalent_radius(a) for a in atoms])
+    grid = AtomGrid(atoms, cell_size=(2 * largest) + tolerance)
+    pairs = []
+    for atom, other_atom, distance in grid.pairs_within((2 * largest) + tolerance):
+        limit = get_covalent_radius(atom) + get_covalent_radius(other_atom) + tolerance
+        if MINIMUM_BOND_LENGTH <= distance <= limit:
+            pairs.append((atom, other_atom, distance))
+    return pairs
+
+
+def perceive_bonds(atoms, tolerance=BOND_TOLERANCE):
+    """Bonds together every pair of atoms found by find_bonded_pairs that
+    isn't already bonded. The new bonds are marked as perceived, and are
+    returned."""
+
+    bonds = []
+    for atom, other_atom, distance in find_bonded_pairs(atoms, tolerance=tolerance):
+        if not any(other_atom in bond.atoms for bond in atom.bonds):
+            atom.bond(other_atom, perceived=True)
+            bonds.append(atom.bonds[-1])
+    return bonds
@@ -0,0 +1,217 @@
+import re
+import json
+import zlib
+import struct
+from .exceptions import *
+
+COMPONENTS_MAGIC = b"BCCD"
+COMPONENTS_VERSION = 1
+COMPONENTS_HEADER = struct.Struct("<4sBQ")
+BOND_ORDERS = {"SING": "1", "DOUB": "2", "TRIP": "3", "QUAD": "4", "AROM": "ar"}
+CIF_TOKEN = re.compile(r"""'(?:[^']|'(?=\S))*'(?=\s|$)|"(?:[^"]|"(?=\S))*"(?=\s|$)|\S+""")
+
+#The dictionary used when building models, if one has been loaded
+component_dictionary = None
+
+def tokenise_cif_lines(lines):
+    """Turns the lines of a CIF data block into tokens, joining semicolon
+    text fields into single tokens and removing quotes."""
+
+    tokens, text = [], None
+    for line in lines:
+        if text is not None:
+            if line.startswith(";"):
+                tokens.append("\n".join(text))
+                text = None
+            else:
+                text.append(line)
+        elif line.startswith(";"):
+            text = [line[1:]]
+        elif not line.startswith("#"):
+            for token in CIF_TOKEN.findall(line):
+                if token[0] in "'\"" and token[-1] == token[0] and len(token) > 1:
+                    token = token[1:-1]
+                tokens.append(token)
+    return tokens
+
+
+def parse_cif_block(lines):
+    """Parses the lines of one CIF data block into a dictionary of category
+    names to lists of rows, where each row is a dictionary of item names to
+    values. Categories given as key-value pairs become a single row."""
+
+    categories = {}
+    tokens = tokenise_cif_lines(lines)
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token == "loop_":
+            index += 1
+            names = []
+            while index < len(tokens) and tokens[index].startswith("_"):
+                names.append(tokens[index])
+                index += 1
+            values = []
+            while index < len(tokens) and not tokens[index].startswith("_") and \
+             tokens[index] != "loop_" and not tokens[index].startswith("data_"):
+                values.append(tokens[index])
+                index += 1
+            if names:
+                category = names[0].split(".")[0]
+                items = [name.split(".", 1)[1] for name in names]
+                rows = categories.setdefault(category, [])
+                for start in range(0, len(values) - len(items) + 1, len(items)):
+                    rows.append(dict(zip(items, values[start:start + len(items)])))
+        elif token.startswith("_") and "." in token and index + 1 < len(tokens):
+            category, item = token.split(".", 1)
+            rows = categories.setdefault(category, [{}])
+            rows[0][item] = tokens[index + 1]
+            index += 2
+        else:
+            index += 1
+    return categories
+
+
+def iter_cif_blocks(handle):
+    """Takes a CIF file opened in text mode and yields the name and lines of
+    each data block in turn."""
+
+    name, lines = None, []
+    for line in handle:
+        line = line.rstrip("\n")
+        if line.startswith("data_"):
+            if name is not None:
+                yield name, lines
+            name, lines = line[5:].strip(), []
+        elif name is not None:
+            lines.append(line)
+    if name is not None:
+        yield name, lines
+
+
+def get_component_from_block(lines):
+    """Pulls the parts of a chemical component needed for building structures
+    out of its data block - its name, type, atoms and bonds."""
+
+    categories = parse_cif_block(lines)
+    chem_comp = categories.get("_chem_comp", [{}])[0]
+    bonds = []
+    for row in categories.get("_chem_comp_bond", []):
+        order = BOND_ORDERS.get(row.get("value_order", "").upper())
+        if row.get("pdbx_aromatic_flag", "N").upper() == "Y":
+            order = "ar"
+        bonds.append([row["atom_id_1"], row["atom_id_2"], order])
+    return {
+     "name": chem_comp.get("name"),
+     "type": chem_comp.get("type"),
+     "atoms": [[row.get("atom_id"), row.get("type_symbol")]
+      for row in categories.get("_chem_comp_atom", [])],
+     "bonds": bonds
+    }
+
+
+def compile_components(cif_path, output_path):
+    """Converts a chemical component dictionary mmCIF file (such as the
+    wwPDB's components.cif) into the compiled form read by
+    ComponentDictionary. Each component is stored as its own compressed
+    record, with an index of record positions at the end of the file, so
+    that one component can be read without loading the others. Returns the
+    number of components written."""
+
+    index = {}
+    with open(cif_path) as cif, open(output_path, "wb") as f:
+        f.write(COMPONENTS_HEADER.pack(COMPONENTS_MAGIC, COMPONENTS_VERSION, 0))
+        for code, lines in iter_cif_blocks(cif):
+            record = zlib.compress(json.dumps(get_component_from_block(lines)).encode())
+            index[code] = [f.tell(), len(record)]
+            f.write(record)
+        index_offset = f.tell()
+        f.write(zlib.compress(json.dumps(index).encode()))
+        f.seek(0)
+        f.write(COMPONENTS_HEADER.pack(COMPONENTS_MAGIC, COMPONENTS_VERSION, index_offset))
+    return len(index)
+
+
+
+class ComponentDictionary:
+    """A compiled chemical component dictionary. Only the index is read when
+    it is opened - each component is read and decompressed the first time it
+    is asked for, and then kept."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, index_offset = COMPONENTS_HEADER.unpack(
+             f.read(COMPONENTS_HEADER.size)
+            )
+            if magic != COMPONENTS_MAGIC:
+                raise PdbFileError("%s is not a compiled component dictionary" % path)
+            if version > COMPONENTS_VERSION:
+                raise PdbFileError("Component dictionary version %i is not supported" % version)
+            f.seek(index_offset)
+            self.index = json.loads(zlib.decompress(f.read()).decode())
+        self.components = {}
+
+
+    def __repr__(self):
+        return "<ComponentDictionary %s (%i components)>" % (self.path, len(self.index))
+
+
+    def __len__(self):
+        return len(self.index)
+
+
+    def __contains__(self, code):
+        return code in self.index
+
+
+    def get_component(self, code):
+        """Returns a component's name, type, atoms and bonds, or None if the
+        dictionary doesn't have it."""
+
+        if code not in self.components:
+            if code not in self.index:
+                return None
+            offset, length = self.index[code]
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                self.components[code] = json.loads(zlib.decompress(f.read(length)).decode())
+        return self.components[code]
+
+
+    def get_bonds(self, code):
+        """Returns a component's bonds as (atom name, atom name, bond type)."""
+
+        component = self.get_component(code)
+        if component is not None:
+            return [tuple(bond) for bond in component["bonds"]]
+
+
+
+def load_component_dictionary(path):
+    """Loads a compiled component dictionary, which will then be used to bond
+    the atoms of every residue and het in models built afterwards."""
+
+    global component_dictionary
+    component_dictionary = ComponentDictionary(path) if path else None
+    return component_dictionary
+
+
+def get_component_bonds(code):
+    """Returns the template bonds of a residue or het as (atom name, atom
+    name, bond type) - from the loaded component dictionary if there is one,
+    and from the built-in standard amino acids otherwise."""
+
+    if component_dictionary is not None:
+        bonds = component_dictionary.get_bonds(code)
+        if bonds is not None:
+            return bonds
+    from .residues import residues
+    if code in residues:
+        bonds, seen = [], set()
+        for atom_name, bonded_atom_names in residues[code].items():
+            for bonded_atom_name in bonded_atom_names:
+                if (bonded_atom_name, atom_name) not in seen:
+                    seen.add((atom_name, bonded_atom_name))
+                    bonds.append((atom_name, bonded_atom_name, None))
+        return bonds
@@ -1,3 +1,228 @@
+import math
+from .exceptions import *
+from .spatial import AtomGrid
+from .assembly import IDENTITY_OPERATOR
+
+#The general positions of the 65 space groups that chiral molecules such as
+#proteins can crystallise in (plus some other settings seen in the PDB). The
+#R groups are on rhombohedral axes - on hexagonal axes they are the H groups.
+SPACE_GROUPS = {
+ "P 1": (("x,y,z",), ()),
+ "P -1": (("x,y,z", "-x,-y,-z"), ()),
+ "P 1 2 1": (("x,y,z", "-x,y,-z"), ()),
+ "P 1 21 1": (("x,y,z", "-x,y+1/2,-z"), ()),
+ "C 1 2 1": (("x,y,z", "-x,y,-z"), ("1/2,1/2,0",)),
+ "I 1 2 1": (("x,y,z", "-x,y,-z"), ("1/2,1/2,1/2",)),
+ "P 2 2 2": (("x,y,z", "-x,-y,z", "-x,y,-z", "x,-y,-z"), ()),
+ "P 2 2 21": (("x,y,z", "-x,-y,z+1/2", "-x,y,-z+1/2", "x,-y,-z"), ()),
+ "P 21 2 2": (("x,y,z", "x+1/2,-y,-z", "-x+1/2,-y,z", "-x,y,-z"), ()),
+ "P 2 21 2": (("x,y,z", "-x,y+1/2,-z", "x,-y+1/2,-z", "-x,-y,z"), ()),
+ "P 21 21 2": (("x,y,z", "-x,-y,z", "-x+1/2,y+1/2,-z", "x+1/2,-y+1/2,-z"), ()),
+ "P 2 21 21": (("x,y,z", "x,-y,-z", "-x,y+1/2,-z+1/2", "-x,-y+1/2,z+1/2"), ()),
+ "P 21 2 21": (("x,y,z", "-x,y,-z", "-x+1/2,-y,z+1/2", "x+1/2,-y,-z+1/2"), ()),
+ "P 21 21 21": (("x,y,z", "-x+1/2,-y,z+1/2", "-x,y+1/2,-z+1/2", "x+1/2,-y+1/2,-z"), ()),
+ "C 2 2 21": (("x,y,z", "-x,-y,z+1/2", "-x,y,-z+1/2", "x,-y,-z"), ("1/2,1/2,0",)),
+ "C 2 2 2": (("x,y,z", "-x,-y,z", "-x,y,-z", "x,-y,-z"), ("1/2,1/2,0",)),
+ "F 2 2 2": (("x,y,z", "-x,-y,z", "-x,y,-z", "x,-y,-z"), ("0,1/2,1/2", "1/2,0,1/2", "1/2,1/2,0")),
+ "I 2 2 2": (("x,y,z", "-x,-y,z", "-x,y,-z", "x,-y,-z"), ("1/2,1/2,1/2",)),
+ "I 21 21 21": (("x,y,z", "-x+1/2,-y,z+1/2", "-x,y+1/2,-z+1/2", "x+1/2,-y+1/2,-z"), ("1/2,1/2,1/2",)),
+ "P 4": (("x,y,z", "-x,-y,z", "-y,x,z", "y,-x,z"), ()),
+ "P 41": (("x,y,z", "-x,-y,z+1/2", "-y,x,z+1/4", "y,-x,z+3/4"), ()),
+ "P 42": (("x,y,z", "-x,-y,z", "-y,x,z+1/2", "y,-x,z+1/2"), ()),
+ "P 43": (("x,y,z", "-x,-y,z+1/2", "-y,x,z+3/4", "y,-x,z+1/4"), ()),
+ "I 4": (("x,y,z", "-x,-y,z", "-y,x,z", "y,-x,z"), ("1/2,1/2,1/2",)),
+ "I 41": (("x,y,z", "-x+1/2,-y+1/2,z+1/2", "-y,x+1/2,z+1/4", "y+1/2,-x,z+3/4"), ("1/2,1/2,1/2",)),
+ "P 4 2 2": (("x,y,z", "-x,-y,z", "-y,x,z", "y,-x,z",
+  "-x,y,-z", "x,-y,-z", "y,x,-z", "-y,-x,-z"), ()),
+ "P 4 21 2": (("x,y,z", "-x,-y,z", "-y+1/2,x+1/2,z", "y+1/2,-x+1/2,z",
+  "-x+1/2,y+1/2,-z", "x+1/2,-y+1/2,-z", "y,x,-z", "-y,-x,-z"), ()),
+ "P 41 2 2": (("x,y,z", "-x,-y,z+1/2", "-y,x,z+1/4", "y,-x,z+3/4",
+  "-x,y,-z", "x,-y,-z+1/2", "y,x,-z+3/4", "-y,-x,-z+1/4"), ()),
+ "P 41 21 2": (("x,y,z", "-x,-y,z+1/2", "-y+1/2,x+1/2,z+1/4", "y+1/2,-x+1/2,z+3/4",
+  "-x+1/2,y+1/2,-z+1/4", "x+1/2,-y+1/2,-z+3/4", "y,x,-z", "-y,-x,-z+1/2"), ()),
+ "P 42 2 2": (("x,y,z", "-x,-y,z", "-y,x,z+1/2", "y,-x,z+1/2",
+  "-x,y,-z", "x,-y,-z", "y,x,-z+1/2", "-y,-x,-z+1/2"), ()),
+ "P 42 21 2": (("x,y,z", "-x,-y,z", "-y+1/2,x+1/2,z+1/2", "y+1/2,-x+1/2,z+1/2",
+  "-x+1/2,y+1/2,-z+1/2", "x+1/2,-y+1/2,-z+1/2", "y,x,-z", "-y,-x,-z"), ()),
+ "P 43 2 2": (("x,y,z", "-x,-y,z+1/2", "-y,x,z+3/4", "y,-x,z+1/4",
+  "-x,y,-z", "x,-y,-z+1/2", "y,x,-z+1/4", "-y,-x,-z+3/4"), ()),
+ "P 43 21 2": (("x,y,z", "-x,-y,z+1/2", "-y+1/2,x+1/2,z+3/4", "y+1/2,-x+1/2,z+1/4",
+  "-x+1/2,y+1/2,-z+3/4", "x+1/2,-y+1/2,-z+1/4", "y,x,-z", "-y,-x,-z+1/2"), ()),
+ "I 4 2 2": (("x,y,z", "-x,-y,z", "-y,x,z", "y,-x,z",
+  "-x,y,-z", "x,-y,-z", "y,x,-z", "-y,-x,-z"), ("1/2,1/2,1/2",)),
+ "I 41 2 2": (("x,y,z", "-x+1/2,-y+1/2,z+1/2", "-y,x+1/2,z+1/4", "y+1/2,-x,z+3/4",
+  "-x+1/2,y,-z+3/4", "x,-y+1/2,-z+1/4", "y+1/2,x+1/2,-z+1/2", "-y,-x,-z"), ("1/2,1/2,1/2",)),
+ "P 3": (("x,y,z", "-y,x-y,z", "-x+y,-x,z"), ()),
+ "P 31": (("x,y,z", "-y,x-y,z+1/3", "-x+y,-x,z+2/3"), ()),
+ "P 32": (("x,y,z", "-y,x-y,z+2/3", "-x+y,-x,z+1/3"), ()),
+ "H 3": (("x,y,z", "-y,x-y,z", "-x+y,-x,z"), ("2/3,1/3,1/3", "1/3,2/3,2/3")),
+ "R 3": (("x,y,z", "z,x,y", "y,z,x"), ()),
+ "P 3 1 2": (("x,y,z", "-y,x-y,z", "-x+y,-x,z", "-y,-x,-z", "-x+y,y,-z", "x,x-y,-z"), ()),
+ "P 3 2 1": (("x,y,z", "-y,x-y,z", "-x+y,-x,z", "y,x,-z", "x-y,-y,-z", "-x,-x+y,-z"), ()),
+ "P 31 1 2": (("x,y,z", "-y,x-y,z+1/3", "-x+y,-x,z+2/3",
+  "-y,-x,-z+2/3", "-x+y,y,-z+1/3", "x,x-y,-z"), ()),
+ "P 31 2 1": (("x,y,z", "-y,x-y,z+1/3", "-x+y,-x,z+2/3",
+  "y,x,-z", "x-y,-y,-z+2/3", "-x,-x+y,-z+1/3"), ()),
+ "P 32 1 2": (("x,y,z", "-y,x-y,z+2/3", "-x+y,-x,z+1/3",
+  "-y,-x,-z+1/3", "-x+y,y,-z+2/3", "x,x-y,-z"), ()),
+ "P 32 2 1": (("x,y,z", "-y,x-y,z+2/3", "-x+y,-x,z+1/3",
+  "y,x,-z", "x-y,-y,-z+1/3", "-x,-x+y,-z+2/3"), ()),
+ "H 3 2": (("x,y,z", "-y,x-y,z", "-x+y,-x,z", "y,x,-z", "x-y,-y,-z", "-x,-x+y,-z"),
+  ("2/3,1/3,1/3", "1/3,2/3,2/3")),
+ "R 3 2": (("x,y,z", "z,x,y", "y,z,x", "-y,-x,-z", "-x,-z,-y", "-z,-y,-x"), ()),
+ "P 6": (("x,y,z", "-y,x-y,z", "-x+y,-x,z", "-x,-y,z", "y,-x+y,z", "x-y,x,z"), ()),
+ "P 61": (("x,y,z", "-y,x-y,z+1/3", "-x+y,-x,z+2/3",
+  "-x,-y,z+1/2", "y,-x+y,z+5/6", "x-y,x,z+1/6"), ()),
+ "P 65": (("x,y,z", "-y,x-y,z+2/3", "-x+y,-x,z+1/3",
+  "-x,-y,z+1/2", "y,-x+y,z+1/6", "x-y,x,z+5/6"), ()),
+ "P 62": (("x,y,z", "-y,x-y,z+2/3", "-x+y,-x,z+1/3",
+  "-x,-y,z", "y,-x+y,z+2/3", "x-y,x,z+1/3"), ()),
+ "P 64": (("x,y,z", "-y,x-y,z+1/3", "-x+y,-x,z+2/3",
+  "-x,-y,z", "y,-x+y,z+1/3", "x-y,x,z+2/3"), ()),
+ "P 63": (("x,y,z", "-y,x-y,z", "-x+y,-x,z", "-x,-y,z+1/2", "y,-x+y,z+1/2", "x-y,x,z+1/2"), ()),
+ "P 6 2 2": (("x,y,z", "-y,x-y,z", "-x+y,-x,z", "-x,-y,z", "y,-x+y,z", "x-y,x,z",
+  "y,x,-z", "x-y,-y,-z", "-x,-x+y,-z", "-y,-x,-z", "-x+y,y,-z", "x,x-y,-z"), ()),
+ "P 61 2 2": (("x,y,z", "-y,x-y,z+1/3", "-x+y,-x,z+2/3",
+  "-x,-y,z+1/2", "y,-x+y,z+5/6", "x-y,x,z+1/6", "y,x,-z+1/3", "x-y,-y,-z",
+  "-x,-x+y,-z+2/3", "-y,-x,-z+5/6", "-x+y,y,-z+1/2", "x,x-y,-z+1/6"), ()),
+ "P 65 2 2": (("x,y,z", "-y,x-y,z+2/3", "-x+y,-x,z+1/3",
+  "-x,-y,z+1/2", "y,-x+y,z+1/6", "x-y,x,z+5/6", "y,x,-z+2/3", "x-y,-y,-z",
+  "-x,-x+y,-z+1/3", "-y,-x,-z+1/6", "-x+y,y,-z+1/2", "x,x-y,-z+5/6"), ()),
+ "P 62 2 2": (("x,y,z", "-y,x-y,z+2/3", "-x+y,-x,z+1/3",
+  "-x,-y,z", "y,-x+y,z+2/3", "x-y,x,z+1/3", "y,x,-z+2/3", "x-y,-y,-z",
+  "-x,-x+y,-z+1/3", "-y,-x,-z+2/3", "-x+y,y,-z", "x,x-y,-z+1/3"), ()),
+ "P 64 2 2": (("x,y,z", "-y,x-y,z+1/3", "-x+y,-x,z+2/3",
+  "-x,-y,z", "y,-x+y,z+1/3", "x-y,x,z+2/3", "y,x,-z+1/3", "x-y,-y,-z",
+  "-x,-x+y,-z+2/3", "-y,-x,-z+1/3", "-x+y,y,-z", "x,x-y,-z+2/3"), ()),
+ "P 63 2 2": (("x,y,z", "-y,x-y,z", "-x+y,-x,z", "-x,-y,z+1/2", "y,-x+y,z+1/2", "x-y,x,z+1/2",
+  "y,x,-z", "x-y,-y,-z", "-x,-x+y,-z", "-y,-x,-z+1/2", "-x+y,y,-z+1/2", "x,x-y,-z+1/2"), ()),
+ "P 2 3": (("x,y,z", "-x,-y,z", "-x,y,-z", "x,-y,-z", "z,x,y", "z,-x,-y",
+  "-z,-x,y", "-z,x,-y", "y,z,x", "-y,z,-x", "y,-z,-x", "-y,-z,x"), ()),
+ "F 2 3": (("x,y,z", "-x,-y,z", "-x,y,-z", "x,-y,-z", "z,x,y", "z,-x,-y",
+  "-z,-x,y", "-z,x,-y", "y,z,x", "-y,z,-x", "y,-z,-x", "-y,-z,x"), ("0,1/2,1/2", "1/2,0,1/2", "1/2,1/2,0")),
+ "I 2 3": (("x,y,z", "-x,-y,z", "-x,y,-z", "x,-y,-z", "z,x,y", "z,-x,-y",
+  "-z,-x,y", "-z,x,-y", "y,z,x", "-y,z,-x", "y,-z,-x", "-y,-z,x"), ("1/2,1/2,1/2",)),
+ "P 21 3": (("x,y,z", "-x+1/2,-y,z+1/2", "-x,y+1/2,-z+1/2", "x+1/2,-y+1/2,-z",
+  "z,x,y", "z+1/2,-x+1/2,-y", "-z+1/2,-x,y+1/2", "-z,x+1/2,-y+1/2",
+  "y,z,x", "-y,z+1/2,-x+1/2", "y+1/2,-z+1/2,-x", "-y+1/2,-z,x+1/2"), ()),
+ "I 21 3": (("x,y,z", "-x+1/2,-y,z+1/2", "-x,y+1/2,-z+1/2", "x+1/2,-y+1/2,-z",
+  "z,x,y", "z+1/2,-x+1/2,-y", "-z+1/2,-x,y+1/2", "-z,x+1/2,-y+1/2",
+  "y,z,x", "-y,z+1/2,-x+1/2", "y+1/2,-z+1/2,-x", "-y+1/2,-z,x+1/2"), ("1/2,1/2,1/2",)),
+ "P 4 3 2": (("x,y,z", "-x,-y,z", "-x,y,-z", "x,-y,-z", "z,x,y", "z,-x,-y",
+  "-z,-x,y", "-z,x,-y", "y,z,x", "-y,z,-x", "y,-z,-x", "-y,-z,x",
+  "y,x,-z", "-y,-x,-z", "y,-x,z", "-y,x,z", "x,z,-y", "-x,z,y",
+  "-x,-z,-y", "x,-z,y", "z,y,-x", "z,-y,x", "-z,y,x", "-z,-y,-x"), ()),
+ "P 42 3 2": (("x,y,z", "-x,-y,z", "-x,y,-z", "x,-y,-z", "z,x,y", "z,-x,-y",
+  "-z,-x,y", "-z,x,-y", "y,z,x", "-y,z,-x", "y,-z,-x", "-y,-z,x",
+  "y+1/2,x+1/2,-z+1/2", "-y+1/2,-x+1/2,-z+1/2", "y+1/2,-x+1/2,z+1/2",
+  "-y+1/2,x+1/2,z+1/2", "x+1/2,z+1/2,-y+1/2", "-x+1/2,z+1/2,y+1/2", "-x+1/2,-z+1/2,-y+1/2",
+  "x+1/2,-z+1/2,y+1/2", "z+1/2,y+1/2,-x+1/2", "z+1/2,-y+1/2,x+1/2", "-z+1/2,y+1/2,x+1/2",
+  "-z+1/2,-y+1/2,-x+1/2"), ()),
+ "F 4 3 2": (("x,y,z", "-x,-y,z", "-x,y,-z", "x,-y,-z", "z,x,y", "z,-x,-y",
+  "-z,-x,y", "-z,x,-y", "y,z,x", "-y,z,-x", "y,-z,-x", "-y,-z,x",
+  "y,x,-z", "-y,-x,-z", "y,-x,z", "-y,x,z", "x,z,-y", "-x,z,y",
+  "-x,-z,-y", "x,-z,y", "z,y,-x", "z,-y,x", "-z,y,x", "-z,-y,-x"), ("0,1/2,1/2", "1/2,0,1/2", "1/2,1/2,0")),
+ "F 41 3 2": (("x,y,z", "-x,-y+1/2,z+1/2", "-x+1/2,y,-z+1/2", "x+1/2,-y+1/2,-z",
+  "z,x,y", "z+1/2,-x,-y+1/2", "-z,-x+1/2,y+1/2", "-z+1/2,x+1/2,-y",
+  "y,z,x", "-y+1/2,z+1/2,-x", "y+1/2,-z,-x+1/2", "-y,-z+1/2,x+1/2",
+  "y+3/4,x+1/4,-z+3/4", "-y+1/4,-x+1/4,-z+1/4", "y+1/4,-x+3/4,z+3/4",
+  "-y+3/4,x+3/4,z+1/4", "x+3/4,z+1/4,-y+3/4", "-x+3/4,z+3/4,y+1/4", "-x+1/4,-z+1/4,-y+1/4",
+  "x+1/4,-z+3/4,y+3/4", "z+3/4,y+1/4,-x+3/4", "z+1/4,-y+3/4,x+3/4", "-z+3/4,y+3/4,x+1/4",
+  "-z+1/4,-y+1/4,-x+1/4"), ("0,1/2,1/2", "1/2,0,1/2", "1/2,1/2,0")),
+ "I 4 3 2": (("x,y,z", "-x,-y,z", "-x,y,-z", "x,-y,-z", "z,x,y", "z,-x,-y",
+  "-z,-x,y", "-z,x,-y", "y,z,x", "-y,z,-x", "y,-z,-x", "-y,-z,x",
+  "y,x,-z", "-y,-x,-z", "y,-x,z", "-y,x,z", "x,z,-y", "-x,z,y",
+  "-x,-z,-y", "x,-z,y", "z,y,-x", "z,-y,x", "-z,y,x", "-z,-y,-x"), ("1/2,1/2,1/2",)),
+ "P 43 3 2": (("x,y,z", "-x+1/2,-y,z+1/2", "-x,y+1/2,-z+1/2", "x+1/2,-y+1/2,-z",
+  "z,x,y", "z+1/2,-x+1/2,-y", "-z+1/2,-x,y+1/2", "-z,x+1/2,-y+1/2",
+  "y,z,x", "-y,z+1/2,-x+1/2", "y+1/2,-z+1/2,-x", "-y+1/2,-z,x+1/2",
+  "y+1/4,x+3/4,-z+3/4", "-y+1/4,-x+1/4,-z+1/4", "y+3/4,-x+3/4,z+1/4",
+  "-y+3/4,x+1/4,z+3/4", "x+1/4,z+3/4,-y+3/4", "-x+3/4,z+1/4,y+3/4", "-x+1/4,-z+1/4,-y+1/4",
+  "x+3/4,-z+3/4,y+1/4", "z+1/4,y+3/4,-x+3/4", "z+3/4,-y+3/4,x+1/4", "-z+3/4,y+1/4,x+3/4",
+  "-z+1/4,-y+1/4,-x+1/4"), ()),
+ "P 41 3 2": (("x,y,z", "-x+1/2,-y,z+1/2", "-x,y+1/2,-z+1/2", "x+1/2,-y+1/2,-z",
+  "z,x,y", "z+1/2,-x+1/2,-y", "-z+1/2,-x,y+1/2", "-z,x+1/2,-y+1/2",
+  "y,z,x", "-y,z+1/2,-x+1/2", "y+1/2,-z+1/2,-x", "-y+1/2,-z,x+1/2",
+  "y+3/4,x+1/4,-z+1/4", "-y+3/4,-x+3/4,-z+3/4", "y+1/4,-x+1/4,z+3/4",
+  "-y+1/4,x+3/4,z+1/4", "x+3/4,z+1/4,-y+1/4", "-x+1/4,z+3/4,y+1/4", "-x+3/4,-z+3/4,-y+3/4",
+  "x+1/4,-z+1/4,y+3/4", "z+3/4,y+1/4,-x+1/4", "z+1/4,-y+1/4,x+3/4", "-z+1/4,y+3/4,x+1/4",
+  "-z+3/4,-y+3/4,-x+3/4"), ()),
+ "I 41 3 2": (("x,y,z", "-x+1/2,-y,z+1/2", "-x,y+1/2,-z+1/2", "x+1/2,-y+1/2,-z",
+  "z,x,y", "z+1/2,-x+1/2,-y", "-z+1/2,-x,y+1/2", "-z,x+1/2,-y+1/2",
+  "y,z,x", "-y,z+1/2,-x+1/2", "y+1/2,-z+1/2,-x", "-y+1/2,-z,x+1/2",
+  "y+3/4,x+1/4,-z+1/4", "-y+3/4,-x+3/4,-z+3/4", "y+1/4,-x+1/4,z+3/4",
+  "-y+1/4,x+3/4,z+1/4", "x+3/4,z+1/4,-y+1/4", "-x+1/4,z+3/4,y+1/4", "-x+3/4,-z+3/4,-y+3/4",
+  "x+1/4,-z+1/4,y+3/4", "z+3/4,y+1/4,-x+1/4", "z+1/4,-y+1/4,x+3/4", "-z+1/4,y+3/4,x+1/4",
+  "-z+3/4,-y+3/4,-x+3/4"), ("1/2,1/2,1/2",))
+}
+
+#Other names the same space groups go by
+SPACE_GROUP_ALIASES = {
+ "P 2": "P 1 2 1", "P 21": "P 1 21 1", "C 2": "C 1 2 1", "I 2": "I 1 2 1"
+}
+
+def parse_symmetry_operator(text):
+    """Turns an operator such as -x+1/2,y,z+1/2 into a 3x4 matrix acting on
+    fractional coordinates."""
+
+    matrix = []
+    for expression in text.replace(" ", "").lower().split(","):
+        row = [0.0, 0.0, 0.0, 0.0]
+        for term in expression.replace("-", "+-").split("+"):
+            if not term:
+                continue
+            sign = -1 if term.startswith("-") else 1
+            term = term.lstrip("-")
+            if term in ("x", "y", "z"):
+                row["xyz".index(term)] += sign
+            elif "/" in term:
+                numerator, denominator = term.split("/")
+                row[3] += sign * float(numerator) / float(denominator)
+            else:
+                row[3] += sign * float(term)
+        matrix.append(row)
+    if len(matrix) != 3:
+        raise PdbStructureError("%s is not a valid symmetry operator" % text)
+    return matrix
+
+
+def get_symmetry_operators(space_group):
+    """Returns the fractional 3x4 operators of a space group (including
+    lattice centering)."""
+
+    name = " ".join(space_group.split()) if space_group else None
+    name = SPACE_GROUP_ALIASES.get(name, name)
+    if name not in SPACE_GROUPS:
+        raise PdbStructureError("Don't know the operators of space group %s" % space_group)
+    operators, centering = SPACE_GROUPS[name]
+    operators = [parse_symmetry_operator(o) for o in operators]
+    for vector in centering:
+        shift = [row[3] for row in parse_symmetry_operator(vector)]
+        operators += [[row[:3] + [row[3] + shift[index]] for index, row in enumerate(o)]
+         for o in operators[:len(SPACE_GROUPS[name][0])]]
+    return operators
+
+
+def multiply_matrix_point(matrix, point):
+    """Applies a 3x3 (or the rotation part of a 3x4) matrix to a point."""
+
+    return tuple(sum([matrix[row][col] * point[col] for col in range(3)]) for row in range(3))
+
+
+def invert_matrix(m):
+    """Inverts a 3x3 matrix."""
+
+    determinant = (m[0][0] * ((m[1][1] * m[2][2]) - (m[1][2] * m[2][1]))
+     - m[0][1] * ((m[1][0] * m[2][2]) - (m[1][2] * m[2][0]))
+     + m[0][2] * ((m[1][0] * m[2][1]) - (m[1][1] * m[2][0])))
+    if not determinant:
+        raise PdbStructureError("Matrix cannot be inverted")
+    return [[((m[(col + 1) % 3][(row + 1) % 3] * m[(col + 2) % 3][(row + 2) % 3]) -
+     (m[(col + 1) % 3][(row + 2) % 3] * m[(col + 2) % 3][(row + 1) % 3])) / determinant
+      for col in range(3)] for row in range(3)]
+
+
+
 class UnitCell:
 
     def __init__(self, crystal_section):
@@ -9,12 +234,146 @@ class UnitCell:
         self.gamma = crystal_section.gamma
         self.s_group = crystal_section.s_group
         self.z = crystal_section.z
+        self.scale = CrystallographicCoordinatesTransformation(crystal_section).get_matrix()
 
 
     def __repr__(self):
         return "<Unit Cell>%i×%i×%i" % (self.a, self.b, self.c)
 
 
+    def get_orthogonalisation_matrix(self):
+        """Returns the 3x3 matrix converting fractional coordinates to
+        cartesian ones (a along x, b in the xy plane)."""
+
+        if None in (self.a, self.b, self.c, self.alpha, self.beta, self.gamma):
+            raise PdbStructureError("Unit cell dimensions are not given")
+        alpha, beta, gamma = [math.radians(angle) for angle in (self.alpha, self.beta, self.gamma)]
+        volume = self.a * self.b * self.c * math.sqrt(
+         1 - (math.cos(alpha) ** 2) - (math.cos(beta) ** 2) - (math.cos(gamma) ** 2)
+          + (2 * math.cos(alpha) * math.cos(beta) * math.cos(gamma))
+        )
+        return [
+         [self.a, self.b * math.cos(gamma), self.c * math.cos(beta)],
+         [0, self.b * math.sin(gamma),
+          self.c * (math.cos(alpha) - (math.cos(beta) * math.cos(gamma))) / math.sin(gamma)],
+         [0, 0, volume / (self.a * self.b * math.sin(gamma))]
+        ]
+
+
+    def get_fractionalisation_matrix(self):
+        """Returns the 3x3 matrix converting cartesian coordinates to
+        fractional ones."""
+
+        return invert_matrix(self.get_orthogonalisation_matrix())
+
+
+    def get_scale_matrix(self):
+        """Returns the 3x4 matrix (rotation then translation) converting the
+        file's cartesian coordinates to fractional ones. This comes from the
+        SCALE records where the file has them, as the coordinates may not be
+        in the standard orientation - otherwise it is derived from the cell
+        dimensions."""
+
+        if self.scale is not None:
+            return [list(row) for row in self.scale]
+        return [row + [0.0] for row in self.get_fractionalisation_matrix()]
+
+
+    def fractionalise(self, x, y, z):
+        return multiply_matrix_point(self.get_fractionalisation_matrix(), (x, y, z))
+
+
+    def cartesianise(self, u, v, w):
+        return multiply_matrix_point(self.get_orthogonalisation_matrix(), (u, v, w))
+
+
+    def get_space_group(self):
+        """Returns the space group name to look operators up by. PDB entries
+        use R 3 and R 3 2 for rhombohedral cells, but some give those names
+        with a hexagonal cell (a = b, gamma = 120) - in which case they are
+        the H groups."""
+
+        name = " ".join(self.s_group.split()) if self.s_group else None
+        if name in ("R 3", "R 3 2") and self.is_hexagonal():
+            return "H" + name[1:]
+        return name
+
+
+    def is_hexagonal(self):
+        if None in (self.a, self.b, self.alpha, self.beta, self.gamma):
+            return False
+        return (abs(self.a - self.b) < 0.01 and abs(self.alpha - 90) < 0.01
+         and abs(self.beta - 90) < 0.01 and abs(self.gamma - 120) < 0.01)
+
+
+    def get_symmetry_operators(self):
+        return get_symmetry_operators(self.get_space_group())
+
+
+    def find_contacts(self, atoms, cutoff=4, operators=None):
+        """Finds atoms that are within cutoff of a symmetry mate of another
+        atom, anywhere in the crystal. Each symmetry operator and lattice
+        translation is tried in turn, but copies whose bounding box can't come
+        within cutoff of the original atoms are skipped, and those that can are
+        checked one atom at a time against a spatial grid of the originals -
+        no copy of the structure is ever built.
+
+        Returns (atom, mate atom, operator index, lattice translation,
+        distance) tuples, where mate atom is the original Atom whose symmetry
+        image is close to atom. A contact across a symmetry operator will
+        usually also appear the other way round, under the inverse operator."""
+
+        atoms = [a for a in atoms if a.x is not None]
+        if not atoms:
+            return []
+        operators = operators or self.get_symmetry_operators()
+        scale = self.get_scale_matrix()
+        fractionalisation = [row[:3] for row in scale]
+        shift = [row[3] for row in scale]
+        orthogonalisation = invert_matrix(fractionalisation)
+        grid = AtomGrid(atoms, cell_size=max(cutoff, 1))
+        fractional = [tuple(value + shift[axis] for axis, value in enumerate(
+         multiply_matrix_point(fractionalisation, (a.x, a.y, a.z))
+        )) for a in atoms]
+        low = [min([f[axis] for f in fractional]) for axis in range(3)]
+        high = [max([f[axis] for f in fractional]) for axis in range(3)]
+
+        #How far can cutoff reach along each fractional axis?
+        reach = [cutoff * math.sqrt(sum([value ** 2 for value in row])) for row in fractionalisation]
+
+        contacts = []
+        for index, operator in enumerate(operators):
+            images = [tuple(value + operator[axis][3] for axis, value in
+             enumerate(multiply_matrix_point(operator, f))) for f in fractional]
+            image_low = [min([i[axis] for i in images]) for axis in range(3)]
+            image_high = [max([i[axis] for i in images]) for axis in range(3)]
+            ranges = [range(
+             int(math.floor(low[axis] - image_high[axis] - reach[axis])),
+             int(math.ceil(high[axis] - image_low[axis] + reach[axis])) + 1
+            ) for axis in range(3)]
+            for i in ranges[0]:
+                for j in ranges[1]:
+                    for k in ranges[2]:
+                        translation = (i, j, k)
+                        if translation == (0, 0, 0) and operator == IDENTITY_OPERATOR:
+                            continue
+                        if any(image_low[axis] + translation[axis] > high[axis] + reach[axis] or
+                         image_high[axis] + translation[axis] < low[axis] - reach[axis]
+                          for axis in range(3)):
+                            continue
+                        for mate, image in zip(atoms, images):
+                            x, y, z = multiply_matrix_point(orthogonalisation, (
+                             image[0] + i - shift[0], image[1] + j - shift[1],
+                             image[2] + k - shift[2]
+                            ))
+                            for atom in grid.atoms_near(x, y, z, cutoff):
+                                distance = math.sqrt(
+                                 ((atom.x - x) ** 2) + ((atom.y - y) ** 2) + ((atom.z - z) ** 2)
+                                )
+                                contacts.append((atom, mate, index, translation, distance))
+        return contacts
+
+
 
 
 class Transformation:
@@ -24,6 +383,18 @@ class Transformation:
             for b in range(1,4):
                 self.__dict__["%s%i%i" % (m, a, b)] = crystal_section.__dict__["%s%i%i" % (m, a, b)]
             self.__dict__["%s%i" % (n, a)] = crystal_section.__dict__["%s%i" % (n, a)]
+        self.m, self.n = m, n
+
+
+    def get_matrix(self):
+        """Returns the transformation as a 3x4 matrix (rotation then
+        translation), or None if the file doesn't give it."""
+
+        rows = [[self.__dict__["%s%i%i" % (self.m, a, b)] for b in range(1, 4)] +
+         [self.__dict__["%s%i" % (self.n, a)]] for a in range(1, 4)]
+        if any(value is None for row in rows for value in row[:3]):
+            return None
+        return [[value or 0.0 for value in row] for row in rows]
 
 
 
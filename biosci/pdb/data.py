@@ -1,4 +1,5 @@
 from .exceptions import *
+from . import profiling
 import datetime
 
 class PdbDataStructure:
@@ -8,16 +9,20 @@ class PdbDataStructure:
         self.file = pdb_file
 
         #Create the sections
-        self.title = TitleSection(self.file)
-        self.primary_structure = PrimaryStructureSection(self.file)
-        self.heterogen = HeterogenSection(self.file)
-        self.secondary_structure = SecondaryStructureSection(self.file)
-        self.connectivity_annotation = ConnectivityAnnotationSection(self.file)
-        self.miscellaneous = MiscellaneousSection(self.file)
-        self.crystal = CrystalSection(self.file)
-        self.coordinates = CoordinateSection(self.file)
-        self.connectivity = ConnectivitySection(self.file)
-        self.bookkeeping = BookkeepingSection(self.file)
+        for name, section in (
+         ("title", TitleSection),
+         ("primary_structure", PrimaryStructureSection),
+         ("heterogen", HeterogenSection),
+         ("secondary_structure", SecondaryStructureSection),
+         ("connectivity_annotation", ConnectivityAnnotationSection),
+         ("miscellaneous", MiscellaneousSection),
+         ("crystal", CrystalSection),
+         ("coordinates", CoordinateSection),
+         ("connectivity", ConnectivitySection),
+         ("bookkeeping", BookkeepingSection)
+        ):
+            with profiling.span("data." + name):
+                setattr(self, name, section(self.file))
 
 
 
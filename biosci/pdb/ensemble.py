@@ -0,0 +1,197 @@
+import math
+from array import array
+from .exceptions import *
+from .geometry import get_atom_key, centre_coordinates, superpose_centred, apply_matrix, get_rmsd
+from .structure import Model
+
+COORDINATE_RECORDS = ("MODEL", "ATOM", "ANISOU", "TER", "HETATM", "ENDMDL")
+
+def get_atom_dict_key(atom_dict):
+    """The get_atom_key of the atom an atom dictionary will become."""
+
+    return (atom_dict["chain_id"], atom_dict["res_seq"], atom_dict["i_code"], atom_dict["name"])
+
+
+def unpack_coordinates(coordinates):
+    """Turns a flat x, y, z, x, y, z... array into a list of (x, y, z)."""
+
+    return list(zip(coordinates[0::3], coordinates[1::3], coordinates[2::3]))
+
+
+def read_first_model(handle):
+    """Takes a PDB file opened in text mode and returns its text with the
+    coordinate records of every model after the first left out - enough to
+    build a topology from without holding every model in memory."""
+
+    lines, models_ended = [], False
+    for line in handle:
+        if line[:6].strip() in COORDINATE_RECORDS:
+            if models_ended:
+                continue
+            if line.startswith("ENDMDL"):
+                models_ended = True
+        lines.append(line)
+    return "".join(lines)
+
+
+def get_mean_positions(models):
+    """Averages several equally long lists of (x, y, z) atom by atom."""
+
+    count = len(models)
+    return [(
+     sum([c[0] for c in positions]) / count,
+     sum([c[1] for c in positions]) / count,
+     sum([c[2] for c in positions]) / count
+    ) for positions in zip(*models)]
+
+
+
+class Ensemble:
+    """A set of models (such as an NMR ensemble) that all have the same atoms.
+    Only one Model - the topology - is built, with its chains, residues and
+    bonds, and every model is otherwise just a flat array of coordinates in
+    the topology's atom order. The PdbDataStructure it is made from isn't
+    kept, so that only the topology and the arrays stay in memory."""
+
+    def __init__(self, pdb_data, topology=None):
+        model_dicts = pdb_data.coordinates.models
+        if not model_dicts:
+            raise PdbStructureError("There are no models to make an ensemble from")
+        self.topology = topology or Model(model_dicts[0], pdb_data.miscellaneous.sites,
+         pdb_data.secondary_structure, pdb_data.connectivity,
+          pdb_data.connectivity_annotation, pdb_data.heterogen, pdb_data.title)
+        self.atom_indices = {atom: index for index, atom in enumerate(self.topology.atoms)}
+        keys = [get_atom_key(atom) for atom in self.topology.atoms]
+        self.coordinates = []
+        for model_number, model_dict in enumerate(model_dicts, start=1):
+            atoms_by_key = {}
+            for atom_dict in model_dict["atoms"]:
+                atoms_by_key.setdefault(get_atom_dict_key(atom_dict), atom_dict)
+            coordinates = array("d")
+            for key in keys:
+                atom_dict = atoms_by_key.get(key)
+                if atom_dict is None:
+                    raise PdbStructureError("Model %i has no atom %s" % (model_number, str(key)))
+                coordinates.extend((atom_dict["x"], atom_dict["y"], atom_dict["z"]))
+            self.coordinates.append(coordinates)
+
+
+    @staticmethod
+    def from_frames(topology, frames):
+        """Makes an Ensemble from a topology and an iterable of flat x, y, z...
+        arrays in its atom order (such as a Trajectory's frames), keeping only
+        the arrays."""
+
+        ensemble = Ensemble.__new__(Ensemble)
+        ensemble.topology = topology
+        ensemble.atom_indices = {atom: index for index, atom in enumerate(topology.atoms)}
+        ensemble.coordinates = list(frames)
+        if not ensemble.coordinates:
+            raise PdbStructureError("There are no models to make an ensemble from")
+        return ensemble
+
+
+    def __repr__(self):
+        return "<Ensemble (%i models, %i atoms)>" % (len(self.coordinates), len(self.topology.atoms))
+
+
+    def __len__(self):
+        return len(self.coordinates)
+
+
+    def get_coordinates(self, index):
+        """Returns one model's coordinates as a list of (x, y, z)."""
+
+        return unpack_coordinates(self.coordinates[index])
+
+
+    def set_model(self, index):
+        """Moves the topology's atoms to the coordinates of one model, so that
+        the usual per-atom methods can be used on it."""
+
+        self.topology.set_coordinates(self.get_coordinates(index))
+        return self.topology
+
+
+    def get_atom_indices(self, atoms=None):
+        if atoms is None:
+            return list(range(len(self.topology.atoms)))
+        return [self.atom_indices[atom] for atom in atoms]
+
+
+    def get_superposed_coordinates(self, reference=0, atoms=None):
+        """Returns every model's coordinates after fitting it onto a reference
+        model, using only the given topology atoms (such as alpha carbons)
+        for the fit if they are given."""
+
+        indices = self.get_atom_indices(atoms)
+        reference_coordinates = self.get_coordinates(reference)
+        reference_centred = centre_coordinates([reference_coordinates[i] for i in indices])
+        superposed = []
+        for coordinates in self.coordinates:
+            coordinates = unpack_coordinates(coordinates)
+            mobile_centred = centre_coordinates([coordinates[i] for i in indices])
+            rotation = superpose_centred(mobile_centred, reference_centred)[0]
+            mobile_centroid, reference_centroid = mobile_centred[0], reference_centred[0]
+            moved = apply_matrix(rotation, [(
+             x - mobile_centroid[0], y - mobile_centroid[1], z - mobile_centroid[2]
+            ) for x, y, z in coordinates])
+            superposed.append([(
+             x + reference_centroid[0], y + reference_centroid[1], z + reference_centroid[2]
+            ) for x, y, z in moved])
+        return superposed
+
+
+    def get_model_coordinates(self, superpose, atoms):
+        if superpose:
+            return self.get_superposed_coordinates(atoms=atoms)
+        return [unpack_coordinates(coordinates) for coordinates in self.coordinates]
+
+
+    def get_rmsds(self, reference=0, superpose=True, atoms=None):
+        """Returns the RMSD of every model from a reference model, over the
+        given atoms (all of them by default). The models are first fitted onto
+        the reference unless superpose is False."""
+
+        indices = self.get_atom_indices(atoms)
+        reference_coordinates = self.get_coordinates(reference)
+        reference_subset = [reference_coordinates[i] for i in indices]
+        reference_centred = centre_coordinates(reference_subset)
+        rmsds = []
+        for coordinates in self.coordinates:
+            coordinates = unpack_coordinates(coordinates)
+            subset = [coordinates[i] for i in indices]
+            if superpose:
+                rmsds.append(superpose_centred(centre_coordinates(subset), reference_centred)[1])
+            else:
+                rmsds.append(get_rmsd(subset, reference_subset))
+        return rmsds
+
+
+    def get_mean_coordinates(self, superpose=True, atoms=None):
+        """Returns the average position of every atom across the models."""
+
+        return get_mean_positions(self.get_model_coordinates(superpose, atoms))
+
+
+    def get_mean_structure(self, superpose=True, atoms=None):
+        """Moves the topology's atoms to their mean positions and returns it.
+        Use set_model to put it back on a real model afterwards."""
+
+        self.topology.set_coordinates(self.get_mean_coordinates(superpose, atoms))
+        return self.topology
+
+
+    def get_rmsf(self, superpose=True, atoms=None):
+        """Returns the root-mean-square fluctuation of every topology atom
+        about its mean position, in topology atom order."""
+
+        models = self.get_model_coordinates(superpose, atoms)
+        rmsf = []
+        for index, (mx, my, mz) in enumerate(get_mean_positions(models)):
+            total = 0
+            for model in models:
+                x, y, z = model[index]
+                total += ((x - mx) ** 2) + ((y - my) ** 2) + ((z - mz) ** 2)
+            rmsf.append(math.sqrt(total / len(models)))
+        return rmsf
@@ -1,4 +1,5 @@
 from .exceptions import *
+from . import profiling
 
 VALID_RECORDS = ("HEADER", "OBSLTE", "TITLE", "SPLT", "CAVEAT", "COMPND", "SOURCE", "KEYWDS",
  "EXPDTA", "NUMMDL", "MDLTYP", "AUTHOR", "REVDAT", "SPRSDE", "JRNL", "REMARK",
@@ -18,11 +19,14 @@ class PdbFile:
 
     def __init__(self, pdb_contents):
         self.pdb_contents = pdb_contents
-        lines = [line for line in pdb_contents.split("\n") if line.strip()]
-        self.records = [Record(index, line) for index, line in enumerate(lines, start=1)]
+        with profiling.span("file.records"):
+            lines = [line for line in pdb_contents.split("\n") if line.strip()]
+            self.records = [Record(index, line) for index, line in enumerate(lines, start=1)]
+        profiling.count("records", len(self.records))
 
 
     def get_records_by_name(self, name):
+        profiling.count("lookups.records")
         return [r for r in self.records if r.name.upper() == name.upper()]
 
 
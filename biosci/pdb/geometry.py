@@ -0,0 +1,212 @@
+import math
+from .exceptions import *
+from .assembly import transform_coordinates
+
+def get_rotation_matrix(axis, angle, degrees=True):
+    """Returns the 3x3 matrix for a rotation of angle about an axis, which can
+    be "x", "y", "z" or any (x, y, z) vector."""
+
+    if isinstance(axis, str):
+        if axis.lower() not in ("x", "y", "z"):
+            raise PdbStructureError("%s is not an axis" % axis)
+        axis = [1 if a == axis.lower() else 0 for a in "xyz"]
+    length = math.sqrt(sum([value ** 2 for value in axis]))
+    if not length:
+        raise PdbStructureError("Cannot rotate about a zero-length axis")
+    x, y, z = [value / length for value in axis]
+    angle = math.radians(angle) if degrees else angle
+    c, s = math.cos(angle), math.sin(angle)
+    t = 1 - c
+    return [
+     [(t * x * x) + c, (t * x * y) - (s * z), (t * x * z) + (s * y)],
+     [(t * x * y) + (s * z), (t * y * y) + c, (t * y * z) - (s * x)],
+     [(t * x * z) - (s * y), (t * y * z) + (s * x), (t * z * z) + c]
+    ]
+
+
+def apply_matrix(matrix, coordinates):
+    """Applies a 3x3 rotation or a 3x4 operator (rotation plus translation) to
+    a list of (x, y, z) coordinates."""
+
+    if len(matrix) != 3 or any(len(row) not in (3, 4) for row in matrix):
+        raise PdbStructureError("Transformations must be 3x3 or 3x4 matrices")
+    matrix = [list(row) + [0.0] if len(row) == 3 else list(row) for row in matrix]
+    return transform_coordinates([matrix], coordinates)[0]
+
+
+def get_centroid(coordinates):
+    count = len(coordinates)
+    return (
+     sum([c[0] for c in coordinates]) / count,
+     sum([c[1] for c in coordinates]) / count,
+     sum([c[2] for c in coordinates]) / count
+    )
+
+
+def get_rmsd(coordinates1, coordinates2):
+    """The root-mean-square deviation between two equally long lists of
+    coordinates, without any superposition."""
+
+    if len(coordinates1) != len(coordinates2) or not coordinates1:
+        raise PdbStructureError("RMSD needs two equal, non-empty sets of coordinates")
+    total = 0
+    for (x1, y1, z1), (x2, y2, z2) in zip(coordinates1, coordinates2):
+        total += ((x1 - x2) ** 2) + ((y1 - y2) ** 2) + ((z1 - z2) ** 2)
+    return math.sqrt(total / len(coordinates1))
+
+
+def get_symmetric_eigenvectors(matrix, sweeps=50):
+    """Diagonalises a small symmetric matrix by Jacobi rotations, returning
+    the eigenvalues and a matrix whose columns are the eigenvectors."""
+
+    a = [list(row) for row in matrix]
+    n = len(a)
+    v = [[1.0 if i == j else 0.0 for j in range(n)] for i in range(n)]
+    for _ in range(sweeps):
+        if sum([a[i][j] ** 2 for i in range(n) for j in range(i + 1, n)]) < 1e-22:
+            break
+        for p in range(n):
+            for q in range(p + 1, n):
+                if abs(a[p][q]) < 1e-30:
+                    continue
+                theta = (a[q][q] - a[p][p]) / (2 * a[p][q])
+                t = (1 if theta >= 0 else -1) / (abs(theta) + math.sqrt((theta ** 2) + 1))
+                c = 1 / math.sqrt((t ** 2) + 1)
+                s = t * c
+                for k in range(n):
+                    akp, akq = a[k][p], a[k][q]
+                    a[k][p], a[k][q] = (c * akp) - (s * akq), (s * akp) + (c * akq)
+                for k in range(n):
+                    apk, aqk = a[p][k], a[q][k]
+                    a[p][k], a[q][k] = (c * apk) - (s * aqk), (s * apk) + (c * aqk)
+                for k in range(n):
+                    vkp, vkq = v[k][p], v[k][q]
+                    v[k][p], v[k][q] = (c * vkp) - (s * vkq), (s * vkp) + (c * vkq)
+    return [a[i][i] for i in range(n)], v
+
+
+def centre_coordinates(coordinates):
+    """Returns the centroid of some coordinates, the coordinates moved so that
+    the centroid is at the origin, and their summed squared length."""
+
+    cx, cy, cz = get_centroid(coordinates)
+    centred = [(x - cx, y - cy, z - cz) for x, y, z in coordinates]
+    return (cx, cy, cz), centred, sum([(x * x) + (y * y) + (z * z) for x, y, z in centred])
+
+
+def superpose_centred(mobile, reference):
+    """Superposes two sets of already centred coordinates (as returned by
+    centre_coordinates) using Horn's quaternion method, and returns the 3x3
+    rotation that best maps mobile onto reference, and the RMSD after it is
+    applied."""
+
+    mobile, mobile_g = mobile[1:]
+    reference, reference_g = reference[1:]
+    if len(mobile) != len(reference) or not mobile:
+        raise PdbStructureError("Superposition needs two equal, non-empty sets of coordinates")
+    sxx = sxy = sxz = syx = syy = syz = szx = szy = szz = 0.0
+    for (px, py, pz), (qx, qy, qz) in zip(mobile, reference):
+        sxx += px * qx; sxy += px * qy; sxz += px * qz
+        syx += py * qx; syy += py * qy; syz += py * qz
+        szx += pz * qx; szy += pz * qy; szz += pz * qz
+    values, vectors = get_symmetric_eigenvectors([
+     [sxx + syy + szz, syz - szy, szx - sxz, sxy - syx],
+     [syz - szy, sxx - syy - szz, sxy + syx, szx + sxz],
+     [szx - sxz, sxy + syx, -sxx + syy - szz, syz + szy],
+     [sxy - syx, szx + sxz, syz + szy, -sxx - syy + szz]
+    ])
+    best = values.index(max(values))
+    q0, q1, q2, q3 = [vectors[row][best] for row in range(4)]
+    rotation = [
+     [(q0 * q0) + (q1 * q1) - (q2 * q2) - (q3 * q3), 2 * ((q1 * q2) - (q0 * q3)), 2 * ((q1 * q3) + (q0 * q2))],
+     [2 * ((q1 * q2) + (q0 * q3)), (q0 * q0) - (q1 * q1) + (q2 * q2) - (q3 * q3), 2 * ((q2 * q3) - (q0 * q1))],
+     [2 * ((q1 * q3) - (q0 * q2)), 2 * ((q2 * q3) + (q0 * q1)), (q0 * q0) - (q1 * q1) - (q2 * q2) + (q3 * q3)]
+    ]
+    rmsd = math.sqrt(max(0, (mobile_g + reference_g - (2 * values[best])) / len(mobile)))
+    return rotation, rmsd
+
+
+def superpose_coordinates(mobile, reference):
+    """Finds the rigid-body transformation that best maps one list of
+    coordinates onto another of the same length. Returns a 3x4 operator
+    (rotation plus translation) and the RMSD after it is applied."""
+
+    mobile, reference = centre_coordinates(mobile), centre_coordinates(reference)
+    rotation, rmsd = superpose_centred(mobile, reference)
+    return get_superposition_operator(rotation, mobile[0], reference[0]), rmsd
+
+
+def get_superposition_operator(rotation, mobile_centroid, reference_centroid):
+    """Combines a rotation about the mobile centroid and the move onto the
+    reference centroid into one 3x4 operator."""
+
+    rotated_centroid = apply_matrix(rotation, [mobile_centroid])[0]
+    return [rotation[row] + [reference_centroid[row] - rotated_centroid[row]]
+     for row in range(3)]
+
+
+def get_atom_key(atom):
+    """Identifies an atom by chain, residue number, insertion code and atom
+    name, so that the same atom can be found in two different structures."""
+
+    molecule = getattr(atom, "molecule", None)
+    chain = getattr(molecule, "chain", None)
+    chain_id = chain.name if chain is not None else getattr(molecule, "chain_id", None)
+    return (chain_id, getattr(molecule, "number", None), atom.insert_code, atom.name)
+
+
+def match_atoms(atoms1, atoms2):
+    """Pairs up the atoms of two structures by get_atom_key, returning two
+    lists of atoms in matching order. Atoms without a partner are left out."""
+
+    atoms2_by_key = {}
+    for atom in atoms2:
+        atoms2_by_key.setdefault(get_atom_key(atom), atom)
+    matched1, matched2 = [], []
+    for atom in atoms1:
+        partner = atoms2_by_key.get(get_atom_key(atom))
+        if partner is not None:
+            matched1.append(atom)
+            matched2.append(partner)
+    return matched1, matched2
+
+
+def superpose_many(reference, structures, match=True):
+    """Superposes each of many structures onto one reference, returning a
+    (3x4 operator, RMSD) tuple for each. The reference is keyed and centred
+    only once, and each structure only has its own coordinates centred, so
+    this is much quicker than calling superpose_onto repeatedly. If match is
+    False, atoms are paired by position rather than by name."""
+
+    reference_atoms = reference.atoms
+    reference_keys = [get_atom_key(atom) for atom in reference_atoms]
+    reference_index = {}
+    for index, key in enumerate(reference_keys):
+        reference_index.setdefault(key, index)
+    full_reference = centre_coordinates([(a.x, a.y, a.z) for a in reference_atoms])
+
+    results = []
+    for structure in structures:
+        if match:
+            indices, mobile = [], []
+            for atom in structure.atoms:
+                index = reference_index.get(get_atom_key(atom))
+                if index is not None:
+                    indices.append(index)
+                    mobile.append((atom.x, atom.y, atom.z))
+        else:
+            indices, mobile = None, [(a.x, a.y, a.z) for a in structure.atoms]
+        if not mobile:
+            raise PdbStructureError("%s has no atoms matching the reference" % structure)
+        if indices is None or indices == list(range(len(reference_atoms))):
+            reference_centred = full_reference
+        else:
+            reference_centred = centre_coordinates(
+             [(reference_atoms[i].x, reference_atoms[i].y, reference_atoms[i].z) for i in indices]
+            )
+        mobile_centred = centre_coordinates(mobile)
+        rotation, rmsd = superpose_centred(mobile_centred, reference_centred)
+        results.append((get_superposition_operator(
+         rotation, mobile_centred[0], reference_centred[0]
+        ), rmsd))
+    return results
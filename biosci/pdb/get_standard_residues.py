@@ -1,38 +1,44 @@
+"""Regenerates residues.py, the built-in bond templates for the 20 standard
+amino acids, from the wwPDB FTP server. Run it as a script - importing it
+does nothing. For templates covering every component, compile a local copy
+of the chemical component dictionary with components.compile_components
+instead."""
+
 from ftplib import FTP
 from pprint import pformat
 
-#Log in
-ftp = FTP("ftp.wwpdb.org")
-ftp.login()
-ftp.cwd("pub/pdb/data/monomers")
-
-
 #Residues required
-residues = ["PHE", "TRP", "MET", "ILE", "ASN",
+RESIDUES = ["PHE", "TRP", "MET", "ILE", "ASN",
             "THR", "HIS", "GLN", "GLU", "ASP",
             "TYR", "CYS", "ARG", "PRO", "LEU",
             "GLY", "ALA", "VAL", "SER", "LYS"]
-residues = {r: {} for r in residues}
-
-
-#Define line processing function
-def process_conect(line):
-    chunks = line.split()
-    if chunks[0] == "RESIDUE":
-        global current_residue
-        current_residue = chunks[1]
-    elif chunks[0] == "CONECT":
-        residues[current_residue][chunks[1]] = chunks[3:]
-
-
-#Get files
-for residue in residues:
-    ftp.retrlines("RETR %s" % residue, callback=process_conect)
-
 
-#Save
-residues = pformat(residues)
-residues = "residues = " + residues
-f = open("residues.py", "w")
-f.write(residues)
-f.close()
+def get_standard_residues():
+    #Log in
+    ftp = FTP("ftp.wwpdb.org")
+    ftp.login()
+    ftp.cwd("pub/pdb/data/monomers")
+    residues = {r: {} for r in RESIDUES}
+    current_residue = None
+
+    #Define line processing function
+    def process_conect(line):
+        nonlocal current_residue
+        chunks = line.split()
+        if chunks[0] == "RESIDUE":
+            current_residue = chunks[1]
+        elif chunks[0] == "CONECT":
+            residues[current_residue][chunks[1]] = chunks[3:]
+
+    #Get files
+    for residue in residues:
+        ftp.retrlines("RETR %s" % residue, callback=process_conect)
+    return residues
+
+
+if __name__ == "__main__":
+    #Save
+    residues = "residues = " + pformat(get_standard_residues())
+    f = open("residues.py", "w")
+    f.write(residues)
+    f.close()
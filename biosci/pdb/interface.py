@@ -0,0 +1,128 @@
+from .spatial import AtomGrid
+
+def get_covalent_shell(atom, covalent_count):
+    """Returns the set of atoms no more than covalent_count bonds away from
+    an atom (including the atom itself)."""
+
+    shell, edge = {atom}, [atom]
+    for _ in range(covalent_count):
+        next_edge = []
+        for edge_atom in edge:
+            for bond in edge_atom.bonds:
+                for bonded_atom in bond.atoms:
+                    if bonded_atom is not None and bonded_atom not in shell:
+                        shell.add(bonded_atom)
+                        next_edge.append(bonded_atom)
+        edge = next_edge
+    return shell
+
+
+def find_atomic_contacts(atoms, other_atoms, cutoff, covalent_count=3, grid=None):
+    """Returns (atom, other atom, distance) for every atom in one collection
+    that is within cutoff of an atom in another, ignoring atoms that are in
+    both and pairs that are within covalent_count bonds of each other. A
+    spatial grid of the other atoms can be passed in if one already exists."""
+
+    grid = grid or AtomGrid(other_atoms, cell_size=max(cutoff, 1))
+    atom_set = set(atoms)
+    contacts = []
+    for atom in atoms:
+        if atom.x is None:
+            continue
+        nearby = [a for a in grid.atoms_near(atom.x, atom.y, atom.z, cutoff)
+         if a not in atom_set]
+        if nearby:
+            excluded = get_covalent_shell(atom, covalent_count) if covalent_count else ()
+            for other_atom in nearby:
+                if other_atom not in excluded:
+                    contacts.append((atom, other_atom, atom.distance_to(other_atom)))
+    return contacts
+
+
+def find_internal_contacts(atoms, cutoff, covalent_count=3, grid=None):
+    """Returns (atom, atom, distance) for every pair of atoms in a collection
+    within cutoff of each other but more than covalent_count bonds apart.
+    Each pair is returned once."""
+
+    grid = grid or AtomGrid(atoms, cell_size=max(cutoff, 1))
+    shells = {}
+    contacts = []
+    for atom, other_atom, distance in grid.pairs_within(cutoff):
+        if covalent_count:
+            if atom not in shells:
+                shells[atom] = get_covalent_shell(atom, covalent_count)
+            if other_atom in shells[atom]:
+                continue
+        contacts.append((atom, other_atom, distance))
+    return contacts
+
+
+
+class Interface:
+    """The contacts between two atomic structures, at both the atom and the
+    residue level."""
+
+    def __init__(self, structure1, structure2, atom_contacts):
+        self.structure1 = structure1
+        self.structure2 = structure2
+        self.atom_contacts = atom_contacts
+
+
+    def __repr__(self):
+        return "<Interface %s / %s (%i atomic contacts)>" % (
+         getattr(self.structure1, "name", "?"), getattr(self.structure2, "name", "?"),
+         len(self.atom_contacts)
+        )
+
+
+    def __len__(self):
+        return len(self.atom_contacts)
+
+
+    def get_residue_contacts(self):
+        """Groups the atomic contacts by the residues (or hets) the two atoms
+        belong to, returning a dictionary of (residue, residue) to the list of
+        atomic contacts between them."""
+
+        residue_contacts = {}
+        for contact in self.atom_contacts:
+            key = (getattr(contact[0], "molecule", None), getattr(contact[1], "molecule", None))
+            residue_contacts.setdefault(key, []).append(contact)
+        return residue_contacts
+
+
+    def get_residues(self):
+        """Returns the residues (or hets) on each side of the interface."""
+
+        residues1, residues2 = [], []
+        for residue1, residue2 in self.get_residue_contacts():
+            if residue1 not in residues1:
+                residues1.append(residue1)
+            if residue2 not in residues2:
+                residues2.append(residue2)
+        return residues1, residues2
+
+
+
+def find_interfaces(structures, cutoff, covalent_count=3):
+    """Finds the interfaces between every pair of a list of atomic structures
+    (such as all the chains and hets of a model) in one sweep over a single
+    spatial grid of all their atoms. Returns an Interface for each pair of
+    structures that are in contact."""
+
+    owners, atoms = {}, []
+    for index, structure in enumerate(structures):
+        for atom in structure.atoms:
+            if atom not in owners:
+                owners[atom] = index
+                atoms.append(atom)
+    contacts = {}
+    for atom, other_atom, distance in find_internal_contacts(atoms, cutoff, covalent_count):
+        index, other_index = owners[atom], owners[other_atom]
+        if index == other_index:
+            continue
+        if index > other_index:
+            atom, other_atom, index, other_index = other_atom, atom, other_index, index
+        contacts.setdefault((index, other_index), []).append((atom, other_atom, distance))
+    return [Interface(structures[index], structures[other_index], contacts[(index, other_index)])
+     for index, other_index in sorted(contacts)]
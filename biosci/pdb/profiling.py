@@ -0,0 +1,179 @@
+"""Optional instrumentation of the parse/build pipeline. While profiling is
+off (the default) each span and counter costs a single check, so it can be
+left in place everywhere. Turn it on around a load to find out where the
+time goes:
+
+    with profiling.profile() as profile:
+        structure = get_from_file("1abc.pdb")
+    print(structure.profile.summary())"""
+
+import time
+from contextlib import contextmanager
+
+#The Profile currently collecting, if profiling is on
+current_profile = None
+
+#Functions called with (event, name, value) as spans end and counters change
+hooks = []
+
+class Profile:
+    """The timings and counts collected while profiling was on. Spans are
+    kept as total seconds and number of calls per name."""
+
+    def __init__(self):
+        self.spans = {}
+        self.counters = {}
+        self.span_order = []
+
+
+    def __repr__(self):
+        return "<Profile (%i spans, %i counters)>" % (len(self.spans), len(self.counters))
+
+
+    def add_span(self, name, seconds):
+        if name not in self.spans:
+            self.spans[name] = [0.0, 0]
+            self.span_order.append(name)
+        self.spans[name][0] += seconds
+        self.spans[name][1] += 1
+
+
+    def add_count(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+
+    def get_seconds(self, name):
+        return self.spans[name][0] if name in self.spans else 0.0
+
+
+    def to_dict(self):
+        return {
+         "spans": {name: {"seconds": self.spans[name][0], "calls": self.spans[name][1]}
+          for name in self.span_order},
+         "counters": dict(self.counters)
+        }
+
+
+    def summary(self):
+        """Returns a printable table of the spans, in the order they first
+        ran, followed by the counters."""
+
+        lines = ["%-32s %10s %8s" % ("span", "seconds", "calls")]
+        for name in self.span_order:
+            lines.append("%-32s %10.4f %8i" % (name, self.spans[name][0], self.spans[name][1]))
+        if self.counters:
+            lines.append("")
+            lines.append("%-32s %10s" % ("counter", "value"))
+            for name in sorted(self.counters):
+                lines.append("%-32s %10i" % (name, self.counters[name]))
+        return "\n".join(lines)
+
+
+
+class Span:
+    """Times the code in a with block and records it in the current
+    profile."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *args):
+        seconds = time.perf_counter() - self.start
+        if current_profile is not None:
+            current_profile.add_span(self.name, seconds)
+        for hook in hooks:
+            hook("span", self.name, seconds)
+
+
+
+class NullSpan:
+    """What span returns when profiling is off - it does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        pass
+
+
+
+NULL_SPAN = NullSpan()
+
+def span(name):
+    """Use as with span("stage"): to time a stage of the pipeline."""
+
+    if current_profile is None and not hooks:
+        return NULL_SPAN
+    return Span(name)
+
+
+def count(name, value=1):
+    """Adds to a named counter."""
+
+    if current_profile is None and not hooks:
+        return
+    if current_profile is not None:
+        current_profile.add_count(name, value)
+    for hook in hooks:
+        hook("count", name, value)
+
+
+def is_enabled():
+    return current_profile is not None or bool(hooks)
+
+
+def get_profile():
+    return current_profile
+
+
+def enable():
+    """Starts collecting into a new Profile, and returns it."""
+
+    global current_profile
+    current_profile = Profile()
+    return current_profile
+
+
+def disable():
+    """Stops collecting, and returns the Profile that was collected."""
+
+    global current_profile
+    profile, current_profile = current_profile, None
+    return profile
+
+
+@contextmanager
+def profile():
+    """Collects a Profile for the code in a with block."""
+
+    global current_profile
+    previous = current_profile
+    current_profile = Profile()
+    try:
+        yield current_profile
+    finally:
+        current_profile = previous
+
+
+def add_hook(function):
+    """Registers a function to be called with (event, name, value) every time
+    a span ends ("span", name, seconds) or a counter is added to ("count",
+    name, amount). Hooks are called even if no Profile is collecting."""
+
+    hooks.append(function)
+
+
+def remove_hook(function):
+    if function in hooks:
+        hooks.remove(function)
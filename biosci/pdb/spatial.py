@@ -0,0 +1,80 @@
+import math
+
+class AtomGrid:
+    """A spatial index of atoms. Space is divided into cubic cells and each
+    atom is filed under the cell it sits in, so that only the neighbouring
+    cells need to be searched to find the atoms near a point."""
+
+    def __init__(self, atoms, cell_size=5.0):
+        self.cell_size = cell_size
+        self.cells = {}
+        for atom in atoms:
+            if atom.x is not None and atom.y is not None and atom.z is not None:
+                self.cells.setdefault(
+                 self.get_cell(atom.x, atom.y, atom.z), []
+                ).append(atom)
+
+
+    def __repr__(self):
+        return "<AtomGrid (%i cells)>" % len(self.cells)
+
+
+    def get_cell(self, x, y, z):
+        """Which cell does this point fall in?"""
+
+        return (
+         math.floor(x / self.cell_size),
+         math.floor(y / self.cell_size),
+         math.floor(z / self.cell_size)
+        )
+
+
+    def get_neighbouring_cells(self, cell, cutoff):
+        """Returns the cells (that have atoms in them) which could contain
+        atoms within cutoff of anything in the given cell."""
+
+        span = int(math.ceil(cutoff / self.cell_size))
+        cells = []
+        for i in range(cell[0] - span, cell[0] + span + 1):
+            for j in range(cell[1] - span, cell[1] + span + 1):
+                for k in range(cell[2] - span, cell[2] + span + 1):
+                    if (i, j, k) in self.cells:
+                        cells.append((i, j, k))
+        return cells
+
+
+    def atoms_near(self, x, y, z, cutoff):
+        """Returns all atoms within cutoff of the point given."""
+
+        cutoff_squared = cutoff * cutoff
+        atoms = []
+        for cell in self.get_neighbouring_cells(self.get_cell(x, y, z), cutoff):
+            for atom in self.cells[cell]:
+                dx, dy, dz = atom.x - x, atom.y - y, atom.z - z
+                if (dx * dx) + (dy * dy) + (dz * dz) <= cutoff_squared:
+                    atoms.append(atom)
+        return atoms
+
+
+    def pairs_within(self, cutoff):
+        """Yields every pair of atoms within cutoff of each other, along with
+        the distance between them. Each pair is yielded once."""
+
+        cutoff_squared = cutoff * cutoff
+        for cell, atoms in self.cells.items():
+            for other_cell in self.get_neighbouring_cells(cell, cutoff):
+                if other_cell < cell:
+                    continue
+                other_atoms = self.cells[other_cell]
+                for index, atom in enumerate(atoms):
+                    if other_cell == cell:
+                        candidates = other_atoms[index + 1:]
+                    else:
+                        candidates = other_atoms
+                    for other_atom in candidates:
+                        dx = atom.x - other_atom.x
+                        dy = atom.y - other_atom.y
+                        dz = atom.z - other_atom.z
+                        distance_squared = (dx * dx) + (dy * dy) + (dz * dz)
+                        if distance_squared <= cutoff_squared:
+                            yield atom, other_atom, math.sqrt(distance_squared)
@@ -1,7 +1,9 @@
 from collections import Counter
-from .crystal import *
+import weakref
 import math
 from .exceptions import *
+from .spatial import AtomGrid
+from . import profiling
 
 PERIODIC_TABLE = {
  "H": 1.0079, "HE": 4.0026, "LI": 6.941, "BE": 9.0122, "B": 10.811, "C": 12.0107,
@@ -25,30 +27,159 @@ PERIODIC_TABLE = {
                    "MD": 258, "NO": 259, "RF": 261, "LR": 262, "DB": 262, "BH": 264,
                     "SG": 266, "MT": 268, "RG": 272, "HS": 277, "X": 0, "D": 0}
 
+class WeakAttribute:
+    """An attribute that only holds a weak reference to its value. Used for
+    the references from objects back to the objects that contain them (an
+    atom's model, a residue's chain and so on) so that structures have no
+    reference cycles and are freed as soon as they are no longer used, rather
+    than waiting for the garbage collector. Once the container has gone, the
+    attribute is None."""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+
+    def __get__(self, obj, owner):
+        if obj is None:
+            return self
+        try:
+            reference = obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(
+             "%s object has no attribute %s" % (type(obj).__name__, self.name)
+            )
+        return None if reference is None else reference()
+
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = None if value is None else weakref.ref(value)
+
+
+
+def get_container(obj, attribute):
+    """Returns the object that a WeakAttribute points to, raising a
+    PdbStructureError if it has been freed because nothing else refers to
+    it any more."""
+
+    container = getattr(obj, attribute)
+    if container is None:
+        raise PdbStructureError(
+         "The %s of this %s no longer exists - keep a reference to the structure"
+         " (or model) for as long as its parts are being used" % (attribute, type(obj).__name__)
+        )
+    return container
+
+
+
 class PdbStructure:
-    """A representation of the contents of a PDB file."""
+    """A representation of the contents of a PDB file.
+
+    Objects only hold weak references to the objects that contain them (an
+    atom to its model and molecule, a residue to its chain and so on), so a
+    structure is freed as soon as nothing refers to it. Keep a reference to
+    the structure, or to the model, while using its chains, residues and
+    atoms - otherwise those back-references become None, and methods that
+    need them raise PdbStructureError."""
 
     def __init__(self, pdb_data):
         self.data = pdb_data
 
-        self.models = [Model(d, self.data.miscellaneous.sites,
-         self.data.secondary_structure, self.data.connectivity,
-          self.data.connectivity_annotation, self.data.heterogen, self.data.title) for d in self.data.coordinates.models]
-        self.model = self.models[0]
+        with profiling.span("structure.models"):
+            self.models = [Model(d, self.data.miscellaneous.sites,
+             self.data.secondary_structure, self.data.connectivity,
+              self.data.connectivity_annotation, self.data.heterogen, self.data.title) for d in self.data.coordinates.models]
+            self.model = self.models[0]
+        profiling.count("models", len(self.models))
+
+        with profiling.span("structure.crystal"):
+            from .crystal import (UnitCell, SubmittedCoordinatesTransformation,
+             CrystallographicCoordinatesTransformation, MatrixTransformation)
+            self.unit_cell = UnitCell(self.data.crystal)
+            self.submission_transformation = SubmittedCoordinatesTransformation(self.data.crystal)
+            self.crystal_transformation = CrystallographicCoordinatesTransformation(self.data.crystal)
+            self.matrix_transformation = MatrixTransformation(self.data.crystal)
+
+        #The Profile being collected when this structure was made, if any
+        self.profile = profiling.get_profile()
+
+
+    def get_assemblies(self, model=None):
+        """Returns the biological assemblies described by REMARK 350, built
+        from the first model unless another is given."""
+
+        from .assembly import Assembly, parse_assemblies
+        model = model or self.model
+        remarks = [r for r in self.data.title.remarks if r["num"] == 350]
+        if not remarks:
+            return []
+        return [Assembly(a["number"], model, a["groups"]) for a in parse_assemblies(remarks[0]["content"])]
+
+
+    def get_assembly(self, number=1, model=None):
+        for assembly in self.get_assemblies(model=model):
+            if assembly.number == number:
+                return assembly
+
+
+    def get_ncs_assembly(self, model=None):
+        """Returns the model together with the copy generated by its MTRIX
+        operator (if there is one and it hasn't already been applied)."""
+
+        from .assembly import Assembly, IDENTITY_OPERATOR
+        model = model or self.model
+        matrix = self.matrix_transformation.get_matrix()
+        operators = [IDENTITY_OPERATOR]
+        if matrix and self.matrix_transformation.i_given != 1:
+            operators.append(matrix)
+        chains = sorted(set([c.name for c in model.chains] + [h.chain_id for h in model.hets]),
+         key=lambda c: (c is None, c))
+        return Assembly(None, model, [{"chains": chains, "operators": operators}])
+
+
+    def get_crystal_contacts(self, cutoff=4, model=None):
+        """Returns the atoms of a model that are within cutoff of a symmetry
+        mate in the crystal, as found by UnitCell.find_contacts."""
+
+        model = model or self.model
+        return self.unit_cell.find_contacts(model.atoms, cutoff=cutoff)
+
 
-        self.unit_cell = UnitCell(self.data.crystal)
-        self.submission_transformation = SubmittedCoordinatesTransformation(self.data.crystal)
-        self.crystal_transformation = CrystallographicCoordinatesTransformation(self.data.crystal)
-        self.matrix_transformation = MatrixTransformation(self.data.crystal)
+    def get_ensemble(self):
+        """Returns the models as an Ensemble sharing the first model's
+        topology."""
+
+        from .ensemble import Ensemble
+        return Ensemble(self.data, topology=self.model)
+
+
+
+def get_pymol_ranges(numbers):
+    """Turns a list of integers into PyMOL range syntax, such as 1-5+8+10-12.
+    Negative numbers are escaped as PyMOL requires."""
+
+    def format_number(number):
+        return "\\%i" % number if number < 0 else "%i" % number
+
+    numbers = sorted(set(numbers))
+    ranges = []
+    for number in numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return "+".join([format_number(start) if start == end else
+     "%s-%s" % (format_number(start), format_number(end)) for start, end in ranges])
 
 
 
 class ChemicalBond:
     """A covalent bond, or similarly strong bond"""
 
-    def __init__(self, *atoms, peptide=False, cis=False, disulphide=False, specified_distance=None):
+    def __init__(self, *atoms, peptide=False, cis=False, disulphide=False, specified_distance=None, bond_type=None, perceived=False):
         assert len(atoms) == 2
-        self.atoms = atoms
+        self.atom_references = (weakref.ref(atoms[0]), weakref.ref(atoms[1]))
+        self.bond_type = bond_type
+        self.perceived = perceived
         self.peptide = peptide
         self.cis = cis
         self.disulphide = disulphide
@@ -56,10 +187,19 @@ class ChemicalBond:
 
         atoms[0].bonds.append(self)
         atoms[1].bonds.append(self)
+        profiling.count("bonds")
 
 
     def __repr__(self):
-        return "%s—%s" % (self.atoms[0].element, self.atoms[1].element)
+        return "%s—%s" % tuple([atom.element if atom else "?" for atom in self.atoms])
+
+
+    @property
+    def atoms(self):
+        """The two atoms - which own their bonds, so that the bond doesn't
+        keep them alive."""
+
+        return (self.atom_references[0](), self.atom_references[1]())
 
 
 
@@ -71,6 +211,9 @@ class AtomicStructure:
         #if not self.atoms:
         #    raise PdbStructureError("Structure has no atoms")
         self.mass = sum([a.mass for a in self.atoms])
+        self.atom_grid = None
+        self.atom_grid_version = None
+        self.coordinate_version = 0
 
 
     def __repr__(self):
@@ -87,6 +230,7 @@ class AtomicStructure:
 
 
     def get_atom_by_number(self, number):
+        profiling.count("lookups.atom_by_number")
         for atom in self.atoms:
             if atom.number == number:
                 return atom
@@ -109,21 +253,41 @@ class AtomicStructure:
         """How many atomic interactions are there between this object and
         another atomic structure?"""
 
-        contacts = 0
-        for atom in self.atoms:
-            nearby = atom.nearby_atoms(cutoff=cutoff, covalent_count=3)
-            contacts += len([a for a in nearby if a in other_atomic_structure.atoms and a not in self.atoms])
-        return contacts
+        return len(self.get_interface_with(other_atomic_structure, cutoff).atom_contacts)
 
 
     def count_internal_atomic_contacts(self, cutoff):
-        """How many internal atomic interactions are there in this object?"""
+        """How many internal atomic interactions are there in this object?
+        (Each interaction is counted from both ends.)"""
 
-        contacts = 0
-        for atom in self.atoms:
-            nearby = atom.nearby_atoms(cutoff=cutoff, covalent_count=3)
-            contacts += len([a for a in nearby if a in self.atoms])
-        return contacts
+        from .interface import find_internal_contacts
+        return len(find_internal_contacts(
+         self.atoms, cutoff, covalent_count=3, grid=self.get_atom_grid()
+        )) * 2
+
+
+    def perceive_bonds(self, tolerance=None):
+        """Adds bonds between any of this structure's atoms that are close
+        enough together to be covalently bonded, for structures (such as
+        ligands without CONECT records) whose bonds weren't given. Returns the
+        new bonds. The tolerance defaults to bonding.BOND_TOLERANCE."""
+
+        from .bonding import BOND_TOLERANCE, perceive_bonds
+        return perceive_bonds(
+         self.atoms, tolerance=BOND_TOLERANCE if tolerance is None else tolerance
+        )
+
+
+    def get_interface_with(self, other_atomic_structure, cutoff, covalent_count=3):
+        """Returns the Interface between this structure and another - every
+        pair of atoms within cutoff of each other, other than pairs within
+        covalent_count bonds of each other."""
+
+        from .interface import Interface, find_atomic_contacts
+        return Interface(self, other_atomic_structure, find_atomic_contacts(
+         self.atoms, other_atomic_structure.atoms, cutoff,
+         covalent_count=covalent_count, grid=other_atomic_structure.get_atom_grid()
+        ))
 
 
     def average_x(self):
@@ -155,7 +319,149 @@ class AtomicStructure:
         return distance
 
 
-    def get_pymol_selector_string(self):
+    def get_coordinates(self):
+        """Returns the coordinates of the atoms as a list of (x, y, z) tuples."""
+
+        return [(atom.x, atom.y, atom.z) for atom in self.atoms]
+
+
+    def set_coordinates(self, coordinates):
+        """Moves every atom to the matching (x, y, z) in a list of
+        coordinates."""
+
+        if len(coordinates) != len(self.atoms):
+            raise PdbStructureError("%i coordinates given for %i atoms" % (
+             len(coordinates), len(self.atoms)
+            ))
+        for atom, (x, y, z) in zip(self.atoms, coordinates):
+            atom.x, atom.y, atom.z = x, y, z
+        self.clear_atom_grid()
+
+
+    def translate(self, dx, dy, dz):
+        """Moves every atom by the same vector."""
+
+        self.set_coordinates([(x + dx, y + dy, z + dz) for x, y, z in self.get_coordinates()])
+
+
+    def rotate(self, axis, angle, degrees=True, centre=None):
+        """Rotates every atom by angle about an axis ("x", "y", "z" or a
+        vector) passing through centre - the origin by default."""
+
+        from .geometry import get_rotation_matrix
+        rotation = get_rotation_matrix(axis, angle, degrees=degrees)
+        if centre is None:
+            self.transform(rotation)
+        else:
+            self.translate(-centre[0], -centre[1], -centre[2])
+            self.transform(rotation)
+            self.translate(*centre)
+
+
+    def transform(self, matrix):
+        """Applies a 3x3 rotation or a 3x4 operator (rotation plus
+        translation) to every atom."""
+
+        from .geometry import apply_matrix
+        self.set_coordinates(apply_matrix(matrix, self.get_coordinates()))
+
+
+    def rmsd_to(self, other_atomic_structure, match=True):
+        """The RMSD between this structure and another, as they are (without
+        superposing them). Atoms are paired by chain, residue and atom name,
+        or by position if match is False."""
+
+        from .geometry import match_atoms, get_rmsd
+        atoms1, atoms2 = self.atoms, other_atomic_structure.atoms
+        if match:
+            atoms1, atoms2 = match_atoms(atoms1, atoms2)
+        return get_rmsd(
+         [(a.x, a.y, a.z) for a in atoms1], [(a.x, a.y, a.z) for a in atoms2]
+        )
+
+
+    def superpose_onto(self, other_atomic_structure, match=True, move=True):
+        """Finds the rigid-body transformation that best fits this structure
+        onto another (using only the atoms they have in common, unless match
+        is False) and applies it to every atom in this structure. Returns the
+        3x4 operator and the RMSD of the fitted atoms."""
+
+        from .geometry import match_atoms, superpose_coordinates
+        atoms1, atoms2 = self.atoms, other_atomic_structure.atoms
+        if match:
+            atoms1, atoms2 = match_atoms(atoms1, atoms2)
+        operator, rmsd = superpose_coordinates(
+         [(a.x, a.y, a.z) for a in atoms1], [(a.x, a.y, a.z) for a in atoms2]
+        )
+        if move:
+            self.transform(operator)
+        return operator, rmsd
+
+
+    def get_coordinate_owner(self):
+        """Returns the structure whose coordinate_version tracks this
+        structure's atoms - the model of its first atom, or itself if its
+        atoms have no model."""
+
+        model = getattr(self.atoms[0], "model", None) if self.atoms else None
+        return self if model is None else model
+
+
+    def get_atom_grid(self):
+        """Returns a spatial index of this structure's atoms. It is built the
+        first time it is asked for, and rebuilt if the atoms' model has
+        been moved since (by set_coordinates, translate, rotate and so on) -
+        if atoms are moved by hand instead, call clear_atom_grid."""
+
+        version = self.get_coordinate_owner().coordinate_version
+        if self.atom_grid is None or self.atom_grid_version != version:
+            self.atom_grid = AtomGrid(self.atoms)
+            self.atom_grid_version = version
+        return self.atom_grid
+
+
+    def clear_atom_grid(self):
+        """Marks the coordinates of this structure's atoms as changed, so that
+        the spatial index of this structure - and of every other structure
+        sharing its atoms' models - is rebuilt when next needed."""
+
+        self.atom_grid = None
+        self.coordinate_version += 1
+        models = set()
+        for atom in self.atoms:
+            model = getattr(atom, "model", None)
+            if model is not None and model is not self and model not in models:
+                models.add(model)
+                model.coordinate_version += 1
+
+
+    def atoms_near_point(self, x, y, z, cutoff):
+        """Returns the atoms in this structure within cutoff of a point."""
+
+        return self.get_atom_grid().atoms_near(x, y, z, cutoff)
+
+
+    def atoms_near_structure(self, other_atomic_structure, cutoff):
+        """Returns the atoms in this structure within cutoff of any atom in
+        another atomic structure (which can come from a different file)."""
+
+        grid = self.get_atom_grid()
+        other_atoms = set(other_atomic_structure.atoms)
+        atoms, found = [], set()
+        for other_atom in other_atomic_structure.atoms:
+            for atom in grid.atoms_near(other_atom.x, other_atom.y, other_atom.z, cutoff):
+                if atom not in found and atom not in other_atoms:
+                    found.add(atom)
+                    atoms.append(atom)
+        return atoms
+
+
+    def get_pymol_selector_string(self, compress=True):
+        """Returns a PyMOL selection of this structure's atoms. By default
+        consecutive atom IDs are written as ranges (id 1-250+260)."""
+
+        if compress:
+            return "id %s" % get_pymol_ranges([a.number for a in self.atoms]) if self.atoms else ""
         s = ["id %i" % a.number for a in self.atoms]
         return " | ".join(s)
 
@@ -183,7 +489,7 @@ class ResiduicStructure(AtomicStructure):
 
 
     def get_residues_by_chain(self, chain_id):
-        return [r for r in self.residues if r.chain.name == chain_id]
+        return [r for r in self.residues if get_container(r, "chain").name == chain_id]
 
 
     def get_residues_by_name(self, name):
@@ -207,10 +513,11 @@ class ResiduicStructure(AtomicStructure):
         string of residues that contains all residues in this orginal structure."""
 
         if len(self.residues) > 1:
-            if all([r.chain is self.residues[0].chain for r in self.residues[1:]]):
+            chain = get_container(self.residues[0], "chain")
+            if all([r.chain is chain for r in self.residues[1:]]):
                 #All residues are on the same chain
                 return ResiduicStructure(
-                 [r for r in self.residues[0].chain.residues if
+                 [r for r in chain.residues if
                   r.number >= min([res.number for res in self.residues]) and
                    r.number <= max([res.number for res in self.residues])]
                 )
@@ -218,11 +525,21 @@ class ResiduicStructure(AtomicStructure):
             return self
 
 
-    def get_pymol_selector_string(self):
+    def get_pymol_selector_string(self, compress=True):
+        """Returns a PyMOL selection of this structure's residues. By default
+        each chain's consecutive residue numbers are written as ranges
+        ((resi 10-40+45 & chain A))."""
+
+        if compress:
+            chains = {}
+            for residue in self.residues:
+                chains.setdefault(get_container(residue, "chain").name, []).append(residue.number)
+            return " | ".join(["(resi %s & chain %s)" % (get_pymol_ranges(numbers), chain)
+             for chain, numbers in chains.items()])
         s = []
         for residue in self.residues:
             s.append(
-             "(resi %i & chain %s)" % (residue.number, residue.chain.name)
+             "(resi %i & chain %s)" % (residue.number, get_container(residue, "chain").name)
             )
 
         return " | ".join(s)
@@ -234,132 +551,140 @@ class Model(AtomicStructure):
 
     def __init__(self, model_dict, site_dicts, secondary_section, connect_section, connect_annotation_section, heterogen_section, title_section):
         #Get chains
-        chain_ids = sorted(list(set([a["chain_id"] for a in model_dict["atoms"] if not a["het"]])))
-        self.chains = [Chain(
-         [a for a in model_dict["atoms"] if a["chain_id"] == chain_id and not a["het"]],
-         [t for t in model_dict["ters"] if t["chain_id"] == chain_id],
-         [h for h in secondary_section.helices if h["start_residue_chain"] == chain_id]
-        ) for chain_id in chain_ids]
-        atoms = []
-        for chain in self.chains:
-            atoms += chain.atoms
+        with profiling.span("model.chains"):
+            chain_ids = sorted(list(set([a["chain_id"] for a in model_dict["atoms"] if not a["het"]])))
+            self.chains = [Chain(
+             [a for a in model_dict["atoms"] if a["chain_id"] == chain_id and not a["het"]],
+             [t for t in model_dict["ters"] if t["chain_id"] == chain_id],
+             [h for h in secondary_section.helices if h["start_residue_chain"] == chain_id]
+            ) for chain_id in chain_ids]
+            atoms = []
+            for chain in self.chains:
+                atoms += chain.atoms
 
         #Get hets
-        het_ids = sorted(list(set([(a["chain_id"], a["res_seq"]) for a in model_dict["atoms"] if a["het"]])))
-        self.hets = [Het(
-         [a for a in model_dict["atoms"] if (a["chain_id"], a["res_seq"]) == het_id]
-        ) for het_id in het_ids]
-        for het in self.hets:
-            atoms += het.atoms
-            het_dict_matches = [h for h in heterogen_section.hetnams if h["code"] == het.name]
-            if het_dict_matches:
-                het.full_name = het_dict_matches[0]["fullname"]
-            else:
-                het.full_name = None
-            het.chain = self.get_chain_by_name(het.chain_id)
+        with profiling.span("model.hets"):
+            het_ids = sorted(list(set([(a["chain_id"], a["res_seq"]) for a in model_dict["atoms"] if a["het"]])))
+            self.hets = [Het(
+             [a for a in model_dict["atoms"] if (a["chain_id"], a["res_seq"]) == het_id]
+            ) for het_id in het_ids]
+            for het in self.hets:
+                atoms += het.atoms
+                het_dict_matches = [h for h in heterogen_section.hetnams if h["code"] == het.name]
+                if het_dict_matches:
+                    het.full_name = het_dict_matches[0]["fullname"]
+                else:
+                    het.full_name = None
+                het.chain = self.get_chain_by_name(het.chain_id)
         AtomicStructure.__init__(self, atoms)
         for atom in self.atoms:
             atom.model = self
+        profiling.count("atoms", len(self.atoms))
 
         #Get sites
-        self.pdb_sites = [PdbSite(s, self) for s in site_dicts]
-        self.pdb_sites = [site for site in self.pdb_sites if len(site.residues)]
-
-        #Try to match sites and ligands
-        remark800s = [r for r in title_section.remarks if r["num"] == 800]
-        site_ids, het_ids = [], []
-        if remark800s:
-            remark = remark800s[0]["content"]
-            if len(remark.split("\n")) > 3:
-                site_ids = [i.split(":")[1].strip() if ":" in i else i for i in remark.split("\n")[1::3]]
-                het_ids = [i.split(":")[1].strip() if ":" in i else i for i in remark.split("\n")[3::3]]
-        for het in self.hets:
-            found = False
-            for index, het_id in enumerate(het_ids):
-                if ("%s %s %i" % (het.name, het.chain.name, het.number)).lower() in het_id.lower():
-                    site_id = site_ids[index]
-                    for site in self.pdb_sites:
-                        if site.name == site_id:
-                            het.annotated_binding_site = site
-                            found = True
-            if not found:
-                het.annotated_binding_site = None
+        with profiling.span("model.sites"):
+            self.pdb_sites = [PdbSite(s, self) for s in site_dicts]
+            self.pdb_sites = [site for site in self.pdb_sites if len(site.residues)]
+
+            #Try to match sites and ligands
+            remark800s = [r for r in title_section.remarks if r["num"] == 800]
+            site_ids, het_ids = [], []
+            if remark800s:
+                remark = remark800s[0]["content"]
+                if len(remark.split("\n")) > 3:
+                    site_ids = [i.split(":")[1].strip() if ":" in i else i for i in remark.split("\n")[1::3]]
+                    het_ids = [i.split(":")[1].strip() if ":" in i else i for i in remark.split("\n")[3::3]]
+            for het in self.hets:
+                found = False
+                for index, het_id in enumerate(het_ids):
+                    if ("%s %s %i" % (het.name, het.chain.name, het.number)).lower() in het_id.lower():
+                        site_id = site_ids[index]
+                        for site in self.pdb_sites:
+                            if site.name == site_id:
+                                het.annotated_binding_site = site
+                                found = True
+                if not found:
+                    het.annotated_binding_site = None
 
         #Get helices
-        self.helices = []
-        for chain in self.chains:
-            self.helices += chain.helices
+        with profiling.span("model.secondary_structure"):
+            self.helices = []
+            for chain in self.chains:
+                self.helices += chain.helices
 
-        #Get sheets
-        self.sheets = [Sheet(s, self) for s in secondary_section.sheets]
+            #Get sheets
+            self.sheets = [Sheet(s, self) for s in secondary_section.sheets]
 
         #Connect atoms together (from CONECT records)
-        for atom_dict in connect_section.atoms:
-            atom_obj = self.get_atom_by_number(atom_dict["atom_id"])
-            for bonded_atom_id in atom_dict["bonded_atoms"]:
-                bonded_atom_obj = self.get_atom_by_number(bonded_atom_id)
-                atom_obj.bond(bonded_atom_obj)
-
-        #Connect atoms together (standard residues)
-        from .residues import residues
-        for chain in self.chains:
-            for residue in chain.residues:
-                if residue.name in residues.keys():
-                    residue_dict = residues[residue.name]
-                    for atom_name in residue_dict.keys():
-                        matching_atoms = residue.get_atoms_by_name(atom_name)
-                        if len(matching_atoms) == 1:
-                            atom = matching_atoms[0]
-                            for bonded_atom_name in residue_dict[atom_name]:
-                                matching_atoms = residue.get_atoms_by_name(bonded_atom_name)
-                                if len(matching_atoms) == 1:
-                                    atom.bond(matching_atoms[0])
+        with profiling.span("model.bonds.conect"):
+            for atom_dict in connect_section.atoms:
+                atom_obj = self.get_atom_by_number(atom_dict["atom_id"])
+                for bonded_atom_id in atom_dict["bonded_atoms"]:
+                    bonded_atom_obj = self.get_atom_by_number(bonded_atom_id)
+                    atom_obj.bond(bonded_atom_obj)
+
+        #Connect atoms together (component templates)
+        with profiling.span("model.bonds.templates"):
+            from .components import get_component_bonds
+            for molecule in [r for chain in self.chains for r in chain.residues] + self.hets:
+                template_bonds = get_component_bonds(molecule.name)
+                if template_bonds:
+                    atoms_by_name = {}
+                    for atom in molecule.atoms:
+                        atoms_by_name.setdefault(atom.name, []).append(atom)
+                    for atom_name, bonded_atom_name, bond_type in template_bonds:
+                        atoms = atoms_by_name.get(atom_name, [])
+                        bonded_atoms = atoms_by_name.get(bonded_atom_name, [])
+                        if len(atoms) == 1 and len(bonded_atoms) == 1:
+                            atoms[0].bond(bonded_atoms[0], bond_type=bond_type)
 
         #Connect atoms together (peptide bonds)
-        for chain in self.chains:
-            for index, residue in enumerate(chain.residues[:-1]):
-                c, n = None, None
-                cs = residue.get_atoms_by_name("C")
-                if len(cs) == 1:
-                    c = cs[0]
-                ns = chain.residues[index+1].get_atoms_by_name("N")
-                if len(ns) == 1:
-                    n = ns[0]
-                if c and n:
-                    c.bond(n, peptide=True)
+        with profiling.span("model.bonds.peptide"):
+            for chain in self.chains:
+                for index, residue in enumerate(chain.residues[:-1]):
+                    c, n = None, None
+                    cs = residue.get_atoms_by_name("C")
+                    if len(cs) == 1:
+                        c = cs[0]
+                    ns = chain.residues[index+1].get_atoms_by_name("N")
+                    if len(ns) == 1:
+                        n = ns[0]
+                    if c and n:
+                        c.bond(n, peptide=True)
 
         #Connect atoms together (SS, LINK and CISPEP) (MISSES SOME INFO)
-        for ssbond in connect_annotation_section.ssbonds:
-            residue1 = self.get_chain_by_name(ssbond["residue_1_chain"]
-             ).get_residue_by_number(ssbond["residue_1_number"])
-            residue2 = self.get_chain_by_name(ssbond["residue_2_chain"]
-             ).get_residue_by_number(ssbond["residue_2_number"])
-            atom1 = residue1.get_atoms_by_element("S")[0]
-            atom2 = residue2.get_atoms_by_element("S")[0]
-            atom1.bond(atom2, disulphide=True, specified_distance=ssbond["disulfide_distance"]) #No symetry information yet
-        for link in connect_annotation_section.links:
-            atom1 = self.get_atom_by_number(link["residue_1_atom"])
-            atom2 = self.get_atom_by_number(link["residue_2_atom"])
-            if atom1 and atom2: atom1.bond(atom2)
-        for cispep in connect_annotation_section.cispeps:
-            residue1 = self.get_chain_by_name(cispep["residue_1_chain"]
-             ).get_residue_by_number(cispep["residue_1_number"])
-            residue2 = self.get_chain_by_name(cispep["residue_2_chain"]
-             ).get_residue_by_number(cispep["residue_2_number"])
-            residue1_peptide_bonds = []
-            for atom in residue1.atoms:
-                for bond in atom.bonds:
-                    if bond not in residue1_peptide_bonds and bond.peptide:
-                        residue1_peptide_bonds.append(bond)
-            residue2_peptide_bonds = []
-            for atom in residue2.atoms:
-                for bond in atom.bonds:
-                    if bond not in residue2_peptide_bonds and bond.peptide:
-                        residue2_peptide_bonds.append(bond)
-            in_both = [bond for bond in residue1_peptide_bonds if bond in residue2_peptide_bonds]
-            if len(in_both) == 1:
-                in_both[0].cis = True
-                in_both[0].cis_angle = cispep["angle_measure"]
+        with profiling.span("model.bonds.annotation"):
+            for ssbond in connect_annotation_section.ssbonds:
+                residue1 = self.get_chain_by_name(ssbond["residue_1_chain"]
+                 ).get_residue_by_number(ssbond["residue_1_number"])
+                residue2 = self.get_chain_by_name(ssbond["residue_2_chain"]
+                 ).get_residue_by_number(ssbond["residue_2_number"])
+                atom1 = residue1.get_atoms_by_element("S")[0]
+                atom2 = residue2.get_atoms_by_element("S")[0]
+                atom1.bond(atom2, disulphide=True, specified_distance=ssbond["disulfide_distance"]) #No symetry information yet
+            for link in connect_annotation_section.links:
+                atom1 = self.get_atom_by_number(link["residue_1_atom"])
+                atom2 = self.get_atom_by_number(link["residue_2_atom"])
+                if atom1 and atom2: atom1.bond(atom2)
+            for cispep in connect_annotation_section.cispeps:
+                residue1 = self.get_chain_by_name(cispep["residue_1_chain"]
+                 ).get_residue_by_number(cispep["residue_1_number"])
+                residue2 = self.get_chain_by_name(cispep["residue_2_chain"]
+                 ).get_residue_by_number(cispep["residue_2_number"])
+                residue1_peptide_bonds = []
+                for atom in residue1.atoms:
+                    for bond in atom.bonds:
+                        if bond not in residue1_peptide_bonds and bond.peptide:
+                            residue1_peptide_bonds.append(bond)
+                residue2_peptide_bonds = []
+                for atom in residue2.atoms:
+                    for bond in atom.bonds:
+                        if bond not in residue2_peptide_bonds and bond.peptide:
+                            residue2_peptide_bonds.append(bond)
+                in_both = [bond for bond in residue1_peptide_bonds if bond in residue2_peptide_bonds]
+                if len(in_both) == 1:
+                    in_both[0].cis = True
+                    in_both[0].cis_angle = cispep["angle_measure"]
 
 
 
@@ -380,6 +705,27 @@ class Model(AtomicStructure):
                 return het
 
 
+    def perceive_het_bonds(self, tolerance=None, unbonded_only=True):
+        """Perceives the bonds within each het from distances. By default only
+        hets with no bonds at all (usually those without CONECT records) are
+        treated. Returns the new bonds."""
+
+        bonds = []
+        for het in self.hets:
+            if not unbonded_only or not het.get_bonds():
+                bonds += het.perceive_bonds(tolerance=tolerance)
+        return bonds
+
+
+    def get_interfaces(self, cutoff=4, include_hets=True, covalent_count=3):
+        """Returns the Interface between every pair of chains (and hets, unless
+        include_hets is False) that are in contact, found in a single pass."""
+
+        from .interface import find_interfaces
+        structures = self.chains + (self.hets if include_hets else [])
+        return find_interfaces(structures, cutoff, covalent_count=covalent_count)
+
+
 class Chain(ResiduicStructure):
     "A chain of residues."
 
@@ -729,6 +1075,8 @@ class Chain(ResiduicStructure):
 class Residue(AtomicStructure):
     "An amino acid residue."
 
+    chain = WeakAttribute()
+
     RESIDUE_NAMES = {
      "phenylalanine": ("PHE", "F"), "PHE": ("phenylalanine", "F"), "F": ("phenylalanine", "PHE"),
       "tryptophan": ("TRP", "W"), "TRP": ("tryptophan", "W"), "W": ("tryptophan", "TRP"),
@@ -764,14 +1112,14 @@ class Residue(AtomicStructure):
 
 
     def __repr__(self):
-        return "<%s (%s%i)>" % (self.name, self.chain.name, self.number)
+        return "<%s (%s%i)>" % (self.name, self.chain.name if self.chain else "", self.number)
 
 
     def connected_residues(self):
         residues = []
         for atom in self.atoms:
             for bonded_atom in atom.bonded_atoms:
-                if bonded_atom.molecule is not self and bonded_atom.molecule not in residues:
+                if bonded_atom.molecule not in (self, None) and bonded_atom.molecule not in residues:
                     residues.append(bonded_atom.molecule)
         return residues
 
@@ -793,6 +1141,9 @@ class Residue(AtomicStructure):
 class Atom:
     """An atom."""
 
+    model = WeakAttribute()
+    molecule = WeakAttribute()
+
     def __init__(self, atom_dict):
         self.number = atom_dict["serial"]
         self.name = atom_dict["name"]
@@ -824,7 +1175,7 @@ class Atom:
             atoms = []
             for bond in self.bonds:
                 for atom in bond.atoms:
-                    if atom is not self and atom not in atoms:
+                    if atom is not None and atom is not self and atom not in atoms:
                         atoms.append(atom)
             return atoms
         else:
@@ -846,24 +1197,20 @@ class Atom:
 
 
     def nearby_atoms(self, cutoff, covalent_count=1):
-        atoms_to_exlcude = [self]
-        for _ in range(covalent_count):
-            for atom in atoms_to_exlcude[:]:
-                for bonded_atom in atom.bonded_atoms:
-                    if bonded_atom not in atoms_to_exlcude:
-                        atoms_to_exlcude.append(bonded_atom)
-
-        atoms = []
-        for atom in self.model.atoms:
-            if atom not in atoms_to_exlcude and atom.distance_to(self) <= cutoff:
-                atoms.append(atom)
-        return atoms
+        from .interface import get_covalent_shell
+        atoms_to_exclude = get_covalent_shell(self, covalent_count)
+        model = get_container(self, "model")
+        return [atom for atom in model.atoms_near_point(self.x, self.y, self.z, cutoff)
+         if atom not in atoms_to_exclude]
 
 
 
 class Het(AtomicStructure):
     """A ligand or other non-polymeric molecule (including solvents)."""
 
+    chain = WeakAttribute()
+    annotated_binding_site = WeakAttribute()
+
     def __init__(self, atoms):
         self.number = atoms[0]["res_seq"]
         self.name = atoms[0]["res_name"]
@@ -890,7 +1237,7 @@ class Het(AtomicStructure):
         nearby_atoms = [atom for atom in nearby_atoms if atom not in self.atoms
          and isinstance(atom.molecule, Residue)]
         residues = list(set([atom.molecule for atom in nearby_atoms]))
-        residues = sorted(residues, key=lambda k: k.chain.name)
+        residues = sorted(residues, key=lambda k: get_container(k, "chain").name)
         residues = sorted(residues, key=lambda k: k.number)
         return residues
 
@@ -923,6 +1270,8 @@ class PdbSite(ResiduicStructure):
 class Helix(ResiduicStructure):
     """An alpha helix."""
 
+    chain = WeakAttribute()
+
     CLASSES = {1: "Right-handed alpha", 2: "Right-handed omega", 3: "Right-handed pi",
      4: "Right-handed gamma", 5: "Right-handed 3 - 10", 6: "Left-handed alpha", 7: "Left-handed omega",
       8: "Left-handed gamma", 9: "2 - 7 ribbon/helix", 10: "Polyproline"}
@@ -963,6 +1312,8 @@ class Sheet(ResiduicStructure):
 class Strand(ResiduicStructure):
     """A beta strand."""
 
+    chain = WeakAttribute()
+
     def __init__(self, strand_dict, model, previous_strand=None):
         self.number = strand_dict["strand_id"]
         self.name = self.number
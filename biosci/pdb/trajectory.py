@@ -0,0 +1,288 @@
+import os
+import sys
+import struct
+from array import array
+from .exceptions import *
+from .geometry import get_atom_key, centre_coordinates, superpose_centred, get_rmsd
+
+TRAJECTORY_MAGIC = b"BTRJ"
+TRAJECTORY_VERSION = 1
+TRAJECTORY_HEADER = struct.Struct("<4sBI")
+
+def get_line_key(line):
+    """The get_atom_key of the atom an ATOM or HETATM line describes."""
+
+    return (
+     line[21] if line[21].strip() else None,
+     int(line[22:26]) if line[22:26].strip() else None,
+     line[26] if len(line) > 26 and line[26].strip() else None,
+     line[12:16].strip() or None
+    )
+
+
+def iter_pdb_frame_lines(handle):
+    """Takes a PDB file opened in text mode and yields the ATOM and HETATM
+    lines of each MODEL in turn. A file with no MODEL records is one frame."""
+
+    lines = []
+    for line in handle:
+        if line.startswith("ATOM  ") or line.startswith("HETATM"):
+            lines.append(line)
+        elif line.startswith("ENDMDL"):
+            yield lines
+            lines = []
+    if lines:
+        yield lines
+
+
+
+class TrajectoryFile:
+    """A binary trajectory file - a short header followed by frames of 32-bit
+    x, y, z values, all the same size, so that any frame can be read by
+    seeking straight to it."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, self.atom_count = TRAJECTORY_HEADER.unpack(
+             f.read(TRAJECTORY_HEADER.size)
+            )
+        if magic != TRAJECTORY_MAGIC:
+            raise PdbFileError("%s is not a binary trajectory file" % path)
+        if version > TRAJECTORY_VERSION:
+            raise PdbFileError("Trajectory version %i is not supported" % version)
+        self.frame_size = self.atom_count * 3 * array("f").itemsize
+        self.frame_count = (
+         os.path.getsize(path) - TRAJECTORY_HEADER.size
+        ) // self.frame_size if self.frame_size else 0
+
+
+    def __repr__(self):
+        return "<TrajectoryFile %s (%i frames of %i atoms)>" % (
+         self.path, self.frame_count, self.atom_count
+        )
+
+
+    def __len__(self):
+        return self.frame_count
+
+
+    def get_frame_offset(self, index):
+        if index < 0:
+            index += self.frame_count
+        if not 0 <= index < self.frame_count:
+            raise IndexError("Frame %i out of range" % index)
+        return TRAJECTORY_HEADER.size + (index * self.frame_size)
+
+
+    def read_frame(self, index, handle=None):
+        """Reads one frame as a flat x, y, z, x, y, z... array."""
+
+        if handle is None:
+            with open(self.path, "rb") as f:
+                return self.read_frame(index, f)
+        handle.seek(self.get_frame_offset(index))
+        frame = array("f")
+        frame.frombytes(handle.read(self.frame_size))
+        if sys.byteorder == "big":
+            frame.byteswap()
+        return frame
+
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            for index in range(self.frame_count):
+                yield self.read_frame(index, f)
+
+
+
+class TrajectoryWriter:
+    """Writes frames to a binary trajectory file one at a time."""
+
+    def __init__(self, path, atom_count):
+        self.path = path
+        self.atom_count = atom_count
+        self.frame_count = 0
+        self.file = open(path, "wb")
+        self.file.write(TRAJECTORY_HEADER.pack(TRAJECTORY_MAGIC, TRAJECTORY_VERSION, atom_count))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def write_frame(self, coordinates):
+        """Writes a frame, given either as a flat array or as (x, y, z)
+        tuples."""
+
+        if len(coordinates) and isinstance(coordinates[0], (tuple, list)):
+            frame = array("f", [value for point in coordinates for value in point])
+        else:
+            frame = array("f", coordinates)
+        if len(frame) != self.atom_count * 3:
+            raise PdbStructureError("Frame has %i values for %i atoms" % (
+             len(frame), self.atom_count
+            ))
+        if sys.byteorder == "big":
+            frame.byteswap()
+        self.file.write(frame.tobytes())
+        self.frame_count += 1
+
+
+    def close(self):
+        self.file.close()
+
+
+
+class Trajectory:
+    """A series of coordinate frames for one topology (usually a Model),
+    read either from a multi-MODEL PDB file or from a binary trajectory file.
+    Iterating over it moves the topology's atoms to each frame in turn and
+    yields the topology - the same objects every time, so no atoms, residues
+    or bonds are created per frame."""
+
+    def __init__(self, topology, path):
+        self.topology = topology
+        self.path = path
+        with open(path, "rb") as f:
+            self.binary = f.read(4) == TRAJECTORY_MAGIC
+        if self.binary:
+            self.file = TrajectoryFile(path)
+            if self.file.atom_count != len(topology.atoms):
+                raise PdbStructureError("Trajectory has %i atoms but topology has %i" % (
+                 self.file.atom_count, len(topology.atoms)
+                ))
+        self.line_order = None
+
+
+    def __repr__(self):
+        return "<Trajectory of %s>" % self.path
+
+
+    def __len__(self):
+        if self.binary:
+            return len(self.file)
+        with open(self.path) as f:
+            return sum([1 for _ in iter_pdb_frame_lines(f)])
+
+
+    def __iter__(self):
+        for frame in self.iter_frames():
+            self.load_frame(frame)
+            yield self.topology
+
+
+    def get_line_order(self, lines):
+        """Works out, from the first frame, which topology atom each line of a
+        PDB frame belongs to."""
+
+        indices = {}
+        for index, atom in enumerate(self.topology.atoms):
+            indices.setdefault(get_atom_key(atom), []).append(index)
+        order = []
+        for line in lines:
+            key = get_line_key(line)
+            if not indices.get(key):
+                raise PdbStructureError("Topology has no atom %s" % str(key))
+            order.append(indices[key].pop(0))
+        if len(order) != len(self.topology.atoms):
+            raise PdbStructureError("Frame has %i atoms but topology has %i" % (
+             len(order), len(self.topology.atoms)
+            ))
+        return order
+
+
+    def iter_frames(self):
+        """Yields each frame as a flat x, y, z, x, y, z... array in topology
+        atom order."""
+
+        if self.binary:
+            for frame in self.file:
+                yield frame
+            return
+        with open(self.path) as f:
+            for lines in iter_pdb_frame_lines(f):
+                if self.line_order is None:
+                    self.line_order = self.get_line_order(lines)
+                if len(lines) != len(self.line_order):
+                    raise PdbStructureError("Frame has %i atoms but topology has %i" % (
+                     len(lines), len(self.line_order)
+                    ))
+                frame = array("d", bytes(len(lines) * 3 * array("d").itemsize))
+                for index, line in zip(self.line_order, lines):
+                    frame[index * 3] = float(line[30:38])
+                    frame[(index * 3) + 1] = float(line[38:46])
+                    frame[(index * 3) + 2] = float(line[46:54])
+                yield frame
+
+
+    def get_frame(self, index):
+        """Returns one frame as a flat array - directly for binary files, and
+        by reading up to it for PDB files."""
+
+        if self.binary:
+            return self.file.read_frame(index)
+        for frame_index, frame in enumerate(self.iter_frames()):
+            if frame_index == index:
+                return frame
+        raise IndexError("Frame %i out of range" % index)
+
+
+    def load_frame(self, frame):
+        """Moves the topology's atoms to the coordinates in a frame."""
+
+        for index, atom in enumerate(self.topology.atoms):
+            atom.x, atom.y, atom.z = frame[index * 3], frame[(index * 3) + 1], frame[(index * 3) + 2]
+        self.topology.clear_atom_grid()
+
+
+    def get_distances(self, atom1, atom2):
+        """The distance between two topology atoms in every frame."""
+
+        index1, index2 = self.topology.atoms.index(atom1) * 3, self.topology.atoms.index(atom2) * 3
+        distances = []
+        for frame in self.iter_frames():
+            distances.append((
+             ((frame[index1] - frame[index2]) ** 2) +
+             ((frame[index1 + 1] - frame[index2 + 1]) ** 2) +
+             ((frame[index1 + 2] - frame[index2 + 2]) ** 2)
+            ) ** 0.5)
+        return distances
+
+
+    def get_rmsds(self, reference=None, atoms=None, superpose=True):
+        """The RMSD of every frame from a reference - the topology's current
+        coordinates unless a frame is given - over the given atoms (all of
+        them by default)."""
+
+        if atoms is None:
+            indices = list(range(len(self.topology.atoms)))
+        else:
+            positions = {atom: index for index, atom in enumerate(self.topology.atoms)}
+            indices = [positions[atom] for atom in atoms]
+        if reference is None:
+            reference = [(atom.x, atom.y, atom.z) for atom in self.topology.atoms]
+            reference = [reference[i] for i in indices]
+        else:
+            reference = [tuple(reference[i * 3:(i * 3) + 3]) for i in indices]
+        reference_centred = centre_coordinates(reference)
+        rmsds = []
+        for frame in self.iter_frames():
+            coordinates = [tuple(frame[i * 3:(i * 3) + 3]) for i in indices]
+            if superpose:
+                rmsds.append(superpose_centred(centre_coordinates(coordinates), reference_centred)[1])
+            else:
+                rmsds.append(get_rmsd(coordinates, reference))
+        return rmsds
+
+
+    def save(self, path):
+        """Writes every frame to a binary trajectory file."""
+
+        with TrajectoryWriter(path, len(self.topology.atoms)) as writer:
+            for frame in self.iter_frames():
+                writer.write_frame(frame)
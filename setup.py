@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 
 setup(name="biosci",
       version="0.1.0",
@@ -9,5 +9,6 @@ setup(name="biosci",
       author_email="sam.ireland.uk@gmail.com",
       classifiers=["Development Status :: 4 - Beta",
                    "Programming Language :: Python :: 3"],
-      packages=["biosci"],
-      install_requires=["requests"])
+      packages=["biosci", "biosci.pdb", "biosci.mol2"],
+      install_requires=["requests"],
+      entry_points={"console_scripts": ["biosci=biosci.cli:main"]})
@@ -0,0 +1,78 @@
+import os
+import sys
+import pytest
+
+#A stand-in for MOPAC. The .mop file's title line (its second line) holds settings such as
+#SLEEP=2 EXIT=1, and the run writes .out and .arc files - recording when it started and
+#finished, and with a heat of formation - plus a .pdb file if PDBOUT is one of the keywords,
+#and scratch files that an isolated run shouldn't keep
+FAKE_MOPAC = """#!%s
+import os
+import sys
+import time
+start = time.time()
+mop_path = sys.argv[1]
+with open(mop_path) as f:
+    lines = f.read().split("\\n")
+settings = dict(setting.split("=") for setting in lines[1].split() if "=" in setting)
+time.sleep(float(settings.get("SLEEP", 0)))
+stem = os.path.splitext(mop_path)[0]
+with open(stem + ".aux", "w") as f:
+    f.write("scratch\\n")
+with open(os.path.join(os.path.dirname(mop_path), "fort.7"), "w") as f:
+    f.write("scratch\\n")
+with open(stem + ".arc", "w") as f:
+    f.write(lines[0] + "\\n")
+if "PDBOUT" in lines[0].upper().split():
+    with open(stem + ".pdb", "w") as f:
+        f.write("END\\n")
+with open(stem + ".out", "w") as f:
+    f.write("START %%r\\nEND %%r\\nCWD %%s\\n" %% (start, time.time(), os.getcwd()))
+    f.write("FINAL HEAT OF FORMATION = -54.12345 KCAL/MOL\\n== MOPAC DONE ==\\n")
+print("fake MOPAC ran %%s" %% os.path.basename(mop_path))
+sys.exit(int(settings.get("EXIT", 0)))
+"""
+
+def write_script(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    os.chmod(path, 0o755)
+    return str(path)
+
+
+def write_mop(directory, name, keywords="PM7", **settings):
+    """Writes a .mop file for the fake MOPAC to run, with its settings as the
+    title line."""
+
+    path = os.path.join(str(directory), name + ".mop")
+    with open(path, "w") as f:
+        f.write("%s\n%s\n\nC 0.0 1 0.0 1 0.0 1\n" % (
+         keywords, " ".join(["%s=%s" % (key.upper(), value) for key, value in settings.items()])
+        ))
+    return path
+
+
+def read_times(out_path):
+    """Gets the start and end times the fake MOPAC wrote to a .out file."""
+
+    with open(out_path) as f:
+        lines = f.read().split("\n")
+    return float(lines[0].split()[1]), float(lines[1].split()[1])
+
+
+@pytest.fixture
+def fake_mopac(tmp_path):
+    return write_script(tmp_path / "fake_mopac", FAKE_MOPAC % sys.executable)
+
+
+@pytest.fixture
+def mopac_location(tmp_path, monkeypatch):
+    """Installs the fake MOPAC as MOPAC_LOCATION's executable, for the
+    functions that don't take an executable."""
+
+    from biosci import mopac
+    location = tmp_path / "mopac"
+    location.mkdir()
+    write_script(location / mopac.MOPAC_EXECUTABLE, FAKE_MOPAC % sys.executable)
+    monkeypatch.setattr(mopac, "MOPAC_LOCATION", str(location))
+    return str(location)
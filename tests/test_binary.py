@@ -0,0 +1,144 @@
+from array import array
+import pytest
+from biosci.pdb import PdbFile, PdbDataStructure, PdbFileError
+from biosci.pdb import get_from_binary_file, write_binary_file
+from biosci.pdb.binary import *
+
+#Two models, with alternate locations, an insertion code, a charge, ANISOU records on some
+#atoms only, and coordinates that jump too far to fit a 16 bit delta
+PDB_TEXT = """HEADER    HYDROLASE                               01-JAN-00   1ABC
+TITLE     BINARY ROUND TRIP
+CRYST1   50.000   60.000   70.000  90.00  90.00  90.00 P 21 21 21    4
+MODEL        1
+ATOM      1  N   ALA A   1      -0.512   3.800   1.262  1.00 20.00           N
+ATOM      2  CA AALA A   1       1.200   3.800   1.364  0.60 21.50           C
+ANISOU    2  CA AALA A   1     2406   1892   1614    198    519   -328       C
+ATOM      3  CA BALA A   1       1.250   3.750   1.300  0.40 22.25           C
+ATOM      4  C   ALA A   1     402.400 -99.800   0.212  1.00 20.00           C
+ATOM      5  O   ALA A   1B      3.600   3.800  -1.135  1.00 20.00           O
+ATOM      7  NZ  LYS A   2       0.000   7.600   1.364  1.00 35.10           N1+
+ANISOU    7  NZ  LYS A   2     3000   3100   3200    -10     20    -30       N1+
+TER       8      LYS A   2
+HETATM    9  O   HOH A 101     -20.000 -30.000 -40.000  0.50 50.00           O
+ENDMDL
+MODEL        2
+ATOM      1  N   ALA A   1      -0.612   3.900   1.362  1.00 20.00           N
+ATOM      2  CA AALA A   1       1.300   3.900   1.464  0.60 21.50           C
+ANISOU    2  CA AALA A   1     2406   1892   1614    198    519   -328       C
+ATOM      3  CA BALA A   1       1.350   3.850   1.400  0.40 22.25           C
+ATOM      4  C   ALA A   1     402.500 -99.700   0.312  1.00 20.00           C
+ATOM      5  O   ALA A   1B      3.700   3.900  -1.035  1.00 20.00           O
+ATOM      7  NZ  LYS A   2       0.100   7.700   1.464  1.00 35.10           N1+
+ANISOU    7  NZ  LYS A   2     3000   3100   3200    -10     20    -30       N1+
+TER       8      LYS A   2
+HETATM    9  O   HOH A 101     -20.100 -30.100 -40.100  0.50 50.00           O
+ENDMDL
+END
+"""
+
+def get_data():
+    return PdbDataStructure(PdbFile(PDB_TEXT))
+
+
+def get_atom_dicts(pdb_data):
+    return [model["atoms"] for model in pdb_data.coordinates.models]
+
+
+
+class TestColumnEncoding:
+
+    @pytest.mark.parametrize("encoding", [
+     (("pack", 2),), (("pack", 1),), (("delta",), ("pack", 2)),
+     (("run_length",), ("pack", 2)), (("delta",), ("run_length",), ("pack", 2))
+    ])
+    def test_integer_round_trip(self, encoding):
+        values = [0, 5, 5, 5, -7, 40000, -40000, 32767, -32768, 127, -128, 200, 200, 1]
+        data, table = encode_column(values, encoding)
+        assert table is None
+        decoded = decode_column(data, encoding)
+        assert isinstance(decoded, array)
+        assert list(decoded) == values
+
+
+    def test_fixed_point_round_trip(self):
+        encoding = (("fixed", 1000), ("delta",), ("pack", 2))
+        values = [1.5, -0.512, 402.4, -99.8, -99.8, 0.0, 1e-3]
+        decoded = decode_column(encode_column(values, encoding)[0], encoding)
+        assert decoded.typecode == "d"
+        assert list(decoded) == values
+
+
+    def test_dictionary_round_trip(self):
+        encoding = (("dictionary",), ("run_length",), ("pack", 2))
+        values = ["A", "A", None, "B", "B", "B", "A"]
+        data, table = encode_column(values, encoding)
+        assert table == [None, "A", "B"]
+        assert decode_column(data, encoding, table) == values
+
+
+    def test_empty_column(self):
+        encoding = (("fixed", 1000), ("delta",), ("pack", 2))
+        assert list(decode_column(encode_column([], encoding)[0], encoding)) == []
+
+
+    def test_integer_pack_uses_recursive_indexing(self):
+        assert integer_pack([40000, -40000, 5], 2) == [32767, 7233, -32768, -7232, 5]
+        assert integer_unpack([32767, 7233, -32768, -7232, 5], 2) == [40000, -40000, 5]
+
+
+
+class TestPdbBinaryFile:
+
+    def test_model_dicts_round_trip(self):
+        pdb_data = get_data()
+        binary = PdbBinaryFile(encode_pdb_data(pdb_data))
+        assert binary.atom_count == 14
+        assert binary.model_sizes == [7, 7]
+        assert binary.get_model_dicts() == get_atom_dicts(pdb_data)
+
+
+    def test_coordinates_are_arrays(self):
+        binary = PdbBinaryFile(encode_pdb_data(get_data()))
+        assert binary.x.typecode == "d"
+        assert list(binary.x[:4]) == [-0.512, 1.2, 1.25, 402.4]
+        x, y, z = binary.get_coordinates(1)
+        assert list(x) == list(binary.x[7:])
+        assert list(z)[-1] == -40.1
+
+
+    def test_missing_values_kept(self):
+        binary = PdbBinaryFile(encode_pdb_data(get_data()))
+        assert binary.columns["u11"][:3] == [None, 2406, None]
+        assert binary.columns["charge"][5] == "1+"
+        assert binary.columns["alt_loc"][:3] == [None, "A", "B"]
+        assert binary.columns["het"][6] is True
+
+
+    def test_non_atom_records_kept(self):
+        binary = PdbBinaryFile(encode_pdb_data(get_data()))
+        assert binary.records.startswith("HEADER    HYDROLASE")
+        assert "CRYST1   50.000" in binary.records
+        assert "ANISOU" not in binary.records
+
+
+    def test_structure_round_trip(self, tmp_path):
+        pdb_data = get_data()
+        path = str(tmp_path / "1abc.bpdb")
+        write_binary_file(pdb_data, path)
+        structure = get_from_binary_file(path)
+        assert get_atom_dicts(structure.data) == get_atom_dicts(pdb_data)
+        assert len(structure.models) == 2
+        assert structure.unit_cell.a == 50
+        atom = structure.model.get_atom_by_number(4)
+        assert (atom.x, atom.y, atom.z) == (402.4, -99.8, 0.212)
+
+
+    def test_not_binary(self):
+        with pytest.raises(PdbFileError):
+            PdbBinaryFile(PDB_TEXT.encode())
+
+
+    def test_newer_version(self):
+        contents = encode_pdb_data(get_data())
+        with pytest.raises(PdbFileError):
+            PdbBinaryFile(contents[:4] + bytes([VERSION + 1]) + contents[5:])
@@ -0,0 +1,74 @@
+import pytest
+from biosci.mol2 import Mol2Index, iter_molecules
+
+def get_molecule_text(name, atoms):
+    lines = ["@<TRIPOS>MOLECULE", name, " %i %i 1 0 0" % (atoms, atoms - 1), "SMALL",
+     "USER_CHARGES", "", "@<TRIPOS>ATOM"]
+    for n in range(1, atoms + 1):
+        lines.append("%7i C%-4i %10.4f %10.4f %10.4f C.3 1 LIG %8.4f" % (
+         n, n, n * 1.5, 0.0, 0.0, -0.1
+        ))
+    lines.append("@<TRIPOS>BOND")
+    for n in range(1, atoms):
+        lines.append("%6i %5i %5i 1" % (n, n, n + 1))
+    lines.append("@<TRIPOS>SUBSTRUCTURE")
+    lines.append("     1 LIG         1 GROUP             0 ****  ****    0 ROOT")
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def library(tmp_path):
+    #Several poses of the same ligand, as in docking output
+    names = ["LIG1", "LIG2", "POSE", "LIG3", "POSE"]
+    path = tmp_path / "library.mol2"
+    path.write_text("# docking results\n" + "".join(
+     [get_molecule_text(name, atoms) for name, atoms in zip(names, [3, 4, 2, 5, 6])]
+    ))
+    return str(path)
+
+
+
+class TestMol2Index:
+
+    def test_index_finds_every_molecule(self, library):
+        index = Mol2Index(library)
+        assert len(index) == 5
+        assert index.names == ["LIG1", "LIG2", "POSE", "LIG3", "POSE"]
+        assert index.offsets[0] == len("# docking results\n")
+        with open(library, "rb") as f:
+            assert [m.name for m in iter_molecules(f)] == index.names
+
+
+    def test_get_molecule_by_ordinal(self, library):
+        index = Mol2Index(library)
+        assert [len(index[ordinal].atoms) for ordinal in range(5)] == [3, 4, 2, 5, 6]
+        assert index.get_molecule_text(4).startswith("@<TRIPOS>MOLECULE\nPOSE\n")
+
+
+    def test_get_molecules_by_name(self, library):
+        index = Mol2Index(library)
+        assert index.get_molecule_by_name("LIG3").name == "LIG3"
+        assert [len(m.atoms) for m in index.get_molecules_by_name("POSE")] == [2, 6]
+        assert index.get_molecule_by_name("NONE") is None
+        assert index.get_molecules_by_name("NONE") == []
+
+
+    def test_save_and_load(self, library, tmp_path):
+        index = Mol2Index(library)
+        index_path = str(tmp_path / "library.json")
+        index.save(index_path)
+        loaded = Mol2Index.load(library, index_path)
+        assert loaded.offsets == index.offsets
+        assert loaded.names == index.names
+        assert loaded.ordinals_by_name == index.ordinals_by_name
+        assert [len(m.atoms) for m in loaded.get_molecules_by_name("POSE")] == [2, 6]
+        assert len(loaded[3].get_bonds()) == 4
+
+
+    def test_load_does_not_scan_file(self, library, tmp_path):
+        index_path = str(tmp_path / "library.json")
+        Mol2Index(library).save(index_path)
+        with open(library, "a") as f:
+            f.write(get_molecule_text("LATE", 3))
+        assert len(Mol2Index.load(library, index_path)) == 5
+        assert len(Mol2Index(library)) == 6
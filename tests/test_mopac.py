@@ -0,0 +1,270 @@
+import os
+import time
+from conftest import write_mop, read_times
+from biosci.pdb import PdbFile, PdbDataStructure, PdbStructure
+from biosci.mopac import MopacScheduler, MopacLog, read_log_events, summarise_log
+from biosci.mopac import MopacCache, MopacOutput, MOPAC_EXECUTABLE, run_mopac_structure
+
+OUTPUT_TEXT = """
+       FINAL HEAT OF FORMATION =        -54.12345 KCAL/MOL =    -226.45 KJ/MOL
+       TOTAL ENERGY            =       -345.67890 EV
+
+                             CARTESIAN COORDINATES
+
+   NO.       ATOM               X         Y         Z
+
+     1       C          4.1000   20.0000    0.5000
+     2       O          5.5000   20.1000    0.5000
+
+ TOTAL JOB TIME:             0.52 SECONDS
+"""
+
+def get_molecule(x=4.0):
+    return PdbStructure(PdbDataStructure(PdbFile(
+     "HETATM    1  C1  LIG A   1    %8.4f  20.000   0.500  1.00 20.00           C\n"
+     "HETATM    2  O1  LIG A   1       5.400  20.000   0.500  1.00 20.00           O\n"
+     "END\n" % x
+    ))).model
+
+
+def get_max_overlap(intervals):
+    events = sorted([(start, 1) for start, end in intervals] + [(end, -1) for start, end in intervals])
+    running, most = 0, 0
+    for when, change in events:
+        running += change
+        most = max(most, running)
+    return most
+
+
+def wait_until_started(job, timeout=10):
+    deadline = time.time() + timeout
+    while job.process is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.process is not None
+
+
+
+class TestScheduler:
+
+    def test_never_runs_more_than_max_workers(self, tmp_path, fake_mopac):
+        paths = [write_mop(tmp_path, "job%i" % n, sleep=0.3) for n in range(6)]
+        with MopacScheduler(max_workers=2, executable=fake_mopac) as scheduler:
+            results = [future.result() for future in scheduler.submit_all(paths)]
+        assert all(result.succeeded for result in results)
+        intervals = [read_times(path[:-4] + ".out") for path in paths]
+        assert get_max_overlap(intervals) == 2
+
+
+    def test_job_timeout(self, tmp_path, fake_mopac):
+        quick = write_mop(tmp_path, "quick")
+        slow = write_mop(tmp_path, "slow", sleep=30)
+        with MopacScheduler(max_workers=2, executable=fake_mopac) as scheduler:
+            slow_future = scheduler.submit(slow, timeout=0.5)
+            quick_future = scheduler.submit(quick, timeout=10)
+            slow_result, quick_result = slow_future.result(), quick_future.result()
+        assert slow_result.timed_out
+        assert not slow_result.succeeded
+        assert slow_result.duration < 10
+        assert not os.path.exists(os.path.join(str(tmp_path), "slow.out"))
+        assert quick_result.succeeded and not quick_result.timed_out
+
+
+    def test_scheduler_timeout_is_default(self, tmp_path, fake_mopac):
+        slow = write_mop(tmp_path, "slow", sleep=30)
+        with MopacScheduler(executable=fake_mopac, timeout=0.5) as scheduler:
+            assert scheduler.submit(slow).result().timed_out
+
+
+    def test_cancel_running_job(self, tmp_path, fake_mopac):
+        path = write_mop(tmp_path, "slow", sleep=30)
+        start = time.time()
+        with MopacScheduler(max_workers=1, executable=fake_mopac) as scheduler:
+            future = scheduler.submit(path)
+            wait_until_started(future.job)
+            scheduler.cancel(future)
+            result = future.result()
+        assert result.cancelled
+        assert not result.succeeded
+        assert time.time() - start < 10
+
+
+    def test_cancel_queued_job(self, tmp_path, fake_mopac):
+        slow = write_mop(tmp_path, "slow", sleep=30)
+        queued = write_mop(tmp_path, "queued")
+        with MopacScheduler(max_workers=1, executable=fake_mopac) as scheduler:
+            running, waiting = scheduler.submit_all([slow, queued])
+            wait_until_started(running.job)
+            scheduler.cancel(waiting)
+            scheduler.cancel(running)
+        assert waiting.cancelled()
+        assert waiting.job.process is None
+        assert running.result().cancelled
+        assert not os.path.exists(os.path.join(str(tmp_path), "queued.out"))
+
+
+    def test_isolated_job_keeps_only_outputs(self, tmp_path, fake_mopac):
+        path = write_mop(tmp_path, "job")
+        with MopacScheduler(executable=fake_mopac) as scheduler:
+            result = scheduler.submit(path).result()
+        assert result.succeeded
+        assert sorted(result.outputs) == sorted([
+         os.path.join(str(tmp_path), "job.out"), os.path.join(str(tmp_path), "job.arc")
+        ])
+        assert sorted(os.listdir(str(tmp_path))) == ["fake_mopac", "job.arc", "job.mop", "job.out"]
+        with open(os.path.join(str(tmp_path), "job.out")) as f:
+            assert "CWD %s\n" % str(tmp_path) not in f.read()
+
+
+    def test_isolated_jobs_in_same_directory(self, tmp_path, fake_mopac):
+        paths = [write_mop(tmp_path, "job%i" % n, sleep=0.2) for n in range(4)]
+        with MopacScheduler(max_workers=4, executable=fake_mopac) as scheduler:
+            results = [future.result() for future in scheduler.submit_all(paths)]
+        assert all(result.succeeded for result in results)
+        assert [len(result.outputs) for result in results] == [2, 2, 2, 2]
+        assert "fort.7" not in os.listdir(str(tmp_path))
+
+
+    def test_unisolated_job_runs_in_mop_directory(self, tmp_path, fake_mopac):
+        path = write_mop(tmp_path, "job")
+        with MopacScheduler(executable=fake_mopac, isolate=False) as scheduler:
+            result = scheduler.submit(path).result()
+        assert result.succeeded
+        assert "fake MOPAC ran job.mop" in result.output
+        assert {"job.aux", "fort.7", "job.out"} <= set(os.listdir(str(tmp_path)))
+
+
+    def test_failed_job(self, tmp_path, fake_mopac):
+        path = write_mop(tmp_path, "job", exit=3)
+        with MopacScheduler(executable=fake_mopac) as scheduler:
+            result = scheduler.submit(path).result()
+        assert result.return_code == 3
+        assert not result.succeeded
+
+
+
+class TestLog:
+
+    def test_summarise_log(self, tmp_path, fake_mopac):
+        paths = [write_mop(tmp_path, "job%i" % n, sleep=0.1) for n in range(4)]
+        paths.append(write_mop(tmp_path, "failed", exit=2))
+        log_path = os.path.join(str(tmp_path), "log.jsonl")
+        with MopacLog(log_path) as log:
+            with MopacScheduler(max_workers=2, executable=fake_mopac, log=log) as scheduler:
+                for future in scheduler.submit_all(paths):
+                    future.result()
+        events = read_log_events(log_path)
+        assert [e["event"] for e in events].count("queued") == 5
+        assert [e["event"] for e in events].count("finished") == 5
+        summary = summarise_log(log_path)
+        assert summary["job_count"] == 5
+        assert summary["finished_count"] == 5
+        assert summary["failed_count"] == 1
+        assert summary["jobs"][os.path.abspath(paths[-1])]["exit_code"] == 2
+        assert summary["max_wall_time"] >= 0.1
+        assert summary["total_wall_time"] >= 0.4
+        assert summary["mean_wait_time"] is not None
+
+
+    def test_summarise_log_counts_unfinished_jobs(self, tmp_path, fake_mopac):
+        slow = write_mop(tmp_path, "slow", sleep=30)
+        log_path = os.path.join(str(tmp_path), "log.jsonl")
+        with MopacLog(log_path) as log:
+            with MopacScheduler(max_workers=1, executable=fake_mopac, log=log) as scheduler:
+                running, waiting = scheduler.submit_all([slow, write_mop(tmp_path, "queued")])
+                wait_until_started(running.job)
+                scheduler.cancel_all()
+        summary = summarise_log(log_path)
+        assert summary["job_count"] == 2
+        assert summary["finished_count"] == 1
+        assert summary["failed_count"] == 1
+        assert summary["jobs"][os.path.abspath(slow)]["exit_code"] not in (None, 0)
+
+
+
+class TestCache:
+
+    def test_put_and_get(self, tmp_path):
+        cache = MopacCache(str(tmp_path / "cache"))
+        molecule, output = get_molecule(), MopacOutput(OUTPUT_TEXT)
+        assert cache.get(molecule, "PM7") is None
+        cache.put(molecule, "PM7", output)
+        cached = cache.get(molecule, "PM7")
+        assert cached.heat_of_formation == -54.12345
+        assert cached.geometry == [("C", 4.1, 20.0, 0.5), ("O", 5.5, 20.1, 0.5)]
+        assert cached.to_dict() == output.to_dict()
+        assert (cache.hits, cache.misses, cache.hit_rate) == (1, 1, 0.5)
+        assert len(cache) == 1
+
+
+    def test_key_ignores_keyword_case_and_rounding(self, tmp_path):
+        cache = MopacCache(str(tmp_path / "cache"), precision=3)
+        cache.put(get_molecule(), ["PM7", "PDBOUT"], MopacOutput(OUTPUT_TEXT))
+        assert cache.get(get_molecule(4.0001), "pm7  pdbout") is not None
+        assert cache.get(get_molecule(4.01), "PM7 PDBOUT") is None
+        assert cache.get(get_molecule(), "PM6 PDBOUT") is None
+
+
+    def test_size_persists(self, tmp_path):
+        cache = MopacCache(str(tmp_path / "cache"))
+        cache.put(get_molecule(), "PM7", MopacOutput(OUTPUT_TEXT))
+        cache.put(get_molecule(1.0), "PM7", MopacOutput(OUTPUT_TEXT))
+        reopened = MopacCache(str(tmp_path / "cache"))
+        assert reopened.size == cache.size > 0
+        assert reopened.get(get_molecule(1.0), "PM7") is not None
+
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = MopacCache(str(tmp_path / "cache"))
+        first, second, third = get_molecule(1.0), get_molecule(2.0), get_molecule(3.0)
+        cache.put(first, "PM7", MopacOutput(OUTPUT_TEXT))
+        entry_size = cache.size
+        cache.max_size = int(entry_size * 2.5)
+        cache.put(second, "PM7", MopacOutput(OUTPUT_TEXT))
+        os.utime(cache.get_path(first, "PM7"), (1000, 1000))
+        os.utime(cache.get_path(second, "PM7"), (2000, 2000))
+        assert cache.get(first, "PM7") is not None
+        cache.put(third, "PM7", MopacOutput(OUTPUT_TEXT))
+        assert cache.evictions == 1
+        assert len(cache) == 2
+        assert cache.size == entry_size * 2
+        assert cache.get(second, "PM7") is None
+        assert cache.get(first, "PM7") is not None
+        assert cache.get(third, "PM7") is not None
+
+
+    def test_clear(self, tmp_path):
+        cache = MopacCache(str(tmp_path / "cache"))
+        cache.put(get_molecule(), "PM7", MopacOutput(OUTPUT_TEXT))
+        cache.clear()
+        assert len(cache) == 0 and cache.size == 0
+        assert cache.get(get_molecule(), "PM7") is None
+
+
+
+class TestRunMopacStructure:
+
+    def test_keeps_pdb_for_pdbout(self, tmp_path, mopac_location):
+        mop_path = str(tmp_path / "ligand.mop")
+        output = run_mopac_structure(get_molecule(), mop_path)
+        assert output.heat_of_formation == -54.12345
+        assert sorted(f for f in os.listdir(str(tmp_path)) if f.startswith("ligand")) == [
+         "ligand.arc", "ligand.mop", "ligand.out", "ligand.pdb"
+        ]
+
+
+    def test_outputs_can_be_given(self, tmp_path, mopac_location):
+        mop_path = str(tmp_path / "ligand.mop")
+        run_mopac_structure(get_molecule(), mop_path, keywords="PM7 PDBOUT", outputs=(".out",))
+        assert sorted(f for f in os.listdir(str(tmp_path)) if f.startswith("ligand")) == [
+         "ligand.mop", "ligand.out"
+        ]
+
+
+    def test_cached_results_skip_mopac(self, tmp_path, mopac_location):
+        cache = MopacCache(str(tmp_path / "cache"))
+        first = run_mopac_structure(get_molecule(), str(tmp_path / "a.mop"), cache=cache)
+        os.remove(os.path.join(mopac_location, MOPAC_EXECUTABLE))
+        second = run_mopac_structure(get_molecule(), str(tmp_path / "b.mop"), cache=cache)
+        assert second.to_dict() == first.to_dict()
+        assert not os.path.exists(str(tmp_path / "b.mop"))
+        assert (cache.hits, cache.misses) == (1, 1)
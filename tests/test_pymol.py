@@ -0,0 +1,139 @@
+import os
+import sys
+import shutil
+import pytest
+import biosci
+from conftest import write_script
+from biosci import PymolSession, PymolError, find_pymol, run_pymol, render_figures
+
+#A stand-in for PyMOL run as pymol -cqp - it echoes each command, answers pid with its
+#process ID, prints what print() asks for, dies on crash and logs each start to a file
+FAKE_PYMOL = """#!%s
+import os
+import re
+import sys
+with open(os.environ["FAKE_PYMOL_LOG"], "a") as f:
+    f.write("%%i %%s\\n" %% (os.getpid(), " ".join(sys.argv[1:])))
+for line in sys.stdin:
+    line = line.strip()
+    if line == "quit":
+        break
+    if line == "crash":
+        sys.exit(1)
+    match = re.match(r'print\\("(.*)"\\)', line)
+    if match:
+        print(match.group(1))
+    elif line == "pid":
+        print(os.getpid())
+    else:
+        print("PyMOL>%%s" %% line)
+    sys.stdout.flush()
+"""
+
+@pytest.fixture
+def fake_pymol(tmp_path, monkeypatch):
+    """Puts a fake pymol on the PATH (and nowhere else), with nothing cached."""
+
+    directory = tmp_path / "bin"
+    directory.mkdir()
+    path = write_script(directory / "pymol", FAKE_PYMOL % sys.executable)
+    monkeypatch.setenv("PATH", str(directory))
+    monkeypatch.setenv("FAKE_PYMOL_LOG", str(tmp_path / "starts.log"))
+    monkeypatch.setattr(os, "defpath", "")
+    monkeypatch.setattr(biosci, "PYMOL_LOCATION", None)
+    monkeypatch.setattr(biosci, "_pymol_path", None)
+    return path
+
+
+def get_starts(tmp_path):
+    with open(str(tmp_path / "starts.log")) as f:
+        return [line.split() for line in f]
+
+
+
+class TestFindPymol:
+
+    def test_found_on_path(self, fake_pymol):
+        assert find_pymol() == fake_pymol
+
+
+    def test_path_is_cached(self, fake_pymol, monkeypatch):
+        calls = []
+        which = shutil.which
+        def counting_which(*args, **kwargs):
+            calls.append(args)
+            return which(*args, **kwargs)
+        monkeypatch.setattr(shutil, "which", counting_which)
+        assert [find_pymol() for _ in range(5)] == [fake_pymol] * 5
+        assert len(calls) == 1
+        monkeypatch.setenv("PATH", "")
+        assert find_pymol() == fake_pymol
+
+
+    def test_location_overrides(self, fake_pymol, monkeypatch):
+        monkeypatch.setattr(biosci, "PYMOL_LOCATION", "/opt/pymol/pymol")
+        assert find_pymol() == "/opt/pymol/pymol"
+
+
+    def test_not_found(self, fake_pymol, monkeypatch):
+        monkeypatch.setenv("PATH", "")
+        assert find_pymol() is None
+        with pytest.raises(PymolError):
+            PymolSession()
+
+
+
+class TestPymolSession:
+
+    def test_output_returned(self, fake_pymol):
+        with PymolSession() as session:
+            assert session.run(["load x.pdb", "show cartoon"]) == "PyMOL>load x.pdb\nPyMOL>show cartoon"
+            assert session.run("hide everything") == "PyMOL>hide everything"
+            assert session.run([]) == ""
+
+
+    def test_orders_go_through_one_process(self, fake_pymol, tmp_path):
+        with PymolSession() as session:
+            pids = [session.run(["orient", "pid"]).split("\n")[-1] for _ in range(20)]
+            assert session.commands_run == 20
+            assert set(pids) == {str(session.process.pid)}
+        starts = get_starts(tmp_path)
+        assert len(starts) == 1
+        assert starts[0][1] == "-cqp"
+
+
+    def test_close_ends_process(self, fake_pymol):
+        session = PymolSession()
+        session.run("orient")
+        session.close()
+        assert session.process.poll() is not None
+        session.close()
+
+
+    def test_error_when_process_dies(self, fake_pymol):
+        with PymolSession() as session:
+            session.run("orient")
+            with pytest.raises(PymolError):
+                session.run(["orient", "crash"])
+            session.process.wait()
+            with pytest.raises(PymolError):
+                session.run("orient")
+
+
+    def test_run_pymol_uses_session(self, fake_pymol, tmp_path, capsys):
+        with PymolSession() as session:
+            run_pymol("x.pdb", orders=["show sticks"], output=True, session=session)
+            run_pymol(orders=["orient"], session=session)
+            assert session.commands_run == 2
+        assert capsys.readouterr().out == 'PyMOL>load "x.pdb"\nPyMOL>show sticks\n'
+        assert len(get_starts(tmp_path)) == 1
+
+
+
+class TestRenderFigures:
+
+    def test_images_returned_in_order(self, fake_pymol, tmp_path):
+        figures = [("s%i.pdb" % n, "s%i.png" % n, "resi %i" % n) for n in range(25)]
+        images = render_figures(figures, workers=2, batch_size=4)
+        assert images == ["s%i.png" % n for n in range(25)]
+        assert 1 <= len(get_starts(tmp_path)) <= 2